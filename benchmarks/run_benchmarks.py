@@ -0,0 +1,377 @@
+"""
+离线基准测试
+使用本地 LLM 桩服务和 MCP 桩服务测量冷启动、计划延迟、规划 prompt 布局的首 token 时间、单次工具调用开销和并发吞吐，
+输出机器可读的 JSON 报告，并可与已保存的基线对比以拦截性能回退
+
+运行:
+    python -m benchmarks.run_benchmarks                           # 运行并输出报告
+    python -m benchmarks.run_benchmarks --save-baseline           # 运行并保存为基线
+    python -m benchmarks.run_benchmarks --compare                 # 运行并与基线对比，回退时返回非零退出码
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from benchmarks.stub_llm_server import StubLLMServer
+from config import config
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_REPORT = os.path.join(BENCH_DIR, "results", "latest.json")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+STUB_MCP_SERVER = os.path.join(BENCH_DIR, "stub_mcp_server.py")
+
+
+def stub_mcp_config(latency: float = 0.0, startup: float = 0.0) -> Dict[str, Any]:
+    """指向 MCP 桩服务的服务器配置"""
+    return {
+        "playwright": {
+            "command": sys.executable,
+            "args": [STUB_MCP_SERVER],
+            "transport": "stdio",
+            "env": {
+                "STUB_MCP_LATENCY": str(latency),
+                "STUB_MCP_STARTUP": str(startup),
+            },
+        }
+    }
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """计算样本的统计值（秒）"""
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> float:
+        if not ordered:
+            return 0.0
+        index = min(int(round(p * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[index]
+
+    return {
+        "n": len(ordered),
+        "mean": statistics.fmean(ordered) if ordered else 0.0,
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "max": ordered[-1] if ordered else 0.0,
+    }
+
+
+@contextlib.contextmanager
+def quiet(enabled: bool = True):
+    """屏蔽被测代码的 print 输出"""
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+async def bench_cold_start(runs: int, startup: float) -> Dict[str, Any]:
+    """MCP 会话冷启动：启动服务进程、握手并加载工具"""
+    from utils.mcp_browser_tools import MCPPlaywrightAgent
+
+    samples = []
+    for _ in range(runs):
+        agent = MCPPlaywrightAgent(stub_mcp_config(startup=startup))
+        start = time.perf_counter()
+        with quiet():
+            await agent.initialize()
+        samples.append(time.perf_counter() - start)
+        with quiet():
+            await agent.close()
+    return summarize(samples)
+
+
+async def bench_plan_latency(llm, runs: int) -> Dict[str, Any]:
+    """计划生成延迟：非流式总耗时、流式首 token 时间和流式总耗时"""
+    prompt = "访问百度并搜索 LangChain"
+    invoke_samples, ttft_samples, stream_samples = [], [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await llm.ainvoke(prompt)
+        invoke_samples.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        first = None
+        async for _ in llm.astream(prompt):
+            if first is None:
+                first = time.perf_counter() - start
+        stream_samples.append(time.perf_counter() - start)
+        ttft_samples.append(first or 0.0)
+    return {
+        "ainvoke": summarize(invoke_samples),
+        "astream_ttft": summarize(ttft_samples),
+        "astream_total": summarize(stream_samples),
+    }
+
+
+async def bench_prompt_layout(llm, server: StubLLMServer, runs: int) -> Dict[str, Any]:
+    """规划 prompt 布局：分别用内联和前缀布局为不同任务规划，比较首 token 时间和命中前缀缓存的 token 比例"""
+    from utils.mcp_browser_tools import MCPSmartBrowserAgent
+    from utils.session_pool import MCPSessionPool
+
+    pool = MCPSessionPool(stub_mcp_config(), min_size=1, max_size=1)
+    agent = MCPSmartBrowserAgent(llm, pool=pool)
+    with quiet():
+        await agent.initialize()
+    results = {}
+    try:
+        for layout in ("inline", "prefix"):
+            agent.prompt_layout = layout
+            agent._use_registry(agent.registry)
+            prompt_tokens, cached_tokens = server.prompt_tokens, server.cached_tokens
+            samples = []
+            for i in range(runs):
+                task = f"访问百度并搜索 LangChain {i}"
+                prompt = agent._build_prompt(task, agent._select_tools(task))
+                start = time.perf_counter()
+                first = None
+                async for _ in llm.astream(prompt):
+                    if first is None:
+                        first = time.perf_counter() - start
+                samples.append(first or 0.0)
+            prompt_tokens = server.prompt_tokens - prompt_tokens
+            results[layout] = {
+                "ttft": summarize(samples),
+                "cached_ratio": (server.cached_tokens - cached_tokens) / prompt_tokens if prompt_tokens else 0.0,
+            }
+    finally:
+        with quiet():
+            await agent.close()
+    return results
+
+
+async def bench_tool_calls(runs: int) -> Dict[str, Any]:
+    """
+    单次工具调用开销（桩服务延迟为 0）、只读调用缓存命中的开销，以及本地参数校验拒绝的开销
+
+    call_tool 使用 fresh=True 跳过只读调用缓存，测量的始终是一次完整的 MCP 往返
+    """
+    from utils.mcp_browser_tools import MCPPlaywrightAgent
+
+    agent = MCPPlaywrightAgent(stub_mcp_config())
+    with quiet():
+        await agent.initialize()
+    try:
+        async def timed(call: Callable) -> List[float]:
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                await call()
+                samples.append(time.perf_counter() - start)
+            return samples
+
+        call_samples = await timed(lambda: agent.call_tool("playwright_get_visible_text", fresh=True))
+        memo_samples = await timed(lambda: agent.call_tool("playwright_get_visible_text"))
+        reject_samples = await timed(lambda: agent.call_tool("playwright_navigate", url=123))
+    finally:
+        with quiet():
+            await agent.close()
+    return {
+        "call_tool": summarize(call_samples),
+        "memo_hit": summarize(memo_samples),
+        "validation_reject": summarize(reject_samples),
+    }
+
+
+async def bench_throughput(llm, tasks: int, concurrency: int, tool_latency: float) -> Dict[str, Any]:
+    """并发吞吐：execute_many 批量执行任务（不使用计划缓存）"""
+    from utils.mcp_browser_tools import MCPSmartBrowserAgent
+    from utils.plan_cache import PlanCache
+    from utils.session_pool import MCPSessionPool
+
+    pool = MCPSessionPool(stub_mcp_config(latency=tool_latency), min_size=concurrency, max_size=concurrency)
+    agent = MCPSmartBrowserAgent(llm, pool=pool, plan_cache=PlanCache(max_entries=0))
+    with quiet():
+        await agent.initialize()
+    task_list = [f"访问百度并搜索 LangChain {i}" for i in range(tasks)]
+    latencies = []
+    failures = 0
+    start = time.perf_counter()
+    try:
+        with quiet():
+            async for _, _, result in agent.execute_many(task_list, concurrency=concurrency):
+                latencies.append(time.perf_counter() - start)
+                if result.startswith("❌"):
+                    failures += 1
+    finally:
+        with quiet():
+            await agent.close()
+    elapsed = time.perf_counter() - start
+    return {
+        "tasks": tasks,
+        "concurrency": concurrency,
+        "elapsed": elapsed,
+        "failures": failures,
+        "tasks_per_minute": tasks / elapsed * 60 if elapsed else 0.0,
+        "completion": summarize(latencies),
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    """启动桩服务并依次运行全部基准"""
+    from utils.llm_wrapper import SiliconFlowLLM
+
+    async with StubLLMServer(
+        latency=args.llm_latency,
+        tokens_per_second=args.tokens_per_second,
+        plan_steps=args.plan_steps,
+        prefill_per_1k=args.prefill_per_1k,
+    ) as server:
+        config.SILICONFLOW_API_KEY = "benchmark"
+        config.SILICONFLOW_BASE_URL = server.base_url
+
+        metrics: Dict[str, Any] = {}
+        print("⏱️ 冷启动...")
+        metrics["cold_start"] = await bench_cold_start(args.cold_runs, args.mcp_startup)
+
+        llm = SiliconFlowLLM()
+        try:
+            print("⏱️ 计划延迟...")
+            metrics["plan_latency"] = await bench_plan_latency(llm, args.plan_runs)
+            print("⏱️ 规划 prompt 布局...")
+            metrics["prompt_layout"] = await bench_prompt_layout(llm, server, args.plan_runs)
+            print("⏱️ 工具调用开销...")
+            metrics["tool_call"] = await bench_tool_calls(args.tool_runs)
+            print("⏱️ 并发吞吐...")
+            metrics["throughput"] = await bench_throughput(
+                llm, args.tasks, args.concurrency, args.mcp_latency
+            )
+        finally:
+            await llm.aclose()
+
+    return {
+        "version": 1,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "parameters": {
+            key: getattr(args, key)
+            for key in (
+                "llm_latency", "tokens_per_second", "prefill_per_1k", "plan_steps", "mcp_latency", "mcp_startup",
+                "cold_runs", "plan_runs", "tool_runs", "tasks", "concurrency",
+            )
+        },
+        "metrics": metrics,
+    }
+
+
+def flatten(metrics: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """把嵌套指标展开为 a.b.c 形式"""
+    flat = {}
+    for key, value in metrics.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+# 参与回退检查的指标，其余指标只记录不比较
+GATED_SUFFIXES = (".p50", ".p95", ".mean", ".tasks_per_minute")
+
+
+def compare(
+    report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_delta: float = 0.001
+) -> List[str]:
+    """
+    与基线对比，返回回退项列表
+
+    吞吐类指标越大越好，其余耗时类指标越小越好；耗时变化的绝对值小于 min_delta（秒）时视为噪声。
+    """
+    current = flatten(report["metrics"])
+    previous = flatten(baseline.get("metrics", {}))
+    regressions = []
+    for name, old in previous.items():
+        if not name.endswith(GATED_SUFFIXES) or name not in current or old <= 0:
+            continue
+        new = current[name]
+        if name.endswith("tasks_per_minute"):
+            change = (old - new) / old
+        else:
+            if new - old < min_delta:
+                continue
+            change = (new - old) / old
+        if change > tolerance:
+            regressions.append(f"{name}: {old:.6f} -> {new:.6f} ({change:+.1%})")
+    return regressions
+
+
+def print_summary(report: Dict[str, Any]):
+    metrics = report["metrics"]
+    print("\n📊 基准测试结果")
+    print("-" * 40)
+    print(f"冷启动 p50:           {metrics['cold_start']['p50'] * 1000:.1f} ms")
+    print(f"计划 ainvoke p50:     {metrics['plan_latency']['ainvoke']['p50'] * 1000:.1f} ms")
+    print(f"计划首 token p50:     {metrics['plan_latency']['astream_ttft']['p50'] * 1000:.1f} ms")
+    for layout in ("inline", "prefix"):
+        result = metrics["prompt_layout"][layout]
+        print(f"{layout} 布局首 token p50: {result['ttft']['p50'] * 1000:.1f} ms（缓存命中 {result['cached_ratio']:.0%}）")
+    print(f"工具调用 p50:         {metrics['tool_call']['call_tool']['p50'] * 1e6:.0f} µs")
+    print(f"缓存命中 p50:         {metrics['tool_call']['memo_hit']['p50'] * 1e6:.0f} µs")
+    print(f"本地校验拒绝 p50:     {metrics['tool_call']['validation_reject']['p50'] * 1e6:.0f} µs")
+    print(f"并发吞吐:             {metrics['throughput']['tasks_per_minute']:.1f} 个/分钟")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LangChain MCP Demo 离线基准测试")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="LLM 桩服务首 token 延迟（秒）")
+    parser.add_argument("--tokens-per-second", type=float, default=400.0, help="LLM 桩服务生成速率")
+    parser.add_argument("--prefill-per-1k", type=float, default=0.1, help="LLM 桩服务每 1000 个未命中缓存的 prompt token 的 prefill 耗时（秒）")
+    parser.add_argument("--plan-steps", type=int, default=4, help="桩计划的步骤数")
+    parser.add_argument("--mcp-latency", type=float, default=0.02, help="吞吐测试中每次工具调用的模拟延迟（秒）")
+    parser.add_argument("--mcp-startup", type=float, default=0.0, help="MCP 桩服务模拟启动延迟（秒）")
+    parser.add_argument("--cold-runs", type=int, default=3)
+    parser.add_argument("--plan-runs", type=int, default=10)
+    parser.add_argument("--tool-runs", type=int, default=200)
+    parser.add_argument("--tasks", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--output", default=DEFAULT_REPORT, help="报告输出路径")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--compare", action="store_true", help="与基线对比，出现回退时以退出码 1 结束")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的回退比例")
+    parser.add_argument("--min-delta", type=float, default=0.001, help="耗时类指标忽略的最小绝对变化（秒）")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_summary(report)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n📝 报告已写入: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"📌 基线已保存: {args.baseline}")
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"❌ 基线文件不存在: {args.baseline}")
+            sys.exit(2)
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"❌ 发现 {len(regressions)} 项性能回退（容差 {args.tolerance:.0%}）:")
+            for item in regressions:
+                print(f"  • {item}")
+            sys.exit(1)
+        print("✅ 未发现性能回退")
+
+
+if __name__ == "__main__":
+    main()
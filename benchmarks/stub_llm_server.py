@@ -0,0 +1,194 @@
+"""
+离线基准测试用的 OpenAI 兼容 LLM 桩服务
+支持配置首 token 延迟、token 速率和流式输出，返回固定的浏览器执行计划；
+可模拟 prefill 耗时和前缀缓存：最后一条消息之前的消息与之前的请求相同时视为命中缓存，只为未命中的 token 计算 prefill
+
+单独运行: python -m benchmarks.stub_llm_server --port 18080 --latency 0.2 --tokens-per-second 200
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+
+def build_plan(steps: int = 4) -> str:
+    """生成包含指定步骤数的执行计划文本"""
+    plan_steps: List[Dict[str, Any]] = [
+        {"action": "playwright_navigate", "params": {"url": "https://www.baidu.com"}}
+    ]
+    for i in range(max(steps - 1, 0)):
+        if i % 3 == 0:
+            plan_steps.append({"action": "playwright_fill", "params": {"selector": "#kw", "value": "LangChain"}})
+        elif i % 3 == 1:
+            plan_steps.append({"action": "playwright_click", "params": {"selector": "#su"}})
+        else:
+            plan_steps.append({"action": "playwright_get_visible_text", "params": {}})
+    plan = {"description": "访问百度并搜索 LangChain", "steps": plan_steps}
+    return "```json\n" + json.dumps(plan, ensure_ascii=False, indent=2) + "\n```"
+
+
+class StubLLMServer:
+    """可在进程内启动的 LLM 桩服务"""
+
+    def __init__(
+        self,
+        latency: float = 0.2,
+        tokens_per_second: float = 200.0,
+        chars_per_token: int = 4,
+        plan_steps: int = 4,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        prefill_per_1k: float = 0.0,
+    ):
+        """
+        Args:
+            latency: 首 token（或非流式完整响应前）的延迟（秒）
+            tokens_per_second: 生成速率，0 表示不限速
+            chars_per_token: 每个 token 的字符数，用于切分流式输出
+            plan_steps: 返回计划中的步骤数
+            host: 监听地址
+            port: 监听端口，0 表示随机端口
+            prefill_per_1k: 每 1000 个未命中缓存的 prompt token 额外增加的首 token 延迟（秒）
+        """
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.chars_per_token = chars_per_token
+        self.content = build_plan(plan_steps)
+        self.host = host
+        self.port = port
+        self.prefill_per_1k = prefill_per_1k
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._prefixes = set()
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def _tokens(self) -> List[str]:
+        step = self.chars_per_token
+        return [self.content[i:i + step] for i in range(0, len(self.content), step)]
+
+    def _prefill(self, messages: List[Dict[str, Any]]) -> Dict[str, int]:
+        """统计 prompt token 数和命中前缀缓存的 token 数，并记住本次请求的前缀"""
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in messages)
+        prefix = messages[:-1]
+        cached_chars = 0
+        if prefix:
+            key = hashlib.sha256(json.dumps(prefix, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+            if key in self._prefixes:
+                cached_chars = sum(len(str(m.get("content", ""))) for m in prefix)
+            self._prefixes.add(key)
+        prompt_tokens = max(prompt_chars // self.chars_per_token, 1)
+        cached_tokens = cached_chars // self.chars_per_token
+        self.prompt_tokens += prompt_tokens
+        self.cached_tokens += cached_tokens
+        return {"prompt_tokens": prompt_tokens, "cached_tokens": cached_tokens}
+
+    def _usage(self, prefill: Dict[str, int]) -> Dict[str, Any]:
+        completion_tokens = len(self._tokens())
+        prompt_tokens = prefill["prompt_tokens"]
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": prefill["cached_tokens"]},
+        }
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        body = await request.json()
+        prefill = self._prefill(body.get("messages", []))
+        tokens = self._tokens()
+        delay = 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+        uncached = prefill["prompt_tokens"] - prefill["cached_tokens"]
+        await asyncio.sleep(self.latency + self.prefill_per_1k * uncached / 1000)
+
+        if not body.get("stream"):
+            await asyncio.sleep(delay * len(tokens))
+            return web.json_response({
+                "id": "stub",
+                "object": "chat.completion",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self.content}, "finish_reason": "stop"}],
+                "usage": self._usage(prefill),
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for token in tokens:
+            chunk = {"id": "stub", "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": token}}]}
+            await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            if delay:
+                await asyncio.sleep(delay)
+        final = {"id": "stub", "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                 "usage": self._usage(prefill)}
+        await response.write(f"data: {json.dumps(final)}\n\n".encode("utf-8"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        if self.port == 0:
+            self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+
+async def _serve(args):
+    server = StubLLMServer(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        plan_steps=args.steps,
+        host=args.host,
+        port=args.port,
+        prefill_per_1k=args.prefill_per_1k,
+    )
+    await server.start()
+    print(f"✅ LLM 桩服务已启动: {server.base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 兼容的 LLM 桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--latency", type=float, default=0.2, help="首 token 延迟（秒）")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="生成速率，0 表示不限速")
+    parser.add_argument("--steps", type=int, default=4, help="返回计划中的步骤数")
+    parser.add_argument("--prefill-per-1k", type=float, default=0.0, help="每 1000 个未命中缓存的 prompt token 的 prefill 耗时（秒）")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+离线基准测试用的 Playwright MCP 桩服务（stdio 传输）
+实现与 @executeautomation/playwright-mcp-server 同名的常用工具，不启动真实浏览器
+
+环境变量:
+    STUB_MCP_LATENCY: 每次工具调用的模拟延迟（秒），默认 0
+    STUB_MCP_STARTUP: 服务启动时的模拟延迟（秒，模拟浏览器启动），默认 0
+
+运行: python -m benchmarks.stub_mcp_server
+"""
+
+import asyncio
+import os
+import time
+
+from mcp.server.fastmcp import FastMCP
+
+LATENCY = float(os.getenv("STUB_MCP_LATENCY", "0"))
+STARTUP = float(os.getenv("STUB_MCP_STARTUP", "0"))
+
+mcp = FastMCP("playwright-stub", log_level="WARNING")
+
+_state = {"url": "about:blank", "version": 0}
+
+
+async def _delay():
+    if LATENCY:
+        await asyncio.sleep(LATENCY)
+
+
+def _mutate():
+    _state["version"] += 1
+
+
+@mcp.tool()
+async def playwright_navigate(url: str, browserType: str = "chromium", width: int = 1280, height: int = 720,
+                              timeout: int = 30000, waitUntil: str = "load", headless: bool = False) -> str:
+    """Navigate to a URL"""
+    await _delay()
+    _state["url"] = url
+    _mutate()
+    return f"Navigated to {url}"
+
+
+@mcp.tool()
+async def playwright_screenshot(name: str, selector: str = "", width: int = 800, height: int = 600,
+                                storeBase64: bool = True, fullPage: bool = False, savePng: bool = False,
+                                downloadsDir: str = "") -> str:
+    """Take a screenshot of the current page or a specific element"""
+    await _delay()
+    return f"Screenshot '{name}' taken at 800x600"
+
+
+@mcp.tool()
+async def playwright_click(selector: str) -> str:
+    """Click an element on the page"""
+    await _delay()
+    _mutate()
+    return f"Clicked element: {selector}"
+
+
+@mcp.tool()
+async def playwright_fill(selector: str, value: str) -> str:
+    """fill out an input field"""
+    await _delay()
+    _mutate()
+    return f"Filled {selector} with: {value}"
+
+
+@mcp.tool()
+async def playwright_select(selector: str, value: str) -> str:
+    """Select an element on the page with Select tag"""
+    await _delay()
+    _mutate()
+    return f"Selected {selector} with: {value}"
+
+
+@mcp.tool()
+async def playwright_hover(selector: str) -> str:
+    """Hover an element on the page"""
+    await _delay()
+    return f"Hovered {selector}"
+
+
+@mcp.tool()
+async def playwright_press_key(key: str, selector: str = "") -> str:
+    """Press a keyboard key"""
+    await _delay()
+    _mutate()
+    return f"Pressed key: {key}"
+
+
+@mcp.tool()
+async def playwright_evaluate(script: str) -> str:
+    """Execute JavaScript in the browser console"""
+    await _delay()
+    # 桩服务不执行脚本，条件等待直接视为满足
+    return f"Executed JavaScript:\n{script}\n\nResult:\n__WAIT_OK__"
+
+
+@mcp.tool()
+async def playwright_get_visible_text(random_string: str = "") -> str:
+    """Get the visible text content of the current page"""
+    await _delay()
+    return f"Visible text content:\n{_state['url']} 页面内容 (version {_state['version']})"
+
+
+@mcp.tool()
+async def playwright_get_visible_html(random_string: str = "") -> str:
+    """Get the HTML content of the current page"""
+    await _delay()
+    return f"HTML content:\n<html><body><p>{_state['url']}</p></body></html>"
+
+
+@mcp.tool()
+async def playwright_go_back(random_string: str = "") -> str:
+    """Navigate back in browser history"""
+    await _delay()
+    _mutate()
+    return "Navigated back in browser history"
+
+
+@mcp.tool()
+async def playwright_close(random_string: str = "") -> str:
+    """Close the browser and release all resources"""
+    await _delay()
+    return "Browser closed successfully"
+
+
+if __name__ == "__main__":
+    if STARTUP:
+        time.sleep(STARTUP)
+    mcp.run()
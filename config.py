@@ -16,6 +16,140 @@ class Config:
     TEMPERATURE = float(os.getenv("TEMPERATURE", "0.7"))
     MAX_TOKENS = int(os.getenv("MAX_TOKENS", "1000"))
     
+    # HTTP 连接池配置
+    HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+    HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+    HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+    
+    # 计划缓存配置
+    PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "256"))
+    PLAN_CACHE_TTL = float(os.getenv("PLAN_CACHE_TTL", "86400"))
+    PLAN_CACHE_PATH = os.getenv("PLAN_CACHE_PATH", "")
+    PLAN_CACHE_SAVE_DELAY = float(os.getenv("PLAN_CACHE_SAVE_DELAY", "1.0"))
+    PLAN_CACHE_MIN_LITERAL = int(os.getenv("PLAN_CACHE_MIN_LITERAL", "3"))
+    
+    # MCP 会话池配置
+    MCP_POOL_MIN_SIZE = int(os.getenv("MCP_POOL_MIN_SIZE", "1"))
+    MCP_POOL_MAX_SIZE = int(os.getenv("MCP_POOL_MAX_SIZE", "1"))
+    MCP_POOL_IDLE_TIMEOUT = float(os.getenv("MCP_POOL_IDLE_TIMEOUT", "300"))
+    MCP_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("MCP_POOL_HEALTH_CHECK_INTERVAL", "30"))
+    
+    # 批量任务并发配置
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    
+    # 交互模式任务队列配置：同时执行的任务数
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    
+    # LLM 限流配置（0 表示不限）
+    LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+    LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    
+    # LLM 超时、重试和对冲配置（秒）
+    LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+    LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+    LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+    LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+    LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+    LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+    LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+    LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))
+    
+    # 条件等待配置
+    WAIT_DEFAULT_TIMEOUT = float(os.getenv("WAIT_DEFAULT_TIMEOUT", "10"))
+    WAIT_MAX_TIMEOUT = float(os.getenv("WAIT_MAX_TIMEOUT", "30"))
+    WAIT_POLL_INITIAL = float(os.getenv("WAIT_POLL_INITIAL", "0.05"))
+    WAIT_POLL_MAX = float(os.getenv("WAIT_POLL_MAX", "1.0"))
+    WAIT_POLL_BACKOFF = float(os.getenv("WAIT_POLL_BACKOFF", "1.5"))
+    WAIT_NETWORK_IDLE_QUIET = float(os.getenv("WAIT_NETWORK_IDLE_QUIET", "0.5"))
+    
+    # 日志与指标配置
+    VERBOSE = os.getenv("VERBOSE", "true").lower() in ("1", "true", "yes")
+    METRICS_PATH = os.getenv("METRICS_PATH", "")
+    
+    # 工具 schema 缓存配置
+    TOOL_SCHEMA_CACHE_PATH = os.getenv("TOOL_SCHEMA_CACHE_PATH", ".cache/tool_schemas.json")
+    
+    # 工具目录裁剪配置
+    TOOL_PRUNING = os.getenv("TOOL_PRUNING", "true").lower() in ("1", "true", "yes")
+    TOOL_TOP_K = int(os.getenv("TOOL_TOP_K", "6"))
+    TOOL_CATALOG_TOKEN_BUDGET = int(os.getenv("TOOL_CATALOG_TOKEN_BUDGET", "1200"))
+    TOOL_CORE_SET = [
+        name.strip()
+        for name in os.getenv(
+            "TOOL_CORE_SET",
+            "playwright_navigate,playwright_click,playwright_fill,playwright_screenshot,playwright_get_visible_text"
+        ).split(",")
+        if name.strip()
+    ]
+    
+    # 结构化输出规划配置
+    # 为空表示自由文本；json_object 要求模型返回 JSON 对象；json_schema 按计划 schema 约束输出
+    PLAN_RESPONSE_FORMAT = os.getenv("PLAN_RESPONSE_FORMAT", "").strip().lower()
+    
+    # 产物存储配置（目录留空则工具结果全部内联）
+    ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", ".cache/artifacts")
+    ARTIFACT_INLINE_LIMIT = int(os.getenv("ARTIFACT_INLINE_LIMIT", "2000"))
+    ARTIFACT_MAX_BYTES = int(os.getenv("ARTIFACT_MAX_BYTES", str(20 * 1024 * 1024)))
+    ARTIFACT_STORE_MAX_BYTES = int(os.getenv("ARTIFACT_STORE_MAX_BYTES", str(512 * 1024 * 1024)))
+    
+    # 只读工具调用缓存配置（TTL 为 0 表示不过期）
+    TOOL_MEMO_ENABLED = os.getenv("TOOL_MEMO_ENABLED", "true").lower() in ("1", "true", "yes")
+    TOOL_MEMO_SIZE = int(os.getenv("TOOL_MEMO_SIZE", "64"))
+    TOOL_MEMO_TTL = float(os.getenv("TOOL_MEMO_TTL", "30"))
+    TOOL_MEMO_READ_ONLY = [
+        name.strip()
+        for name in os.getenv(
+            "TOOL_MEMO_READ_ONLY",
+            "playwright_get_visible_text,playwright_get_visible_html,playwright_screenshot"
+        ).split(",")
+        if name.strip()
+    ]
+    
+    # 失败恢复配置：步骤失败后从当前页面重新规划剩余步骤的次数上限（0 表示不重新规划，继续执行剩余步骤）
+    REPLAN_MAX_ATTEMPTS = int(os.getenv("REPLAN_MAX_ATTEMPTS", "2"))
+    REPLAN_PAGE_DIGEST_CHARS = int(os.getenv("REPLAN_PAGE_DIGEST_CHARS", "1500"))
+    
+    # 多服务器路由配置
+    MCP_SERVERS_FILE = os.getenv("MCP_SERVERS_FILE", "")
+    MCP_SERVER_MAX_FAILURES = int(os.getenv("MCP_SERVER_MAX_FAILURES", "3"))
+    MCP_SERVER_EJECT_SECONDS = float(os.getenv("MCP_SERVER_EJECT_SECONDS", "30"))
+    
+    # 共享浏览器守护进程配置
+    # 设置 MCP_DAEMON_URL 后客户端连接守护进程，不再各自启动 stdio 服务器
+    MCP_DAEMON_URL = os.getenv("MCP_DAEMON_URL", "")
+    MCP_DAEMON_HOST = os.getenv("MCP_DAEMON_HOST", "127.0.0.1")
+    MCP_DAEMON_PORT = int(os.getenv("MCP_DAEMON_PORT", "8931"))
+    MCP_DAEMON_TRANSPORT = os.getenv("MCP_DAEMON_TRANSPORT", "streamable_http")
+    MCP_DAEMON_BROWSER = os.getenv("MCP_DAEMON_BROWSER", "chromium")
+    MCP_DAEMON_HEADLESS = os.getenv("MCP_DAEMON_HEADLESS", "true").lower() in ("1", "true", "yes")
+    MCP_DAEMON_CONTEXT_IDLE = float(os.getenv("MCP_DAEMON_CONTEXT_IDLE", "600"))
+    MCP_DAEMON_MAX_CONTEXTS = int(os.getenv("MCP_DAEMON_MAX_CONTEXTS", "32"))
+    MCP_DAEMON_PID_FILE = os.getenv("MCP_DAEMON_PID_FILE", ".cache/mcp_daemon.pid")
+    MCP_DAEMON_LOG_FILE = os.getenv("MCP_DAEMON_LOG_FILE", ".cache/mcp_daemon.log")
+    
+    # 规划模型路由配置
+    # PLAN_SMALL_MODEL 为空表示不路由；复杂度低于阈值的任务使用小模型，计划不符合格式时升级到大模型
+    PLAN_SMALL_MODEL = os.getenv("PLAN_SMALL_MODEL", "")
+    PLAN_SMALL_MAX_TOKENS = int(os.getenv("PLAN_SMALL_MAX_TOKENS", "600"))
+    PLAN_LARGE_MODEL = os.getenv("PLAN_LARGE_MODEL", "")
+    PLAN_LARGE_MAX_TOKENS = int(os.getenv("PLAN_LARGE_MAX_TOKENS", "0"))
+    PLAN_COMPLEXITY_THRESHOLD = int(os.getenv("PLAN_COMPLEXITY_THRESHOLD", "4"))
+    
+    # 规划 prompt 布局配置
+    # prefix 为固定系统前缀（说明、完整工具目录、示例）+ 任务用户消息，可命中服务端前缀缓存，但不按任务裁剪工具目录；
+    # inline 为单条文本（TOOL_PRUNING 开启时按任务裁剪工具目录）
+    PLAN_PROMPT_LAYOUT = os.getenv("PLAN_PROMPT_LAYOUT", "inline").strip().lower()
+    
+    # 推测导航配置：规划期间先导航到任务中最可能的目标网址，SITE_ALIASES_FILE 为补充站点别名表的 JSON 文件
+    SPECULATIVE_NAVIGATION = os.getenv("SPECULATIVE_NAVIGATION", "false").lower() in ("1", "true", "yes")
+    SITE_ALIASES_FILE = os.getenv("SITE_ALIASES_FILE", "")
+    
+    # 截止时间配置（秒，0 表示不限）：TASK_DEADLINE 为整个任务的时限，MCP_CALL_TIMEOUT 为单次工具调用的时限
+    TASK_DEADLINE = float(os.getenv("TASK_DEADLINE", "0"))
+    MCP_CALL_TIMEOUT = float(os.getenv("MCP_CALL_TIMEOUT", "0"))
+    
     @classmethod
     def validate(cls):
         """验证配置"""
@@ -0,0 +1,152 @@
+"""
+共享浏览器守护进程启动器
+在本机后台运行一个常驻的 Playwright MCP 服务器，多个工作进程通过 streamable-HTTP/SSE 共享同一个浏览器
+
+用法:
+    python mcp_daemon.py start    # 后台启动，等待端口就绪后返回
+    python mcp_daemon.py status   # 查看运行状态和浏览器上下文数量
+    python mcp_daemon.py stop     # 停止守护进程
+    python mcp_daemon.py serve    # 前台运行（调试或交给 systemd 等进程管理器）
+
+启动后设置 MCP_DAEMON_URL 为输出的地址，MCPPlaywrightAgent 即连接守护进程而不再各自启动服务器
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Optional
+
+from config import config
+from utils.browser_daemon import TRANSPORT_PATHS, daemon_url, serve
+
+
+def _read_pid() -> Optional[int]:
+    """读取 PID 文件，进程已不存在时删除文件并返回 None"""
+    try:
+        with open(config.MCP_DAEMON_PID_FILE, "r", encoding="utf-8") as f:
+            pid = int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        os.remove(config.MCP_DAEMON_PID_FILE)
+        return None
+    except PermissionError:
+        pass
+    return pid
+
+
+def _port_open(host: str, port: int) -> bool:
+    try:
+        with socket.create_connection((host, port), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+
+def _status(host: str, port: int) -> Optional[dict]:
+    """读取守护进程的 /status，未运行时返回 None"""
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}/status", timeout=2) as response:
+            return json.loads(response.read().decode("utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def start(args) -> int:
+    pid = _read_pid()
+    if pid is not None:
+        print(f"✅ 守护进程已在运行 (PID {pid}): {daemon_url(args.host, args.port, args.transport)}")
+        return 0
+    if _port_open(args.host, args.port):
+        print(f"❌ 端口 {args.host}:{args.port} 已被占用")
+        return 1
+
+    for path in (config.MCP_DAEMON_PID_FILE, config.MCP_DAEMON_LOG_FILE):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    command = [
+        sys.executable, os.path.abspath(__file__), "serve",
+        "--host", args.host, "--port", str(args.port), "--transport", args.transport,
+    ]
+    with open(config.MCP_DAEMON_LOG_FILE, "ab") as log:
+        # 新会话中运行，启动器退出或终端关闭时守护进程不受影响
+        process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+    with open(config.MCP_DAEMON_PID_FILE, "w", encoding="utf-8") as f:
+        f.write(str(process.pid))
+
+    deadline = time.monotonic() + args.timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            os.remove(config.MCP_DAEMON_PID_FILE)
+            print(f"❌ 守护进程启动失败（退出码 {process.returncode}），日志: {config.MCP_DAEMON_LOG_FILE}")
+            print("💡 首次使用需要安装浏览器: python -m playwright install chromium")
+            return 1
+        if _port_open(args.host, args.port):
+            url = daemon_url(args.host, args.port, args.transport)
+            print(f"✅ 守护进程已启动 (PID {process.pid}): {url}")
+            print(f"💡 设置 MCP_DAEMON_URL={url} 让工作进程共享该浏览器")
+            return 0
+        time.sleep(0.2)
+    print(f"⚠️ 守护进程在 {args.timeout:.0f} 秒内未就绪，日志: {config.MCP_DAEMON_LOG_FILE}")
+    return 1
+
+
+def stop(args) -> int:
+    pid = _read_pid()
+    if pid is None:
+        print("ℹ️ 守护进程未运行")
+        return 0
+    os.kill(pid, signal.SIGTERM)
+    deadline = time.monotonic() + args.timeout
+    while time.monotonic() < deadline and _read_pid() is not None:
+        time.sleep(0.2)
+    if _read_pid() is not None:
+        print(f"⚠️ 守护进程未在 {args.timeout:.0f} 秒内退出，强制结束")
+        os.kill(pid, signal.SIGKILL)
+    if os.path.exists(config.MCP_DAEMON_PID_FILE):
+        os.remove(config.MCP_DAEMON_PID_FILE)
+    print(f"✅ 守护进程已停止 (PID {pid})")
+    return 0
+
+
+def status(args) -> int:
+    pid = _read_pid()
+    stats = _status(args.host, args.port)
+    if stats is None:
+        print("ℹ️ 守护进程未运行" if pid is None else f"⚠️ 进程存在 (PID {pid}) 但服务无响应")
+        return 1
+    print(f"✅ 守护进程运行中{f' (PID {pid})' if pid else ''}: {daemon_url(args.host, args.port, args.transport)}")
+    print(f"  浏览器: {stats['browser']} ({'已连接' if stats['connected'] else '已断开'})")
+    print(f"  浏览器上下文: {stats['contexts']}/{stats['max_contexts']}，累计创建 {stats['contexts_created']} 个")
+    print(f"  运行时间: {stats['uptime']:.0f} 秒")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="共享浏览器守护进程")
+    parser.add_argument("command", choices=["start", "stop", "status", "serve"])
+    parser.add_argument("--host", default=config.MCP_DAEMON_HOST)
+    parser.add_argument("--port", type=int, default=config.MCP_DAEMON_PORT)
+    parser.add_argument("--transport", choices=list(TRANSPORT_PATHS), default=config.MCP_DAEMON_TRANSPORT)
+    parser.add_argument("--timeout", type=float, default=30, help="start/stop 等待的最长时间（秒）")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        try:
+            asyncio.run(serve(args.host, args.port, args.transport))
+        except KeyboardInterrupt:
+            pass
+        return
+    sys.exit({"start": start, "stop": stop, "status": status}[args.command](args))
+
+
+if __name__ == "__main__":
+    main()
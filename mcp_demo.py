@@ -4,51 +4,95 @@ LangChain MCP Adapters + Playwright MCP 浏览器操作演示
 """
 
 import sys
+import time
 import asyncio
-from utils.llm_wrapper import create_llm
-from utils.mcp_browser_tools import create_mcp_browser_agent, MCPPlaywrightAgent
+import threading
+from config import config
+from utils.tracing import tracer
 
 
-async def demo_mcp_basic_operations():
+def _import_heavy_modules():
+    """导入 LangChain 等耗时的依赖"""
+    import utils.llm_wrapper  # noqa: F401
+    import langchain_mcp_adapters.client  # noqa: F401
+    import langchain_mcp_adapters.tools  # noqa: F401
+
+
+async def prewarm():
+    """后台导入依赖并预热 MCP 会话池（启动服务器和浏览器），与用户输入并行进行"""
+    await asyncio.to_thread(_import_heavy_modules)
+    from utils.session_pool import MCPSessionPool
+    pool = MCPSessionPool()
+    pool.prewarm()
+    return pool
+
+
+async def ainput(prompt: str = "") -> str:
+    """在后台线程读取输入，等待输入期间事件循环中的预热任务可以继续执行"""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    
+    def deliver(value, error):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+            
+    def read():
+        try:
+            value = input(prompt)
+        except Exception as e:
+            loop.call_soon_threadsafe(deliver, None, e)
+        else:
+            loop.call_soon_threadsafe(deliver, value, None)
+            
+    # 守护线程不会阻止进程退出
+    threading.Thread(target=read, daemon=True).start()
+    return await future
+
+
+async def demo_mcp_basic_operations(pool):
     """演示 MCP 基础浏览器操作"""
     print("🔧 MCP Playwright 基础操作演示")
     print("-" * 40)
     
     try:
-        # 创建基础 MCP 代理（无需 LLM）
-        agent = MCPPlaywrightAgent()
-        
-        # 测试基础操作
-        operations = [
-            ("导航到百度", "playwright_navigate", {"url": "https://www.baidu.com"}),
-            ("获取页面文本", "playwright_get_visible_text", {"random_string": "dummy"}),
-            ("截图", "playwright_screenshot", {"name": "baidu_homepage", "savePng": True}),
-        ]
-        
-        for desc, tool_name, params in operations:
-            print(f"\n🔄 执行: {desc}")
-            try:
-                result = await agent.call_tool(tool_name, **params)
-                print(result)
-            except Exception as e:
-                print(f"❌ 操作失败: {e}")
-        
-        await agent.close()
-        
+        # 从会话池租用基础 MCP 代理（无需 LLM）
+        async with pool.lease() as agent:
+            # 测试基础操作
+            operations = [
+                ("导航到百度", "playwright_navigate", {"url": "https://www.baidu.com"}),
+                ("获取页面文本", "playwright_get_visible_text", {"random_string": "dummy"}),
+                ("截图", "playwright_screenshot", {"name": "baidu_homepage", "savePng": True}),
+            ]
+            
+            for desc, tool_name, params in operations:
+                print(f"\n🔄 执行: {desc}")
+                try:
+                    result = await agent.call_tool(tool_name, **params)
+                    print(result)
+                except Exception as e:
+                    print(f"❌ 操作失败: {e}")
+                    
     except Exception as e:
         print(f"❌ MCP 基础操作演示失败: {e}")
         print("💡 请确保已安装: npm install -g @executeautomation/playwright-mcp-server")
 
 
-async def demo_mcp_smart_operations():
+async def demo_mcp_smart_operations(pool):
     """演示 MCP 智能浏览器操作"""
+    from utils.llm_wrapper import create_llm
+    from utils.mcp_browser_tools import create_mcp_browser_agent
+    
     print("🤖 MCP 智能浏览器操作演示")
     print("-" * 40)
     
     try:
-        # 创建智能 MCP 代理（需要 LLM）
+        # 创建智能 MCP 代理（需要 LLM），复用后台预热的会话池
         llm = create_llm()
-        agent = create_mcp_browser_agent(llm)
+        agent = create_mcp_browser_agent(llm, pool=pool)
         
         # 测试智能任务
         smart_tasks = [
@@ -60,63 +104,164 @@ async def demo_mcp_smart_operations():
             print("=" * 50)
             
             try:
-                result = await agent.execute_smart_task(task)
-                print(result)
+                # 每个步骤完成后立即输出结果，截图等大块内容只输出产物引用
+                async for event in agent.stream_smart_task(task):
+                    if event.kind != "step_started":
+                        print(event)
             except Exception as e:
                 print(f"❌ 智能任务执行失败: {e}")
-            
+                
             print("\n" + "="*50 + "\n")
-        
+            
         await agent.close()
+        await llm.aclose()
         
     except Exception as e:
         print(f"❌ MCP 智能操作演示失败: {e}")
 
 
-async def interactive_mcp_mode():
-    """交互式 MCP 浏览器模式"""
+async def demo_mcp_batch_mode(pool):
+    """批量 MCP 任务模式：并发执行多个任务，按完成顺序输出结果"""
+    from utils.llm_wrapper import create_llm
+    from utils.mcp_browser_tools import create_mcp_browser_agent
+    
+    print("📦 MCP 批量任务模式")
+    print("-" * 40)
+    
+    path = (await ainput("请输入任务文件路径（每行一个任务，直接回车则逐行输入）: ")).strip()
+    if path:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                tasks = [line.strip() for line in f if line.strip()]
+        except OSError as e:
+            print(f"❌ 读取任务文件失败: {e}")
+            return
+    else:
+        print("请逐行输入任务，空行结束:")
+        tasks = []
+        while True:
+            line = (await ainput("  > ")).strip()
+            if not line:
+                break
+            tasks.append(line)
+            
+    if not tasks:
+        print("❌ 没有任务")
+        return
+        
+    concurrency = (await ainput("并发数（直接回车使用默认值）: ")).strip()
+    concurrency = int(concurrency) if concurrency.isdigit() else None
+    
+    try:
+        llm = create_llm()
+        agent = create_mcp_browser_agent(llm, pool=pool)
+        
+        start = time.monotonic()
+        done = 0
+        async for index, task, result in agent.execute_many(tasks, concurrency=concurrency):
+            done += 1
+            print(f"\n✅ [{done}/{len(tasks)}] 任务 {index + 1}: {task}")
+            print(result)
+            print("=" * 50)
+            
+        elapsed = time.monotonic() - start
+        print(f"\n📊 共完成 {done} 个任务，耗时 {elapsed:.1f} 秒，吞吐 {done / elapsed * 60:.1f} 个/分钟")
+        if agent.speculator.enabled:
+            stats = agent.speculation_stats()
+            print(f"🔮 推测导航命中 {stats['hits']}/{stats['started']} 次，节省 {stats['saved_seconds']:.1f} 秒")
+        
+        await agent.close()
+        await llm.aclose()
+        
+    except Exception as e:
+        print(f"❌ MCP 批量任务模式失败: {e}")
+
+
+def _job_id(argument: str):
+    """解析命令中的任务编号，支持 3 和 #3 两种写法"""
+    argument = argument.strip().lstrip("#")
+    return int(argument) if argument.isdigit() else None
+
+
+def _print_job_help():
+    print("命令:")
+    print("  jobs              列出所有任务")
+    print("  status <编号>     查看任务状态")
+    print("  cancel <编号>     取消排队中或执行中的任务")
+    print("  help              显示帮助")
+    print("  quit / exit       退出（取消未完成的任务）")
+    print("其他输入会作为任务提交，提交后可以继续输入下一个任务\n")
+
+
+async def interactive_mcp_mode(pool):
+    """交互式 MCP 浏览器模式：任务提交到队列后在后台执行，执行期间可以继续输入"""
+    from utils.job_queue import STATE_LABELS, JobQueue
+    from utils.llm_wrapper import create_llm
+    from utils.mcp_browser_tools import create_mcp_browser_agent
+    
     print("\n" + "=" * 60)
     print("🤖 交互式 MCP AI 浏览器助手")
     print("基于 Model Context Protocol (MCP) 的智能浏览器操作")
     print("支持的任务类型:")
     print("  • 智能任务: '访问百度并搜索人工智能'")
-    print("输入 'quit' 或 'exit' 退出\n")
-
+    _print_job_help()
+    
     try:
-        # 创建智能 MCP 代理
+        # 创建智能 MCP 代理，浏览器在用户输入期间继续在后台启动
         llm = create_llm()
-        smart_agent = create_mcp_browser_agent(llm)
-        basic_agent = MCPPlaywrightAgent()
+        smart_agent = create_mcp_browser_agent(llm, pool=pool)
+        jobs = JobQueue(smart_agent.stream_smart_task)
+        jobs.start()
         
         while True:
             try:
-                user_input = input("👤 请输入命令或描述任务: ").strip()
+                user_input = (await ainput("👤 请输入命令或描述任务: ")).strip()
+                command, _, argument = user_input.partition(" ")
+                command = command.lower()
                 
-                if user_input.lower() in ['quit', 'exit', '退出']:
+                if command in ['quit', 'exit', '退出']:
+                    pending = jobs.pending()
+                    if pending:
+                        print(f"🚫 取消 {len(pending)} 个未完成的任务")
                     print("👋 再见！")
                     break
-
+                    
                 if not user_input:
                     continue
-                
-                print("🤖 MCP AI 正在处理...")
-                print("=" * 50)
-
-                result = await smart_agent.execute_smart_task(user_input)
-                
-                print(result)
-                print("=" * 50)
-                print()
-                
-            except KeyboardInterrupt:
+                    
+                if command in ['jobs', 'list'] and not argument:
+                    for job in jobs.list():
+                        print(job.summary())
+                    if not jobs.jobs:
+                        print("ℹ️ 还没有提交任务")
+                elif command in ['status', 'cancel'] and _job_id(argument) is not None:
+                    job = jobs.get(_job_id(argument))
+                    if job is None:
+                        print(f"❌ 任务 {argument} 不存在")
+                    elif command == 'status':
+                        print("\n".join(job.details()))
+                    elif jobs.cancel(job.id):
+                        print(f"🚫 正在取消任务 #{job.id}")
+                    else:
+                        print(f"ℹ️ 任务 #{job.id} 已结束: {STATE_LABELS[job.state]}")
+                elif command in ['status', 'cancel'] and not argument:
+                    print(f"❌ 请提供任务编号，例如 {command} 1")
+                elif command == 'help' and not argument:
+                    _print_job_help()
+                else:
+                    job = jobs.submit(user_input)
+                    print(f"📥 已提交任务 #{job.id}，当前共有 {len(jobs.pending())} 个未完成的任务")
+                    
+            except (KeyboardInterrupt, EOFError):
                 print("\n👋 再见！")
                 break
             except Exception as e:
                 print(f"❌ 发生错误: {e}")
                 print()
-        
+                
+        await jobs.close()
         await smart_agent.close()
-        await basic_agent.close()
+        await llm.aclose()
         
     except Exception as e:
         print(f"❌ 交互模式失败: {e}")
@@ -127,29 +272,42 @@ async def main():
     print("🚀 LangChain MCP Adapters + Playwright MCP 演示")
     print("=" * 60)
     
+    # 进程启动后立即在后台导入依赖并启动浏览器，用户选择模式和输入任务时预热继续进行
+    startup = asyncio.create_task(prewarm())
+    
     try:
         print("\n📋 选择演示模式:")
         print("1. MCP 基础操作演示")
-        print("2. MCP 智能任务演示") 
+        print("2. MCP 智能任务演示")
         print("3. 交互式 MCP 模式")
+        print("4. MCP 批量任务模式")
         
-        choice = input("请选择模式 (1-3): ").strip()
+        choice = (await ainput("请选择模式 (1-4): ")).strip()
         
         if choice == "1":
-            await demo_mcp_basic_operations()
+            await demo_mcp_basic_operations(await startup)
         elif choice == "2":
-            await demo_mcp_smart_operations()
+            await demo_mcp_smart_operations(await startup)
         elif choice == "3":
-            await interactive_mcp_mode()
+            await interactive_mcp_mode(await startup)
+        elif choice == "4":
+            await demo_mcp_batch_mode(await startup)
         else:
             print("❌ 无效选择")
             return
-    
+            
     except Exception as e:
         print(f"❌ Demo 运行失败: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        pool = (await asyncio.gather(startup, return_exceptions=True))[0]
+        if not isinstance(pool, BaseException):
+            await pool.close()
+        if config.METRICS_PATH:
+            tracer.export(config.METRICS_PATH)
+            print(f"📊 指标已导出: {config.METRICS_PATH}")
 
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main())
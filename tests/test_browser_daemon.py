@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("mcp")
+
+from mcp.shared.memory import create_connected_server_and_client_session  # noqa: E402
+
+from utils.browser_daemon import BrowserDaemon, build_server  # noqa: E402
+
+
+class FakePage:
+    def __init__(self):
+        self.url = "about:blank"
+
+    def is_closed(self):
+        return False
+
+    async def goto(self, url, **kwargs):
+        await asyncio.sleep(0)
+        self.url = url
+
+
+class FakeContext:
+    def __init__(self):
+        self.closed = False
+
+    async def new_page(self):
+        return FakePage()
+
+    async def close(self):
+        await asyncio.sleep(0.01)
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+
+    def is_connected(self):
+        return True
+
+    async def new_context(self):
+        context = FakeContext()
+        self.contexts.append(context)
+        return context
+
+
+def make_daemon():
+    daemon = BrowserDaemon(browser_type="chromium", headless=True, idle_timeout=0, max_contexts=2)
+    daemon.browser = FakeBrowser()
+    return daemon
+
+
+def test_context_released_when_session_ends():
+    daemon = make_daemon()
+    server = build_server(daemon, "127.0.0.1", 0)
+
+    async def run():
+        async with create_connected_server_and_client_session(server) as session:
+            await session.call_tool("playwright_navigate", {"url": "https://example.com"})
+            assert daemon.stats()["contexts"] == 1
+        # 客户端没有调用 playwright_close 就断开
+        assert daemon.stats()["contexts"] == 0
+        assert all(context.closed for context in daemon.browser.contexts)
+
+    asyncio.run(run())
+
+
+def test_sessions_get_separate_contexts():
+    daemon = make_daemon()
+    server = build_server(daemon, "127.0.0.1", 0)
+
+    async def run():
+        async with create_connected_server_and_client_session(server) as first:
+            await first.call_tool("playwright_navigate", {"url": "https://a.com"})
+            async with create_connected_server_and_client_session(server) as second:
+                await second.call_tool("playwright_navigate", {"url": "https://b.com"})
+                pages = [entry.page.url for entry in daemon._contexts.values()]
+                assert sorted(pages) == ["https://a.com", "https://b.com"]
+            assert daemon.stats()["contexts"] == 1
+            await first.call_tool("playwright_close", {})
+            assert daemon.stats()["contexts"] == 0
+
+    asyncio.run(run())
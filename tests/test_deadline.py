@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from utils.deadline import (
+    DeadlineExceeded,
+    clamp,
+    current_deadline,
+    deadline_scope,
+    remaining,
+    within_deadline,
+)
+
+
+def test_no_deadline_passthrough():
+    assert current_deadline() is None
+    assert remaining(5) == 5
+    assert clamp(3) == 3 and clamp(None) is None
+    with deadline_scope(0) as deadline:
+        assert deadline is None and current_deadline() is None
+
+
+def test_scope_sets_and_resets():
+    with deadline_scope(10) as deadline:
+        assert current_deadline() is deadline
+        assert clamp(None) <= 10
+        assert clamp(1) == 1
+        assert clamp(100) <= 10
+    assert current_deadline() is None
+
+
+def test_nested_scope_keeps_earlier_deadline():
+    with deadline_scope(5) as outer:
+        with deadline_scope(60) as inner:
+            assert inner is outer
+        with deadline_scope(1) as tighter:
+            assert tighter is not outer
+            assert current_deadline() is tighter
+        assert current_deadline() is outer
+
+
+def test_within_deadline_raises_and_cancels():
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def run():
+        with deadline_scope(0.05):
+            await within_deadline(slow())
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(run())
+    assert cancelled == [True]
+
+
+def test_within_deadline_returns_result_and_keeps_own_timeouts():
+    async def run():
+        assert await within_deadline(asyncio.sleep(0, "plain")) == "plain"
+        with deadline_scope(5):
+            assert await within_deadline(asyncio.sleep(0, "ok")) == "ok"
+            with pytest.raises(asyncio.TimeoutError):
+                await within_deadline(asyncio.wait_for(asyncio.sleep(1), 0.01))
+
+    asyncio.run(run())
@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from utils.llm_wrapper import SiliconFlowLLM
+
+
+def test_agenerate_cancels_remaining_requests_on_failure(monkeypatch):
+    finished = []
+
+    async def fake_request(self, prompt, **kwargs):
+        if prompt == "失败":
+            await asyncio.sleep(0.01)
+            raise ValueError("异步 API 请求失败")
+        await asyncio.sleep(0.5)
+        finished.append(prompt)
+        return prompt, None
+
+    monkeypatch.setattr(SiliconFlowLLM, "_arequest", fake_request)
+    llm = SiliconFlowLLM()
+
+    async def run():
+        with pytest.raises(ValueError):
+            await llm._agenerate(["一", "失败", "二"])
+        await asyncio.sleep(0.6)
+
+    asyncio.run(run())
+    assert finished == []
+
+
+def test_agenerate_keeps_prompt_order(monkeypatch):
+    async def fake_request(self, prompt, **kwargs):
+        await asyncio.sleep(0.01 * len(prompt))
+        return prompt.upper(), {"total_tokens": len(prompt)}
+
+    monkeypatch.setattr(SiliconFlowLLM, "_arequest", fake_request)
+    result = asyncio.run(SiliconFlowLLM()._agenerate(["abc", "a", "ab"]))
+    assert [g[0].text for g in result.generations] == ["ABC", "A", "AB"]
+    assert result.llm_output["token_usage"] == {"total_tokens": 6}
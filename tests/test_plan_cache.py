@@ -0,0 +1,66 @@
+from utils.plan_cache import PlanCache
+
+CATALOG = "catalog"
+
+
+def search_plan(query):
+    return {
+        "description": f"在百度搜索{query}",
+        "steps": [
+            {"action": "playwright_navigate", "params": {"url": "https://www.baidu.com"}},
+            {"action": "playwright_fill", "params": {"selector": "#kw", "value": query}},
+        ],
+    }
+
+
+def make_cache(**kwargs):
+    kwargs.setdefault("max_entries", 16)
+    return PlanCache(ttl=0, persist_path="", **kwargs)
+
+
+def test_exact_hit():
+    cache = make_cache()
+    cache.put("访问百度并搜索人工智能", CATALOG, search_plan("人工智能"))
+    assert cache.get("访问百度并搜索人工智能。", CATALOG) == search_plan("人工智能")
+    assert cache.get("访问百度并搜索人工智能", "other") is None
+
+
+def test_template_fills_slot():
+    cache = make_cache()
+    cache.put("访问百度并搜索人工智能", CATALOG, search_plan("人工智能"))
+    assert cache.get("访问百度并搜索机器学习", CATALOG) == search_plan("机器学习")
+    assert cache.stats()["template_hits"] == 1
+
+
+def test_template_does_not_swallow_later_actions():
+    cache = make_cache()
+    cache.put("访问百度并搜索人工智能", CATALOG, search_plan("人工智能"))
+    assert cache.get("访问百度并搜索机器学习，然后点击第一个结果并截图", CATALOG) is None
+    assert cache.get("访问百度并搜索人工智能并截图保存", CATALOG) is None
+    assert cache.get("访问百度并搜索" + "很长的查询" * 10, CATALOG) is None
+
+
+def test_short_literals_are_not_templated():
+    cache = make_cache()
+    cache.put("访问百度并搜索AI", CATALOG, search_plan("AI"))
+    assert cache.get("访问百度并搜索ML", CATALOG) is None
+
+
+def test_evict_removes_exact_and_template_entries():
+    cache = make_cache()
+    cache.put("访问百度并搜索人工智能", CATALOG, search_plan("人工智能"))
+    cache.evict("访问百度并搜索机器学习", CATALOG)
+    assert cache.get("访问百度并搜索人工智能", CATALOG) is not None
+    assert cache.get("访问百度并搜索机器学习", CATALOG) is None
+    cache.evict("访问百度并搜索人工智能", CATALOG)
+    assert cache.get("访问百度并搜索人工智能", CATALOG) is None
+
+
+def test_lru_eviction():
+    cache = make_cache(max_entries=2, min_literal=100)
+    cache.put("任务一", CATALOG, search_plan("一"))
+    cache.put("任务二", CATALOG, search_plan("二"))
+    cache.get("任务一", CATALOG)
+    cache.put("任务三", CATALOG, search_plan("三"))
+    assert cache.get("任务二", CATALOG) is None
+    assert cache.get("任务一", CATALOG) is not None
@@ -0,0 +1,72 @@
+import pytest
+
+from utils.plan_dag import StepGraph, has_dependencies
+
+
+def step(step_id, depends_on=None):
+    s = {"id": step_id, "action": "playwright_navigate", "params": {}}
+    if depends_on is not None:
+        s["depends_on"] = depends_on
+    return s
+
+
+def test_steps_without_dependencies_stay_sequential():
+    steps = [{"action": "a"}, {"action": "b"}, {"action": "c"}]
+    graph = StepGraph(steps)
+    assert not has_dependencies(steps)
+    assert graph.deps == [[], [0], [1]]
+    assert graph.lanes == [[0, 1, 2]]
+    assert graph.sequential_order() == [0, 1, 2]
+
+
+def test_independent_branches_get_separate_lanes():
+    graph = StepGraph([
+        step("a", []), step("a2", ["a"]),
+        step("b", []), step("b2", ["b"]),
+        step("merge", ["a2", "b2"]),
+    ])
+    assert graph.lanes == [[0, 1], [2, 3, 4]]
+    assert graph.lane_of == [0, 0, 1, 1, 1]
+
+
+def test_undeclared_dependency_follows_previous_step():
+    graph = StepGraph([step("a", []), step("b", []), {"id": "c", "action": "x"}])
+    assert graph.deps[2] == [1]
+    assert graph.lane_of[2] == graph.lane_of[1]
+
+
+def test_sequential_order_finishes_a_lane_before_switching():
+    # 两条执行链交错声明时，顺序执行也不在两条链之间来回切换
+    graph = StepGraph([
+        step("a", []), step("b", []),
+        step("a2", ["a"]), step("b2", ["b"]),
+        step("a3", ["a2"]),
+    ])
+    order = graph.sequential_order()
+    assert order == [0, 2, 4, 1, 3]
+    lanes = [graph.lane_of[i] for i in order]
+    assert lanes == sorted(lanes, key=lanes.index)
+
+
+def test_sequential_order_skips_completed_steps():
+    graph = StepGraph([step("a", []), step("a2", ["a"]), step("b", []), step("b2", ["b"])])
+    assert graph.sequential_order(completed={0, 2}) == [1, 3]
+
+
+def test_dependency_order_is_respected():
+    graph = StepGraph([step("a", []), step("b", []), step("c", ["b", "a"]), step("d", ["c"])])
+    order = graph.sequential_order()
+    position = {index: i for i, index in enumerate(order)}
+    for index, deps in enumerate(graph.deps):
+        assert all(position[dep] < position[index] for dep in deps)
+
+
+@pytest.mark.parametrize("steps", [
+    [step("a", []), step("a", [])],
+    [step("a", ["missing"])],
+    [step("a", ["b"]), step("b", [])],
+    [step("a", ["a"])],
+])
+def test_invalid_graphs_are_rejected(steps):
+    with pytest.raises(ValueError):
+        StepGraph(steps)
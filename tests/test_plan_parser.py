@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from utils.plan_parser import IncrementalPlanParser, extract_plan, repair_json, validate_plan
+
+PLAN = {
+    "description": "搜索 {LangChain}",
+    "steps": [
+        {"action": "playwright_navigate", "params": {"url": "https://www.baidu.com"}},
+        {"action": "playwright_fill", "params": {"selector": "#kw", "value": "LangChain }]"}},
+        {"action": "playwright_click", "params": {"selector": "#su"}},
+    ],
+}
+
+
+def feed_in_chunks(parser, text, size):
+    steps = []
+    for i in range(0, len(text), size):
+        steps.extend(parser.feed(text[i:i + size]))
+    return steps
+
+
+def test_incremental_steps_across_chunk_boundaries():
+    text = "好的，计划如下：\n```json\n" + json.dumps(PLAN, ensure_ascii=False) + "\n```"
+    for size in (1, 3, 17, len(text)):
+        parser = IncrementalPlanParser()
+        assert feed_in_chunks(parser, text, size) == PLAN["steps"]
+        assert parser.description == PLAN["description"]
+        assert parser.done
+
+
+def test_incremental_step_emitted_as_soon_as_it_closes():
+    text = json.dumps(PLAN, ensure_ascii=False)
+    first_end = text.index("}}") + 2
+    parser = IncrementalPlanParser()
+    assert parser.feed(text[:first_end - 1]) == []
+    assert parser.feed(text[first_end - 1:first_end]) == [PLAN["steps"][0]]
+
+
+def test_incremental_skips_objects_without_steps():
+    text = '示例 {"note": "不是计划"} 实际计划 ' + json.dumps(PLAN, ensure_ascii=False)
+    parser = IncrementalPlanParser()
+    assert parser.feed(text) == PLAN["steps"]
+
+
+def test_incremental_drops_steps_without_action():
+    parser = IncrementalPlanParser()
+    steps = parser.feed('{"steps": [{"params": {}}, {"action": "playwright_click", "params": {"selector": "a",}}]}')
+    assert steps == [{"action": "playwright_click", "params": {"selector": "a"}}]
+
+
+def test_repair_removes_fences_and_trailing_commas():
+    text = '```json\n{"steps": [{"action": "a", "params": {"x": 1,},},],}\n```'
+    assert json.loads(repair_json(text)) == {"steps": [{"action": "a", "params": {"x": 1}}]}
+
+
+def test_truncated_step_is_dropped_not_executed():
+    text = (
+        '{"steps":[{"action":"playwright_navigate","params":{"url":"u"}},'
+        '{"action":"playwright_fill","par'
+    )
+    assert extract_plan(text) == {"steps": [{"action": "playwright_navigate", "params": {"url": "u"}}]}
+
+
+@pytest.mark.parametrize("cut", ['"params":{"selector":"#kw","val', '"params":{"selector":"#kw"', '"act'])
+def test_truncation_inside_a_step_keeps_only_complete_steps(cut):
+    text = '{"description":"d","steps":[{"action":"a","params":{}},{' + cut
+    plan = extract_plan(text)
+    assert plan["steps"] == [{"action": "a", "params": {}}]
+    assert plan["description"] == "d"
+
+
+def test_truncated_after_complete_step_keeps_it():
+    text = '{"steps":[{"action":"a","params":{"url":"u"}},{"action":"b","params":{"selector":"x"}}'
+    assert [step["action"] for step in extract_plan(text)["steps"]] == ["a", "b"]
+
+
+def test_truncated_in_first_step_raises():
+    with pytest.raises(ValueError):
+        extract_plan('{"steps":[{"action":"a","par')
+
+
+def test_extract_prefers_object_with_steps():
+    text = '参数示例 {"url": "x"}，计划：' + json.dumps(PLAN, ensure_ascii=False) + " 完成"
+    assert extract_plan(text) == PLAN
+
+
+def test_validate_plan_reports_schema_errors():
+    assert validate_plan(PLAN) == []
+    assert validate_plan({"steps": [{"params": {}}]})
+    assert validate_plan({"description": "缺少 steps"})
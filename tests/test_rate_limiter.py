@@ -0,0 +1,64 @@
+import asyncio
+
+from benchmarks.stub_llm_server import StubLLMServer
+from config import config
+from utils.llm_wrapper import SiliconFlowLLM
+from utils.rate_limiter import RateLimiter
+
+
+def available(limiter):
+    return limiter._requests.tokens, limiter._tokens.tokens
+
+
+def test_release_returns_request_and_tokens():
+    limiter = RateLimiter(requests_per_minute=10, tokens_per_minute=1000)
+    asyncio.run(limiter.acquire(300))
+    requests, tokens = available(limiter)
+    assert round(requests) == 9 and round(tokens) == 700
+    limiter.release(300)
+    requests, tokens = available(limiter)
+    assert round(requests) == 10 and round(tokens) == 1000
+
+
+def test_settle_corrects_token_estimate():
+    limiter = RateLimiter(requests_per_minute=10, tokens_per_minute=1000)
+    asyncio.run(limiter.acquire(300))
+    limiter.settle(300, 100)
+    requests, tokens = available(limiter)
+    assert round(requests) == 9 and round(tokens) == 900
+
+
+def _hedged_request(monkeypatch, stream: bool):
+    monkeypatch.setattr(config, "LLM_HEDGE_ENABLED", True)
+    limiter = RateLimiter(requests_per_minute=6, tokens_per_minute=100000)
+
+    async def run():
+        async with StubLLMServer(latency=0.3, tokens_per_second=0) as server:
+            llm = SiliconFlowLLM(rate_limiter=limiter)
+            llm.base_url = server.base_url
+            # 总是在 50 毫秒后发送副本请求
+            monkeypatch.setattr(llm.latency, "hedge_delay", lambda kind: 0.05)
+            try:
+                if stream:
+                    async for _ in llm.astream("任务"):
+                        pass
+                else:
+                    await llm.ainvoke("任务")
+            finally:
+                await llm.aclose()
+            return server.requests
+
+    return limiter, asyncio.run(run())
+
+
+def test_hedged_loser_releases_reservation(monkeypatch):
+    limiter, sent = _hedged_request(monkeypatch, stream=False)
+    assert sent == 2
+    # 两次请求只有胜出的一次占用请求配额
+    assert int(available(limiter)[0]) == 5
+
+
+def test_hedged_stream_loser_releases_reservation(monkeypatch):
+    limiter, sent = _hedged_request(monkeypatch, stream=True)
+    assert sent == 2
+    assert int(available(limiter)[0]) == 5
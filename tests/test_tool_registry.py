@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+from utils.tool_registry import ToolRegistry, compile_schema
+
+
+def tool(name, description, properties, required=()):
+    schema = {"type": "object", "properties": properties, "required": list(required)}
+    return SimpleNamespace(name=name, description=description, args_schema=schema, args=properties)
+
+
+NAVIGATE = tool(
+    "playwright_navigate", "Navigate to a URL",
+    {"url": {"type": "string"}, "timeout": {"type": "integer", "minimum": 0}}, required=["url"],
+)
+SELECT = tool(
+    "playwright_select", "Select an option",
+    {"selector": {"type": "string"}, "value": {"type": "string", "enum": ["a", "b"]}}, required=["selector"],
+)
+
+
+def test_validate_accepts_valid_params():
+    registry = ToolRegistry([NAVIGATE, SELECT])
+    assert registry.validate("playwright_navigate", {"url": "https://a.com", "timeout": 100}) == []
+
+
+def test_validate_reports_missing_wrong_type_and_range():
+    registry = ToolRegistry([NAVIGATE])
+    assert registry.validate("playwright_navigate", {}) == ["缺少必填参数 url"]
+    errors = registry.validate("playwright_navigate", {"url": 123, "timeout": -1})
+    assert len(errors) == 2 and "url" in errors[0] and "timeout" in errors[1]
+    assert registry.validate("playwright_navigate", {"url": "u", "timeout": True})
+
+
+def test_validate_enum_and_unknown_tool():
+    registry = ToolRegistry([SELECT])
+    assert registry.validate("playwright_select", {"selector": "s", "value": "c"})
+    assert registry.validate("playwright_missing", {}) == ["工具 playwright_missing 未找到"]
+
+
+def test_unknown_keywords_and_extra_params_are_allowed():
+    validate = compile_schema({"type": "object", "properties": {"x": {"format": "uri"}}})
+    assert validate({"x": "anything", "extra": 1}, "") == []
+    strict = compile_schema({"type": "object", "properties": {}, "additionalProperties": False})
+    assert strict({"extra": 1}, "") == ["未知参数 extra"]
+
+
+def test_nested_items_paths():
+    validate = compile_schema({"type": "array", "items": {"type": "object", "required": ["id"]}})
+    assert validate([{"id": 1}, {}], "ids") == ["缺少必填参数 ids[1].id"]
+
+
+def test_catalog_hash_changes_with_tools():
+    first = ToolRegistry([NAVIGATE, SELECT])
+    assert first.catalog_hash == ToolRegistry([NAVIGATE, SELECT]).catalog_hash
+    assert first.catalog_hash != ToolRegistry([NAVIGATE]).catalog_hash
+    assert first.render_catalog(["playwright_select", "missing"]).startswith("- playwright_select")
@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+from utils.tool_registry import ToolRegistry
+from utils.tool_retriever import ToolRetriever, expand_query, tokenize
+
+TOOLS = [
+    ("playwright_navigate", "Navigate to a URL", ["url"]),
+    ("playwright_click", "Click an element on the page", ["selector"]),
+    ("playwright_fill", "Fill out an input field", ["selector", "value"]),
+    ("playwright_screenshot", "Take a screenshot of the current page", ["name", "fullPage"]),
+    ("playwright_hover", "Hover an element on the page", ["selector"]),
+    ("playwright_select", "Select an element on the page with Select tag", ["selector", "value"]),
+    ("playwright_upload_file", "Upload a file to an input element", ["selector", "filePath"]),
+    ("playwright_console_logs", "Retrieve console logs from the browser", ["type"]),
+    ("playwright_save_as_pdf", "Save the current page as a PDF file", ["outputPath"]),
+    ("playwright_drag", "Drag an element to a target location", ["sourceSelector", "targetSelector"]),
+]
+
+
+def registry():
+    tools = []
+    for name, description, params in TOOLS:
+        properties = {param: {"type": "string"} for param in params}
+        tools.append(SimpleNamespace(
+            name=name, description=description, args_schema={"type": "object", "properties": properties}, args=properties,
+        ))
+    return ToolRegistry(tools)
+
+
+def retriever(**kwargs):
+    kwargs.setdefault("core", ["playwright_navigate"])
+    kwargs.setdefault("top_k", 2)
+    kwargs.setdefault("token_budget", 10000)
+    return ToolRetriever(registry(), **kwargs)
+
+
+def test_tokenize_splits_camel_case_and_chinese():
+    assert tokenize("fullPage playwright_click") == ["full", "page", "click"]
+    assert tokenize("截图") == ["截", "图", "截图"]
+
+
+def test_expand_query_adds_aliases():
+    assert "screenshot" in expand_query("访问百度并截图")
+
+
+def test_select_includes_core_and_relevant_tools_in_registry_order():
+    selected = retriever().select("上传文件")
+    assert selected[0] == "playwright_navigate"
+    assert "playwright_upload_file" in selected
+    assert len(selected) <= 3
+    names = [name for name, _, _ in TOOLS]
+    assert selected == sorted(selected, key=names.index)
+
+
+def test_select_maps_chinese_tasks_to_english_tools():
+    assert "playwright_save_as_pdf" in retriever().select("把页面保存为 pdf")
+    assert "playwright_console_logs" in retriever().select("查看控制台日志")
+
+
+def test_token_budget_limits_extra_tools():
+    r = retriever(token_budget=0)
+    assert r.select("上传文件并拖拽元素") == ["playwright_navigate"]
+
+
+def test_promoted_tools_are_always_included():
+    r = retriever(top_k=0)
+    assert r.promote("playwright_drag")
+    assert not r.promote("playwright_drag")
+    assert not r.promote("playwright_missing")
+    assert r.select("截图") == ["playwright_navigate", "playwright_drag"]
+    assert "playwright_drag" not in r.omitted(r.select("截图"))
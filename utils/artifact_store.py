@@ -0,0 +1,177 @@
+"""
+产物存储
+把工具返回的大块内容（网页文本、HTML、截图等）按内容哈希写入磁盘一次，之后只传递引用；
+相同内容只保存一份，单个产物和存储总量都有大小上限
+"""
+
+import hashlib
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from config import config
+from utils.tracing import tracer
+
+# 媒体类型到文件扩展名
+_EXTENSIONS: Dict[str, str] = {
+    "text/plain": ".txt",
+    "text/html": ".html",
+    "application/json": ".json",
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/webp": ".webp",
+    "application/pdf": ".pdf",
+}
+
+
+def _format_size(size: int) -> str:
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+class ArtifactRef:
+    """产物引用：内容哈希、大小、媒体类型和磁盘路径"""
+
+    def __init__(self, digest: str, size: int, media_type: str, path: str):
+        self.digest = digest
+        self.size = size
+        self.media_type = media_type
+        self.path = path
+
+    @property
+    def uri(self) -> str:
+        return f"artifact://sha256/{self.digest}"
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"digest": self.digest, "size": self.size, "media_type": self.media_type, "path": self.path}
+
+    def __str__(self) -> str:
+        return f"📎 {self.media_type}, {_format_size(self.size)} → {self.path}"
+
+    def __repr__(self) -> str:
+        return f"ArtifactRef({self.digest[:12]}, {self.media_type}, {self.size})"
+
+
+class ArtifactStore:
+    """按 sha256 寻址的磁盘产物存储"""
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        max_total_bytes: Optional[int] = None,
+    ):
+        """
+        Args:
+            root: 存储目录，默认读取 Config.ARTIFACT_DIR
+            max_bytes: 单个产物的大小上限，超过的内容不保存，默认读取 Config.ARTIFACT_MAX_BYTES
+            max_total_bytes: 存储总量上限，超过时删除最久未使用的产物，默认读取 Config.ARTIFACT_STORE_MAX_BYTES
+        """
+        self.root = config.ARTIFACT_DIR if root is None else root
+        self.max_bytes = config.ARTIFACT_MAX_BYTES if max_bytes is None else max_bytes
+        self.max_total_bytes = config.ARTIFACT_STORE_MAX_BYTES if max_total_bytes is None else max_total_bytes
+        self._total: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _path(self, digest: str, media_type: str) -> str:
+        return os.path.join(self.root, digest[:2], digest + _EXTENSIONS.get(media_type, ".bin"))
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        """列出所有产物文件 (最近使用时间, 大小, 路径)"""
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for directory in os.scandir(self.root):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def total_bytes(self) -> int:
+        """存储中所有产物的总大小"""
+        with self._lock:
+            if self._total is None:
+                self._total = sum(size for _, size, _ in self._scan())
+            return self._total
+
+    def put(self, data: bytes, media_type: str = "application/octet-stream") -> Optional[ArtifactRef]:
+        """
+        保存产物并返回引用；内容已存在时只刷新使用时间
+
+        超过单个产物上限时不保存，返回 None
+        """
+        if len(data) > self.max_bytes:
+            tracer.incr("artifacts.rejected")
+            return None
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest, media_type)
+        ref = ArtifactRef(digest, len(data), media_type, path)
+        with self._lock:
+            if self._total is None:
+                self._total = sum(size for _, size, _ in self._scan())
+            if os.path.exists(path):
+                os.utime(path)
+                tracer.incr("artifacts.deduped")
+                tracer.incr("artifacts.bytes_saved", len(data))
+                return ref
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._total += len(data)
+            tracer.incr("artifacts.stored")
+            tracer.incr("artifacts.bytes", len(data))
+            if self._total > self.max_total_bytes:
+                self._evict(keep=path)
+        return ref
+
+    def put_text(self, text: str, media_type: str = "text/plain") -> Optional[ArtifactRef]:
+        return self.put(text.encode("utf-8"), media_type)
+
+    def read(self, ref: ArtifactRef) -> bytes:
+        """读取产物内容，已被清理时抛出 FileNotFoundError"""
+        with open(ref.path, "rb") as f:
+            return f.read()
+
+    def read_text(self, ref: ArtifactRef) -> str:
+        return self.read(ref).decode("utf-8", errors="replace")
+
+    def _evict(self, keep: str):
+        """删除最久未使用的产物，直到总量不超过上限（调用方持有锁）"""
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_total_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            tracer.incr("artifacts.evicted")
+        self._total = total
+
+
+_shared: Dict[str, ArtifactStore] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_artifact_store(root: Optional[str] = None) -> Optional[ArtifactStore]:
+    """获取按目录共享的产物存储，同一进程中的会话共享去重和总量统计；目录为空表示禁用，返回 None"""
+    root = config.ARTIFACT_DIR if root is None else root
+    if not root:
+        return None
+    with _shared_lock:
+        store = _shared.get(root)
+        if store is None:
+            store = _shared[root] = ArtifactStore(root)
+        return store
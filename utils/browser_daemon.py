@@ -0,0 +1,345 @@
+"""
+共享浏览器守护进程
+常驻进程只启动一次浏览器引擎，通过 MCP streamable-HTTP（或 SSE）传输对外提供与
+@executeautomation/playwright-mcp-server 同名的常用 Playwright 工具；每个 MCP 客户端会话拥有独立的
+浏览器上下文（Cookie、存储和页面互不影响），多个工作进程共享同一个预热的浏览器
+
+启动和管理见项目根目录的 mcp_daemon.py
+"""
+
+import asyncio
+import inspect
+import json
+import signal
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from config import config
+
+# 各传输方式在服务端暴露的路径
+TRANSPORT_PATHS = {"streamable_http": "/mcp", "sse": "/sse"}
+
+
+def daemon_url(host: Optional[str] = None, port: Optional[int] = None, transport: Optional[str] = None) -> str:
+    """守护进程的 MCP 端点 URL，默认读取 Config.MCP_DAEMON_HOST / MCP_DAEMON_PORT / MCP_DAEMON_TRANSPORT"""
+    host = host or config.MCP_DAEMON_HOST
+    port = port or config.MCP_DAEMON_PORT
+    transport = transport or config.MCP_DAEMON_TRANSPORT
+    return f"http://{host}:{port}{TRANSPORT_PATHS[transport]}"
+
+
+def daemon_server_config(url: str) -> Dict[str, Any]:
+    """连接守护进程的 MCP 服务器配置，URL 以 /sse 结尾时使用 SSE 传输，否则使用 streamable-HTTP"""
+    transport = "sse" if url.rstrip("/").endswith("/sse") else "streamable_http"
+    return {"playwright": {"url": url, "transport": transport}}
+
+
+class ClientHandle:
+    """一个 MCP 客户端会话的标识，由会话的 lifespan 创建，会话结束时失效"""
+
+
+class ClientContext:
+    """一个客户端会话独占的浏览器上下文和页面"""
+
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.lock = asyncio.Lock()  # 同一会话的工具调用串行执行
+
+
+class BrowserDaemon:
+    """持有共享浏览器，并按客户端会话分配独立的浏览器上下文"""
+
+    def __init__(
+        self,
+        browser_type: Optional[str] = None,
+        headless: Optional[bool] = None,
+        idle_timeout: Optional[float] = None,
+        max_contexts: Optional[int] = None,
+    ):
+        """
+        Args:
+            browser_type: chromium / firefox / webkit，默认读取 Config.MCP_DAEMON_BROWSER
+            headless: 是否无头运行，默认读取 Config.MCP_DAEMON_HEADLESS
+            idle_timeout: 客户端会话空闲多少秒后关闭其浏览器上下文（0 表示不回收），默认读取 Config.MCP_DAEMON_CONTEXT_IDLE
+            max_contexts: 同时存在的浏览器上下文上限，默认读取 Config.MCP_DAEMON_MAX_CONTEXTS
+        """
+        self.browser_type = browser_type or config.MCP_DAEMON_BROWSER
+        self.headless = config.MCP_DAEMON_HEADLESS if headless is None else headless
+        self.idle_timeout = config.MCP_DAEMON_CONTEXT_IDLE if idle_timeout is None else idle_timeout
+        self.max_contexts = config.MCP_DAEMON_MAX_CONTEXTS if max_contexts is None else max_contexts
+        self.browser = None
+        self.started = time.time()
+        self.contexts_created = 0
+        self._playwright = None
+        # 客户端会话 (ClientHandle) -> 浏览器上下文
+        self._contexts: Dict[Any, ClientContext] = {}
+        self._launch_lock = asyncio.Lock()
+        self._contexts_lock = asyncio.Lock()
+        self._reaper: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """启动浏览器引擎和空闲上下文回收任务"""
+        # 延迟导入，只有守护进程需要 Playwright 的 Python 包
+        from playwright.async_api import async_playwright
+
+        self._playwright = await async_playwright().start()
+        await self._ensure_browser()
+        if self.idle_timeout:
+            self._reaper = asyncio.create_task(self._reap_loop())
+        print(f"✅ 浏览器引擎已启动: {self.browser_type} (headless={self.headless})")
+
+    async def _ensure_browser(self):
+        """浏览器未启动或已崩溃时重新启动；崩溃时原有的上下文全部失效"""
+        async with self._launch_lock:
+            if self.browser is not None and self.browser.is_connected():
+                return
+            if self.browser is not None:
+                print("⚠️ 浏览器已断开，重新启动")
+                self._contexts.clear()
+            launcher = getattr(self._playwright, self.browser_type)
+            self.browser = await launcher.launch(headless=self.headless)
+
+    async def acquire(self, client) -> ClientContext:
+        """获取客户端会话的浏览器上下文，第一次调用时创建"""
+        await self._ensure_browser()
+        async with self._contexts_lock:
+            entry = self._contexts.get(client)
+            if entry is None:
+                if len(self._contexts) >= self.max_contexts:
+                    raise RuntimeError(f"浏览器上下文已达上限 ({self.max_contexts} 个)，请稍后重试")
+                context = await self.browser.new_context()
+                entry = ClientContext(context, await context.new_page())
+                self._contexts[client] = entry
+                self.contexts_created += 1
+            elif entry.page.is_closed():
+                entry.page = await entry.context.new_page()
+            entry.last_used = time.monotonic()
+        return entry
+
+    async def release(self, client) -> bool:
+        """关闭客户端会话的浏览器上下文，返回是否存在"""
+        entry = self._contexts.pop(client, None)
+        if entry is None:
+            return False
+        try:
+            await entry.context.close()
+        except Exception as e:
+            print(f"⚠️ 关闭浏览器上下文失败: {e}")
+        return True
+
+    async def _reap_loop(self):
+        """定期关闭空闲过久的上下文，作为会话结束时释放之外的兜底"""
+        interval = max(min(self.idle_timeout / 2, 60), 1)
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for client, entry in list(self._contexts.items()):
+                if now - entry.last_used > self.idle_timeout and not entry.lock.locked():
+                    await self.release(client)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "browser": self.browser_type,
+            "connected": bool(self.browser is not None and self.browser.is_connected()),
+            "contexts": len(self._contexts),
+            "max_contexts": self.max_contexts,
+            "contexts_created": self.contexts_created,
+            "uptime": round(time.time() - self.started, 1),
+        }
+
+    async def close(self):
+        """关闭所有上下文、浏览器和 Playwright"""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        for client in list(self._contexts):
+            await self.release(client)
+        if self.browser is not None:
+            try:
+                await self.browser.close()
+            except Exception:
+                pass
+            self.browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+def build_server(daemon: BrowserDaemon, host: str, port: int):
+    """创建提供 Playwright 工具的 MCP 服务器，工具按调用方的客户端会话操作各自的页面"""
+    import anyio
+    from mcp.server.fastmcp import Context, FastMCP, Image
+    from starlette.requests import Request
+    from starlette.responses import JSONResponse
+
+    @asynccontextmanager
+    async def client_lifespan(_server) -> AsyncIterator[ClientHandle]:
+        """
+        每个 MCP 客户端会话运行期间的生命周期：会话结束时（正常关闭、SSE 连接断开或会话超时）
+        立即关闭其浏览器上下文，不必等待空闲回收
+        """
+        client = ClientHandle()
+        try:
+            yield client
+        finally:
+            # 会话因超时或传输关闭被取消时也要等上下文关闭完成
+            with anyio.CancelScope(shield=True):
+                await daemon.release(client)
+
+    options: Dict[str, Any] = {}
+    if daemon.idle_timeout and "session_idle_timeout" in inspect.signature(FastMCP.__init__).parameters:
+        # streamable-HTTP 客户端异常退出时不会发送 DELETE，会话在空闲超时后结束，与上下文回收保持一致
+        options["session_idle_timeout"] = daemon.idle_timeout
+    server = FastMCP(
+        "playwright-daemon", host=host, port=port, log_level="WARNING", lifespan=client_lifespan, **options
+    )
+
+    def client(ctx: Context) -> ClientHandle:
+        """调用方所属的客户端会话"""
+        return ctx.request_context.lifespan_context
+
+    @server.tool()
+    async def playwright_navigate(ctx: Context, url: str, timeout: int = 30000, waitUntil: str = "load") -> str:
+        """Navigate to a URL"""
+        entry = await daemon.acquire(client(ctx))
+        async with entry.lock:
+            await entry.page.goto(url, timeout=timeout, wait_until=waitUntil)
+        return f"Navigated to {url}"
+
+    @server.tool()
+    async def playwright_screenshot(ctx: Context, name: str, selector: str = "", fullPage: bool = False):
+        """Take a screenshot of the current page or a specific element"""
+        entry = await daemon.acquire(client(ctx))
+        async with entry.lock:
+            if selector:
+                data = await entry.page.locator(selector).first.screenshot()
+            else:
+                data = await entry.page.screenshot(full_page=fullPage)
+        return [f"Screenshot '{name}' taken", Image(data=data, format="png")]
+
+    @server.tool()
+    async def playwright_click(ctx: Context, selector: str) -> str:
+        """Click an element on the page"""
+        entry = await daemon.acquire(client(ctx))
+        async with entry.lock:
+            await entry.page.click(selector)
+        return f"Clicked element: {selector}"
+
+    @server.tool()
+    async def playwright_fill(ctx: Context, selector: str, value: str) -> str:
+        """Fill out an input field"""
+        entry = await daemon.acquire(client(ctx))
+        async with entry.lock:
+            await entry.page.fill(selector, value)
+        return f"Filled {selector} with: {value}"
+
+    @server.tool()
+    async def playwright_select(ctx: Context, selector: str, value: str) -> str:
+        """Select an element on the page with Select tag"""
+        entry = await daemon.acquire(client(ctx))
+        async with entry.lock:
+            await entry.page.select_option(selector, value)
+        return f"Selected {selector} with: {value}"
+
+    @server.tool()
+    async def playwright_hover(ctx: Context, selector: str) -> str:
+        """Hover an element on the page"""
+        entry = await daemon.acquire(client(ctx))
+        async with entry.lock:
+            await entry.page.hover(selector)
+        return f"Hovered {selector}"
+
+    @server.tool()
+    async def playwright_press_key(ctx: Context, key: str, selector: str = "") -> str:
+        """Press a keyboard key"""
+        entry = await daemon.acquire(client(ctx))
+        async with entry.lock:
+            if selector:
+                await entry.page.press(selector, key)
+            else:
+                await entry.page.keyboard.press(key)
+        return f"Pressed key: {key}"
+
+    @server.tool()
+    async def playwright_evaluate(ctx: Context, script: str) -> str:
+        """Execute JavaScript in the browser console"""
+        entry = await daemon.acquire(client(ctx))
+        async with entry.lock:
+            result = await entry.page.evaluate(script)
+        return f"Executed JavaScript:\n{script}\n\nResult:\n{json.dumps(result, ensure_ascii=False, indent=2)}"
+
+    @server.tool()
+    async def playwright_get_visible_text(ctx: Context, random_string: str = "") -> str:
+        """Get the visible text content of the current page"""
+        entry = await daemon.acquire(client(ctx))
+        async with entry.lock:
+            text = await entry.page.evaluate("() => document.body ? document.body.innerText : ''")
+        return f"Visible text content:\n{text}"
+
+    @server.tool()
+    async def playwright_get_visible_html(ctx: Context, random_string: str = "") -> str:
+        """Get the HTML content of the current page"""
+        entry = await daemon.acquire(client(ctx))
+        async with entry.lock:
+            html = await entry.page.content()
+        return f"HTML content:\n{html}"
+
+    @server.tool()
+    async def playwright_go_back(ctx: Context, random_string: str = "") -> str:
+        """Navigate back in browser history"""
+        entry = await daemon.acquire(client(ctx))
+        async with entry.lock:
+            await entry.page.go_back()
+        return "Navigated back in browser history"
+
+    @server.tool()
+    async def playwright_go_forward(ctx: Context, random_string: str = "") -> str:
+        """Navigate forward in browser history"""
+        entry = await daemon.acquire(client(ctx))
+        async with entry.lock:
+            await entry.page.go_forward()
+        return "Navigated forward in browser history"
+
+    @server.tool()
+    async def playwright_close(ctx: Context, random_string: str = "") -> str:
+        """Close the browser and release all resources"""
+        # 只关闭调用方自己的浏览器上下文，共享的浏览器保持运行
+        await daemon.release(client(ctx))
+        return "Browser closed successfully"
+
+    @server.custom_route("/status", methods=["GET"])
+    async def status(request: Request) -> JSONResponse:
+        return JSONResponse(daemon.stats())
+
+    return server
+
+
+async def serve(host: Optional[str] = None, port: Optional[int] = None, transport: Optional[str] = None):
+    """在前台运行守护进程，直到收到 SIGINT/SIGTERM"""
+    import uvicorn
+
+    host = host or config.MCP_DAEMON_HOST
+    port = port or config.MCP_DAEMON_PORT
+    transport = transport or config.MCP_DAEMON_TRANSPORT
+    if transport not in TRANSPORT_PATHS:
+        raise ValueError(f"不支持的传输方式: {transport}，可选: {', '.join(TRANSPORT_PATHS)}")
+
+    if threading.current_thread() is threading.main_thread():
+        # uvicorn 退出时会重新发出收到的信号，SIGTERM 的默认处理会直接结束进程而跳过下面的清理
+        signal.signal(signal.SIGTERM, lambda signum, frame: None)
+
+    daemon = BrowserDaemon()
+    await daemon.start()
+    try:
+        server = build_server(daemon, host, port)
+        app = server.streamable_http_app() if transport == "streamable_http" else server.sse_app()
+        print(f"🚀 共享浏览器守护进程已启动: {daemon_url(host, port, transport)}")
+        await uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning")).serve()
+    finally:
+        await daemon.close()
+        print("✅ 共享浏览器守护进程已退出")
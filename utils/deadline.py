@@ -0,0 +1,101 @@
+"""
+端到端截止时间
+任务的截止时间保存在上下文变量中，任务内创建的协程（规划、工具调用、等待）自动继承；
+LLM 请求、MCP 工具调用和 wait 步骤按剩余时间收紧各自的超时，到期时抛出 DeadlineExceeded，
+由任务入口取消仍在进行的工作并报告已完成的步骤
+"""
+
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Deadline:
+    """一个截止时间，seconds 为从创建起的时长"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+
+class DeadlineExceeded(Exception):
+    """超过截止时间"""
+
+    def __init__(self, deadline: Deadline):
+        super().__init__(f"超过截止时间（{deadline.seconds:g} 秒）")
+        self.deadline = deadline
+
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """当前生效的截止时间，没有时返回 None"""
+    return _current.get()
+
+
+def remaining(default: Optional[float] = None) -> Optional[float]:
+    """当前截止时间的剩余秒数；没有截止时间时返回 default"""
+    deadline = _current.get()
+    return default if deadline is None else deadline.remaining()
+
+
+def clamp(timeout: Optional[float]) -> Optional[float]:
+    """把超时收紧到不超过剩余时间，两者都没有时返回 None"""
+    left = remaining()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+def raise_if_expired(cause: Optional[BaseException] = None):
+    """当前截止时间已到期时抛出 DeadlineExceeded"""
+    deadline = _current.get()
+    if deadline is not None and deadline.expired:
+        raise DeadlineExceeded(deadline) from cause
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """
+    在代码块内设置截止时间，返回生效的截止时间
+
+    seconds 为 None 或不大于 0 时不设置；已有更早的截止时间时沿用外层的
+    """
+    outer = _current.get()
+    if not seconds or seconds <= 0 or (outer is not None and outer.remaining() <= seconds):
+        yield outer
+        return
+    deadline = Deadline(seconds)
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+async def within_deadline(awaitable: Awaitable[T]) -> T:
+    """等待 awaitable，截止时间到期时取消它并抛出 DeadlineExceeded；没有截止时间时直接等待"""
+    deadline = _current.get()
+    if deadline is None:
+        return await awaitable
+    if deadline.expired:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded(deadline)
+    try:
+        return await asyncio.wait_for(awaitable, deadline.remaining())
+    except asyncio.TimeoutError as e:
+        raise_if_expired(e)
+        raise
@@ -0,0 +1,98 @@
+"""
+共享 HTTP 传输层
+为 LLM 调用提供带连接池和 keep-alive 的长连接会话，避免每次请求重复建立 DNS/TCP/TLS 连接
+"""
+
+import asyncio
+from typing import Optional
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import config
+
+
+class HTTPTransport:
+    """带连接池的 HTTP 传输层，同时提供异步会话和同步会话"""
+
+    def __init__(
+        self,
+        limit: Optional[int] = None,
+        limit_per_host: Optional[int] = None,
+        keepalive_timeout: Optional[float] = None,
+    ):
+        """
+        初始化传输层
+
+        Args:
+            limit: 连接池总连接数上限，默认读取 Config.HTTP_POOL_LIMIT
+            limit_per_host: 单个主机的连接数上限，默认读取 Config.HTTP_POOL_LIMIT_PER_HOST
+            keepalive_timeout: 空闲连接保持时间（秒），默认读取 Config.HTTP_KEEPALIVE_TIMEOUT
+        """
+        self.limit = config.HTTP_POOL_LIMIT if limit is None else limit
+        self.limit_per_host = config.HTTP_POOL_LIMIT_PER_HOST if limit_per_host is None else limit_per_host
+        self.keepalive_timeout = config.HTTP_KEEPALIVE_TIMEOUT if keepalive_timeout is None else keepalive_timeout
+
+        self._async_session: Optional[aiohttp.ClientSession] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_session: Optional[requests.Session] = None
+
+    async def get_async_session(self) -> aiohttp.ClientSession:
+        """获取复用的异步会话，首次调用或事件循环变化时创建"""
+        loop = asyncio.get_running_loop()
+        if (
+            self._async_session is None
+            or self._async_session.closed
+            or self._async_loop is not loop
+        ):
+            # aiohttp 会话绑定在事件循环上，循环变化后旧会话无法再使用
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._async_session = aiohttp.ClientSession(connector=connector)
+            self._async_loop = loop
+        return self._async_session
+
+    @property
+    def sync_session(self) -> requests.Session:
+        """获取复用的同步会话"""
+        if self._sync_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=self.limit_per_host,
+                pool_maxsize=self.limit_per_host,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._sync_session = session
+        return self._sync_session
+
+    def close(self):
+        """关闭同步会话（异步会话需通过 aclose 关闭）"""
+        if self._sync_session is not None:
+            self._sync_session.close()
+            self._sync_session = None
+
+    async def aclose(self):
+        """关闭异步会话和同步会话"""
+        if self._async_session is not None and not self._async_session.closed:
+            await self._async_session.close()
+        self._async_session = None
+        self._async_loop = None
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
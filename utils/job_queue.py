@@ -0,0 +1,245 @@
+"""
+交互模式的任务队列
+提交任务后立即返回，由固定数量的工作协程从队列中取出执行，用户可以继续输入下一个任务；
+支持列出任务、查询状态和取消任务。任务执行期间打印的每一行都带有任务编号前缀，多个任务同时执行时也能区分
+"""
+
+import asyncio
+import contextvars
+import itertools
+import sys
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, TextIO
+
+from config import config
+from utils.step_events import StepEvent, StepFinished, StepStarted, TaskFailed, TaskFinished
+from utils.tracing import tracer
+
+# 当前协程所属任务的输出前缀，任务中创建的子协程也会继承
+_output_tag: contextvars.ContextVar[str] = contextvars.ContextVar("job_output_tag", default="")
+
+STATE_LABELS = {
+    "queued": "⏳ 排队中",
+    "running": "🏃 执行中",
+    "done": "✅ 已完成",
+    "failed": "❌ 失败",
+    "cancelled": "🚫 已取消",
+}
+
+
+class TaggedOutput:
+    """
+    包装标准输出：任务中打印的内容按行缓冲，整行加上任务编号前缀后写出
+
+    不在任务中的输出（提示符、命令结果）原样写出
+    """
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+        self._buffers: Dict[str, str] = {}
+
+    def write(self, text: str) -> int:
+        tag = _output_tag.get()
+        if not tag:
+            return self.stream.write(text)
+        *lines, rest = (self._buffers.pop(tag, "") + text).split("\n")
+        if rest:
+            self._buffers[tag] = rest
+        if lines:
+            self.stream.write("".join(f"{tag} {line}\n" for line in lines))
+        return len(text)
+
+    def finish(self, tag: str):
+        """写出任务结束时缓冲中不完整的一行"""
+        rest = self._buffers.pop(tag, "")
+        if rest:
+            self.stream.write(f"{tag} {rest}\n")
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class Job:
+    """队列中的一个任务及其执行状态"""
+
+    def __init__(self, job_id: int, task: str):
+        self.id = job_id
+        self.task = task
+        self.state = "queued"
+        self.submitted = time.monotonic()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.steps = 0  # 已完成的步骤数
+        self.failed_steps = 0
+        self.current: Optional[str] = None  # 正在执行的步骤
+        self.ok = True
+        self.result = ""
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def tag(self) -> str:
+        return f"[#{self.id}]"
+
+    @property
+    def done(self) -> bool:
+        return self.state in ("done", "failed", "cancelled")
+
+    def elapsed(self) -> float:
+        """执行耗时，排队中的任务为等待时长"""
+        start = self.started or self.submitted
+        return (self.finished or time.monotonic()) - start
+
+    def summary(self) -> str:
+        """任务列表中的一行"""
+        progress = f"，{self.steps} 个步骤" if self.started else ""
+        return f"#{self.id} {STATE_LABELS[self.state]}（{self.elapsed():.1f} 秒{progress}）: {self.task}"
+
+    def details(self) -> List[str]:
+        """任务状态详情"""
+        lines = [
+            f"任务 #{self.id}: {self.task}",
+            f"  状态: {STATE_LABELS[self.state]}",
+            f"  {'耗时' if self.started else '已等待'}: {self.elapsed():.1f} 秒",
+        ]
+        if self.started:
+            lines.append(f"  已完成步骤: {self.steps}（失败 {self.failed_steps}）")
+        if self.state == "running" and self.current:
+            lines.append(f"  当前步骤: {self.current}")
+        if self.result:
+            lines.append(f"  结果: {self.result}")
+        return lines
+
+    def _observe(self, event: StepEvent):
+        """根据执行事件更新进度"""
+        if isinstance(event, StepStarted):
+            self.current = f"{event.index}. {event.action}"
+        elif isinstance(event, StepFinished):
+            self.steps += 1
+            if not event.ok:
+                self.failed_steps += 1
+        elif isinstance(event, (TaskFinished, TaskFailed)):
+            self.result = "\n".join(event.lines())
+            self.ok = isinstance(event, TaskFinished) and event.ok
+
+
+class JobQueue:
+    """由工作协程执行的任务队列"""
+
+    def __init__(
+        self,
+        runner: Callable[[str], AsyncIterator[StepEvent]],
+        workers: Optional[int] = None,
+        show_step_started: bool = False,
+    ):
+        """
+        Args:
+            runner: 执行任务并逐个产出执行事件的函数，通常为 MCPSmartBrowserAgent.stream_smart_task
+            workers: 同时执行的任务数，默认读取 Config.JOB_WORKERS
+            show_step_started: 是否输出步骤开始事件
+        """
+        self.runner = runner
+        self.workers = max(1, config.JOB_WORKERS if workers is None else workers)
+        self.show_step_started = show_step_started
+        self.jobs: Dict[int, Job] = {}
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._ids = itertools.count(1)
+        self._workers: List[asyncio.Task] = []
+        self._output: Optional[TaggedOutput] = None
+
+    def start(self):
+        """启动工作协程，并为任务输出加上任务编号前缀"""
+        if self._workers:
+            return
+        if not isinstance(sys.stdout, TaggedOutput):
+            self._output = TaggedOutput(sys.stdout)
+            sys.stdout = self._output
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, task: str) -> Job:
+        """提交任务并立即返回"""
+        job = Job(next(self._ids), task)
+        self.jobs[job.id] = job
+        self._queue.put_nowait(job)
+        tracer.incr("job.submitted")
+        return job
+
+    def get(self, job_id: int) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        return list(self.jobs.values())
+
+    def pending(self) -> List[Job]:
+        """尚未结束的任务"""
+        return [job for job in self.jobs.values() if not job.done]
+
+    def cancel(self, job_id: int) -> bool:
+        """取消排队中或执行中的任务，任务不存在或已结束时返回 False"""
+        job = self.jobs.get(job_id)
+        if job is None or job.done:
+            return False
+        if job.state == "queued":
+            self._finish(job, "cancelled")
+        elif job._task is not None:
+            job._task.cancel()
+        return True
+
+    def _finish(self, job: Job, state: str):
+        job.state = state
+        job.finished = time.monotonic()
+        tracer.incr("job.finished", state=state)
+
+    async def _worker(self):
+        while True:
+            job: Job = await self._queue.get()
+            if job.state != "queued":
+                # 排队期间已被取消
+                continue
+            job.state = "running"
+            job.started = time.monotonic()
+            tracer.observe("job.wait.seconds", job.started - job.submitted)
+            job._task = asyncio.create_task(self._run(job))
+            await asyncio.gather(job._task, return_exceptions=True)
+            if not job.done:
+                # 任务在开始执行前就被取消
+                self._finish(job, "cancelled")
+
+    async def _run(self, job: Job):
+        """执行单个任务，输出按行加上任务编号前缀"""
+        _output_tag.set(job.tag)
+        print(f"▶️ 开始执行: {job.task}")
+        try:
+            async for event in self.runner(job.task):
+                job._observe(event)
+                if self.show_step_started or not isinstance(event, StepStarted):
+                    print(event)
+        except asyncio.CancelledError:
+            self._finish(job, "cancelled")
+            print(f"🚫 任务已取消（{job.elapsed():.1f} 秒）")
+            raise
+        except Exception as e:
+            job.result = f"❌ 智能任务执行失败: {e}"
+            self._finish(job, "failed")
+            print(job.result)
+        else:
+            self._finish(job, "done" if job.ok else "failed")
+            print(f"🏁 {STATE_LABELS[job.state]}（{job.elapsed():.1f} 秒）")
+        finally:
+            if self._output is not None:
+                self._output.finish(job.tag)
+
+    async def close(self):
+        """取消未完成的任务，停止工作协程并恢复标准输出"""
+        for job in self.pending():
+            self.cancel(job.id)
+        running = [job._task for job in self.jobs.values() if job._task is not None]
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*running, *self._workers, return_exceptions=True)
+        self._workers = []
+        if self._output is not None and sys.stdout is self._output:
+            sys.stdout = self._output.stream
+        self._output = None
@@ -3,13 +3,36 @@
 使用 LangChain 框架集成硅基流动 API
 """
 
+import json
+import time
 import requests
 import asyncio
 import aiohttp
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
 from langchain.llms.base import LLM
 from langchain.callbacks.manager import CallbackManagerForLLMRun, AsyncCallbackManagerForLLMRun
+from langchain_core.language_models import LanguageModelInput
+from langchain_core.messages import convert_to_openai_messages
+from langchain_core.outputs import Generation, GenerationChunk, LLMResult
+from langchain_core.prompt_values import ChatPromptValue
 from config import config
+from utils.deadline import DeadlineExceeded, clamp, current_deadline, raise_if_expired
+from utils.http_transport import HTTPTransport
+from utils.rate_limiter import RateLimiter, parse_retry_after, shared_rate_limiter
+from utils.retry import LatencyTracker, backoff_delay, hedged
+from utils.tracing import Span, tracer
+
+# 需要等待后重试的状态码：限流和服务暂时不可用
+RETRY_STATUS = (429, 503)
+# 按指数退避重试的暂时性错误
+TRANSIENT_STATUS = (500, 502, 504)
+TRANSIENT_ERRORS = (
+    aiohttp.ClientConnectionError,
+    aiohttp.ClientPayloadError,
+    asyncio.TimeoutError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
 
 
 class SiliconFlowLLM(LLM):
@@ -20,6 +43,9 @@ class SiliconFlowLLM(LLM):
     model_name: str = ""
     temperature: float = 0.7
     max_tokens: int = 1000
+    transport: Optional[Any] = None  # 共享 HTTP 传输层，可在多个实例间复用
+    rate_limiter: Optional[RateLimiter] = None  # RPM/TPM 限流器，默认同一 API Key 的实例共享
+    latency: Optional[LatencyTracker] = None  # 最近的请求延迟，用于计算对冲阈值
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -28,51 +54,366 @@ class SiliconFlowLLM(LLM):
         self.model_name = config.DEFAULT_MODEL
         self.temperature = config.TEMPERATURE
         self.max_tokens = config.MAX_TOKENS
+        if self.transport is None:
+            self.transport = HTTPTransport()
+        if self.rate_limiter is None:
+            self.rate_limiter = shared_rate_limiter(self.api_key)
+        if self.latency is None:
+            self.latency = LatencyTracker()
     
     @property
     def _llm_type(self) -> str:
         return "siliconflow"
     
-    def _call(
-        self,
-        prompt: str,
-        stop: Optional[List[str]] = None,
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
-        **kwargs: Any,
-    ) -> str:
-        """调用硅基流动 API"""
-        headers = {
+    def _headers(self) -> Dict[str, str]:
+        """构造请求头"""
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+    
+    @staticmethod
+    def _parse_sse_line(line_str: str) -> Tuple[bool, Optional[str], Optional[Dict[str, Any]]]:
+        """
+        解析一行 SSE 数据
+        
+        Returns:
+            (是否结束, 增量文本, token 用量)；用量只出现在最后一个数据块中
+        """
+        if not line_str.startswith('data: '):
+            return False, None, None
+        data_str = line_str[6:].strip()
+        if data_str == '[DONE]':
+            return True, None, None
+        try:
+            chunk = json.loads(data_str)
+        except json.JSONDecodeError:
+            return False, None, None
+        usage = chunk.get('usage')
+        if 'choices' in chunk and len(chunk['choices']) > 0:
+            delta = chunk['choices'][0].get('delta') or {}
+            if delta.get('content'):
+                return False, delta['content'], usage
+        return False, None, usage
+    
+    @staticmethod
+    def _cached_tokens(usage: Dict[str, Any]) -> Optional[int]:
+        """命中服务端前缀缓存的 prompt token 数，兼容 OpenAI 和 DeepSeek 的字段；未返回时为 None"""
+        details = usage.get('prompt_tokens_details') or {}
+        if details.get('cached_tokens') is not None:
+            return details['cached_tokens']
+        return usage.get('prompt_cache_hit_tokens')
+    
+    @classmethod
+    def _record_usage(cls, span: Span, usage: Optional[Dict[str, Any]]):
+        """记录 token 用量（含命中前缀缓存的 token 数）到 span 属性和计数器"""
+        if not usage:
+            return
+        prompt_tokens = usage.get('prompt_tokens', 0)
+        completion_tokens = usage.get('completion_tokens', 0)
+        span.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        tracer.incr("llm.tokens", prompt_tokens, kind="prompt")
+        tracer.incr("llm.tokens", completion_tokens, kind="completion")
+        cached_tokens = cls._cached_tokens(usage)
+        if cached_tokens is not None:
+            span.set(cached_tokens=cached_tokens)
+            tracer.incr("llm.tokens", cached_tokens, kind="cached")
+    
+    def _build_payload(self, prompt: str, stream: bool = False,
+                       response_format: Optional[Dict[str, Any]] = None,
+                       model: Optional[str] = None, max_tokens: Optional[int] = None,
+                       messages: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        构造请求体
         
-        data = {
-            "model": self.model_name,
-            "messages": [
+        Args:
+            response_format: 结构化输出约束，如 {"type": "json_object"}，原样传给 API
+            model: 本次请求使用的模型，为 None 时使用 model_name
+            max_tokens: 本次请求的最大输出 token 数，为 None 时使用 max_tokens
+            messages: 按角色区分的消息列表，为 None 时把 prompt 作为一条用户消息
+        """
+        payload = {
+            "model": model or self.model_name,
+            "messages": messages or [
                 {"role": "user", "content": prompt}
             ],
             "temperature": self.temperature,
-            "max_tokens": self.max_tokens,
-            "stream": False
+            "max_tokens": max_tokens or self.max_tokens,
+            "stream": stream
         }
+        if stream:
+            # 让服务端在最后一个数据块返回 token 用量
+            payload["stream_options"] = {"include_usage": True}
+        if response_format:
+            payload["response_format"] = response_format
+        return payload
+    
+    def _estimate_tokens(self, prompt: str, max_tokens: Optional[int] = None) -> int:
+        """预估一次请求消耗的 token 数（prompt + 最大输出），用于 TPM 限流预扣"""
+        # 中文约 1~1.5 字符/token，英文约 4 字符/token，按 2 字符/token 估算
+        return len(prompt) // 2 + (max_tokens or self.max_tokens)
+    
+    @staticmethod
+    def _latency_kind(kind: str, model: Optional[str]) -> str:
+        """延迟样本的类别：指定了模型的请求按模型分开统计，不同模型的对冲阈值互不影响"""
+        return f"{kind}:{model}" if model else kind
+    
+    @staticmethod
+    def _request_options(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """从调用参数中取出逐次请求的选项：response_format、model、max_tokens、messages"""
+        return {key: kwargs.get(key) for key in ("response_format", "model", "max_tokens", "messages")}
+    
+    def _with_messages(self, input: LanguageModelInput, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        输入为消息列表（SystemMessage、HumanMessage 等）时，把按角色区分的消息放入 messages 参数
+        
+        LangChain 的 LLM 接口只向 _call/_astream 传递拼接后的文本，这里保留角色，
+        使固定的系统消息成为请求中字节稳定的前缀，能命中服务端的前缀缓存
+        """
+        if "messages" not in kwargs:
+            prompt_value = self._convert_input(input)
+            if isinstance(prompt_value, ChatPromptValue):
+                kwargs = {**kwargs, "messages": convert_to_openai_messages(prompt_value.to_messages())}
+        return kwargs
+    
+    def invoke(self, input: LanguageModelInput, config=None, *, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
+        return super().invoke(input, config, stop=stop, **self._with_messages(input, kwargs))
+    
+    async def ainvoke(self, input: LanguageModelInput, config=None, *, stop: Optional[List[str]] = None,
+                      **kwargs: Any) -> str:
+        return await super().ainvoke(input, config, stop=stop, **self._with_messages(input, kwargs))
+    
+    def stream(self, input: LanguageModelInput, config=None, *, stop: Optional[List[str]] = None,
+               **kwargs: Any) -> Iterator[str]:
+        return super().stream(input, config, stop=stop, **self._with_messages(input, kwargs))
+    
+    def astream(self, input: LanguageModelInput, config=None, *, stop: Optional[List[str]] = None,
+                **kwargs: Any) -> AsyncIterator[str]:
+        return super().astream(input, config, stop=stop, **self._with_messages(input, kwargs))
+    
+    def _settle(self, reserved: int, usage: Optional[Dict[str, Any]]):
+        """按实际用量修正限流器预扣的 token"""
+        actual = usage.get('total_tokens', reserved) if usage else reserved
+        self.rate_limiter.settle(reserved, actual)
+    
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        判断失败的请求能否重试，返回重试前的等待秒数，不可重试时返回 None
+        
+        429/503 优先使用服务端给出的 Retry-After 并暂停所有请求；
+        其他 5xx、连接失败和超时按带抖动的指数退避重试
+        """
+        if attempt >= config.LLM_MAX_RETRIES:
+            return None
+        status, headers = None, {}
+        if isinstance(error, aiohttp.ClientResponseError):
+            status, headers = error.status, error.headers or {}
+        elif isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+            status, headers = error.response.status_code, error.response.headers
         
+        if status in RETRY_STATUS:
+            delay = parse_retry_after(headers)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            self.rate_limiter.backoff(delay)
+            print(f"⚠️ LLM 请求被限流 (HTTP {status})，{delay:.1f} 秒后重试")
+        elif status in TRANSIENT_STATUS or (status is None and isinstance(error, TRANSIENT_ERRORS)):
+            delay = backoff_delay(attempt)
+        else:
+            return None
+        tracer.incr("llm.retries", reason=str(status or type(error).__name__))
+        return delay
+    
+    def _deadline_retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        在截止时间内判断能否重试：截止时间已到期时抛出 DeadlineExceeded，
+        退避等待会超过剩余时间时不再重试
+        """
+        if isinstance(error, DeadlineExceeded):
+            return None
+        raise_if_expired(error)
+        delay = self._retry_delay(error, attempt)
+        deadline = current_deadline()
+        if delay is not None and deadline is not None and delay >= deadline.remaining():
+            return None
+        return delay
+    
+    def _with_retries_sync(self, attempt_fn: Callable[[], Any]) -> Any:
+        """执行同步请求，可重试的失败按退避策略重试"""
+        attempt = 0
+        while True:
+            try:
+                return attempt_fn()
+            except Exception as e:
+                delay = self._deadline_retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            time.sleep(delay)
+    
+    async def _with_retries(self, attempt_fn: Callable[[], Awaitable[Any]]) -> Any:
+        """执行异步请求，可重试的失败按退避策略重试"""
+        attempt = 0
+        while True:
+            try:
+                return await attempt_fn()
+            except Exception as e:
+                delay = self._deadline_retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            await asyncio.sleep(delay)
+    
+    async def _hedge(self, attempt_fn: Callable[[], Awaitable[Any]], kind: str,
+                     discard: Optional[Callable[[Any], None]] = None) -> Any:
+        """
+        对冲执行一次请求
+        
+        开启 LLM_HEDGE_ENABLED 且已有足够延迟样本时，超过分位延迟仍未返回就发送副本请求，
+        取先返回的结果；每次成功的请求都记录延迟样本
+        """
+        async def timed():
+            start = time.perf_counter()
+            result = await attempt_fn()
+            self.latency.record(kind, time.perf_counter() - start)
+            return result
+        
+        delay = self.latency.hedge_delay(kind) if config.LLM_HEDGE_ENABLED else None
+        if delay is None:
+            return await timed()
+        result, hedged_sent = await hedged(timed, delay, discard)
+        if hedged_sent:
+            tracer.incr("llm.hedged", kind=kind)
+        return result
+    
+    def _sync_timeout(self) -> Tuple[float, float]:
+        return (clamp(config.LLM_CONNECT_TIMEOUT), clamp(config.LLM_READ_TIMEOUT))
+    
+    def _async_timeout(self) -> aiohttp.ClientTimeout:
+        """连接和读取超时，有截止时间时整个请求不超过剩余时间"""
+        return aiohttp.ClientTimeout(
+            total=clamp(None), sock_connect=config.LLM_CONNECT_TIMEOUT, sock_read=config.LLM_READ_TIMEOUT
+        )
+    
+    def _post_sync(self, payload: Dict[str, Any], reserved: int, stream: bool = False) -> requests.Response:
+        """限流后发送一次同步请求，失败时退还预扣的 token"""
+        raise_if_expired()
+        waited = self.rate_limiter.acquire_sync(reserved)
+        tracer.observe("llm.rate_limit_wait", waited)
         try:
-            response = requests.post(
+            response = self.transport.sync_session.post(
                 f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=60
+                headers=self._headers(),
+                json=payload,
+                stream=stream,
+                timeout=self._sync_timeout()
             )
-            response.raise_for_status()
-            
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError:
+                response.close()
+                raise
+            return response
+        except Exception:
+            self.rate_limiter.refund(reserved)
+            raise
+    
+    async def _post_async(self, payload: Dict[str, Any], reserved: int) -> aiohttp.ClientResponse:
+        """
+        限流后发送一次异步请求，返回的响应需由调用方释放
+        
+        失败时退还预扣的 token；被取消（例如对冲中落选）时退还整个预留
+        """
+        raise_if_expired()
+        waited = await self.rate_limiter.acquire(reserved)
+        tracer.observe("llm.rate_limit_wait", waited)
+        try:
+            session = await self.transport.get_async_session()
+            response = await session.post(
+                f"{self.base_url}/chat/completions",
+                headers=self._headers(),
+                json=payload,
+                timeout=self._async_timeout()
+            )
+            try:
+                response.raise_for_status()
+            except aiohttp.ClientResponseError:
+                response.release()
+                raise
+            return response
+        except asyncio.CancelledError:
+            self.rate_limiter.release(reserved)
+            raise
+        except Exception:
+            self.rate_limiter.refund(reserved)
+            raise
+    
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        """调用硅基流动 API"""
+        options = self._request_options(kwargs)
+        reserved = self._estimate_tokens(prompt, options["max_tokens"])
+        payload = self._build_payload(prompt, **options)
+        
+        def attempt() -> Dict[str, Any]:
+            with self._post_sync(payload, reserved) as response:
+                return response.json()
+        
+        try:
+            with tracer.span("llm.request", mode="sync") as span:
+                result = self._with_retries_sync(attempt)
+                self._record_usage(span, result.get("usage"))
+                self._settle(reserved, result.get("usage"))
+                return result["choices"][0]["message"]["content"]
             
         except requests.exceptions.RequestException as e:
+            raise_if_expired(e)
             raise ValueError(f"API 请求失败: {e}")
         except KeyError as e:
             raise ValueError(f"API 响应格式错误: {e}")
     
+    async def _arequest(self, prompt: str, response_format: Optional[Dict[str, Any]] = None,
+                        model: Optional[str] = None, max_tokens: Optional[int] = None,
+                        messages: Optional[List[Dict[str, Any]]] = None
+                        ) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """发送一次异步非流式请求（含重试和对冲），返回 (文本, token 用量)"""
+        reserved = self._estimate_tokens(prompt, max_tokens)
+        payload = self._build_payload(
+            prompt, response_format=response_format, model=model, max_tokens=max_tokens, messages=messages
+        )
+        
+        async def attempt() -> Dict[str, Any]:
+            response = await self._post_async(payload, reserved)
+            try:
+                async with response:
+                    return await response.json()
+            except asyncio.CancelledError:
+                self.rate_limiter.release(reserved)
+                raise
+        
+        try:
+            async with tracer.span("llm.request", mode="async") as span:
+                # 对冲中落选但已完成的请求不会被结算，退还其预留
+                result = await self._with_retries(lambda: self._hedge(
+                    attempt, self._latency_kind("response", model), lambda _: self.rate_limiter.release(reserved)
+                ))
+                usage = result.get("usage")
+                self._record_usage(span, usage)
+                self._settle(reserved, usage)
+                return result["choices"][0]["message"]["content"], usage
+                    
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise_if_expired(e)
+            raise ValueError(f"异步 API 请求失败: {e!r}")
+        except KeyError as e:
+            raise ValueError(f"API 响应格式错误: {e}")
+    
+    
     async def _acall(
         self,
         prompt: str,
@@ -81,37 +422,46 @@ class SiliconFlowLLM(LLM):
         **kwargs: Any,
     ) -> str:
         """异步调用硅基流动 API"""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        text, _ = await self._arequest(prompt, **self._request_options(kwargs))
+        return text
+    
+    async def _agenerate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        """
+        并发处理一批 prompt
         
-        data = {
-            "model": self.model_name,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": self.temperature,
-            "max_tokens": self.max_tokens,
-            "stream": False
-        }
+        LangChain 默认逐个调用 _acall；这里并发发送，由限流器按 RPM/TPM 配额排队，
+        同时进行的请求数不超过 Config.LLM_MAX_CONCURRENCY；任一请求失败时取消其余请求
+        """
+        semaphore = asyncio.Semaphore(max(1, config.LLM_MAX_CONCURRENCY))
+        
+        async def generate(prompt: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+            async with semaphore:
+                return await self._arequest(prompt, **self._request_options(kwargs))
         
+        tasks = [asyncio.ensure_future(generate(prompt)) for prompt in prompts]
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=headers,
-                    json=data,
-                    timeout=aiohttp.ClientTimeout(total=60)
-                ) as response:
-                    response.raise_for_status()
-                    result = await response.json()
-                    return result["choices"][0]["message"]["content"]
-                    
-        except aiohttp.ClientError as e:
-            raise ValueError(f"异步 API 请求失败: {e}")
-        except KeyError as e:
-            raise ValueError(f"API 响应格式错误: {e}")
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # 结果会被丢弃，不再让其余请求继续占用限流配额
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        token_usage: Dict[str, int] = {}
+        for _, usage in results:
+            for key, value in (usage or {}).items():
+                if isinstance(value, int):
+                    token_usage[key] = token_usage.get(key, 0) + value
+        return LLMResult(
+            generations=[[Generation(text=text)] for text, _ in results],
+            llm_output={"token_usage": token_usage, "model_name": kwargs.get("model") or self.model_name},
+        )
     
     def _stream(
         self,
@@ -119,52 +469,148 @@ class SiliconFlowLLM(LLM):
         stop: Optional[List[str]] = None,
         run_manager: Optional[CallbackManagerForLLMRun] = None,
         **kwargs: Any,
-    ):
+    ) -> Iterator[GenerationChunk]:
         """流式调用硅基流动 API"""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": self.model_name,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": self.temperature,
-            "max_tokens": self.max_tokens,
-            "stream": True
-        }
-        
+        options = self._request_options(kwargs)
+        reserved = self._estimate_tokens(prompt, options["max_tokens"])
+        payload = self._build_payload(prompt, stream=True, **options)
         try:
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=data,
-                stream=True,
-                timeout=30
-            )
-            response.raise_for_status()
-            
-            for line in response.iter_lines():
-                if line:
-                    line_str = line.decode('utf-8')
-                    if line_str.startswith('data: '):
-                        data_str = line_str[6:]
-                        if data_str.strip() == '[DONE]':
-                            break
-                        try:
-                            import json
-                            chunk = json.loads(data_str)
-                            if 'choices' in chunk and len(chunk['choices']) > 0:
-                                delta = chunk['choices'][0].get('delta', {})
-                                if 'content' in delta:
-                                    yield delta['content']
-                        except json.JSONDecodeError:
-                            continue
+            # 只有建立连接阶段会重试，开始输出后的失败直接抛出
+            with tracer.span("llm.request", mode="stream") as span, self._with_retries_sync(
+                lambda: self._post_sync(payload, reserved, stream=True)
+            ) as response:
+                first_token = True
+                settled = False
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    done, content, usage = self._parse_sse_line(line.decode('utf-8'))
+                    if usage:
+                        self._record_usage(span, usage)
+                        self._settle(reserved, usage)
+                        settled = True
+                    if done:
+                        break
+                    if content:
+                        if first_token:
+                            first_token = False
+                            tracer.observe("llm.ttft", time.perf_counter() - span.start, mode="stream")
+                        if run_manager:
+                            run_manager.on_llm_new_token(content)
+                        yield GenerationChunk(text=content)
+                if not settled:
+                    self._settle(reserved, None)
                             
         except requests.exceptions.RequestException as e:
+            raise_if_expired(e)
             raise ValueError(f"流式 API 请求失败: {e}")
+    
+    async def _open_stream(
+        self, payload: Dict[str, Any], reserved: int
+    ) -> Tuple[aiohttp.ClientResponse, List[Tuple[bool, Optional[str], Optional[Dict[str, Any]]]]]:
+        """
+        打开一次流式请求并读到第一个 token 为止
+        
+        Returns:
+            (响应, 已读取的 SSE 事件)；读取失败时释放响应并抛出异常，便于重试或对冲，被取消时还会退还预留
+        """
+        response = await self._post_async(payload, reserved)
+        events = []
+        try:
+            async for line in response.content:
+                line_str = line.decode('utf-8').strip()
+                if not line_str:
+                    continue
+                event = self._parse_sse_line(line_str)
+                events.append(event)
+                if event[0] or event[1]:
+                    break
+        except asyncio.CancelledError:
+            response.release()
+            self.rate_limiter.release(reserved)
+            raise
+        except BaseException:
+            response.release()
+            raise
+        return response, events
+    
+    def _discard_stream(self, opened: Tuple[aiohttp.ClientResponse, Any], reserved: int):
+        """对冲中落选但已收到首 token 的流：释放连接并退还预留"""
+        opened[0].release()
+        self.rate_limiter.release(reserved)
+    
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        """异步流式调用硅基流动 API（SSE）"""
+        options = self._request_options(kwargs)
+        reserved = self._estimate_tokens(prompt, options["max_tokens"])
+        payload = self._build_payload(prompt, stream=True, **options)
+        try:
+            async with tracer.span("llm.request", mode="astream") as span:
+                # 首 token 之前的失败可以安全重试或对冲，之后的失败直接抛出
+                response, events = await self._with_retries(lambda: self._hedge(
+                    lambda: self._open_stream(payload, reserved),
+                    self._latency_kind("first_token", options["model"]),
+                    lambda opened: self._discard_stream(opened, reserved),
+                ))
+                
+                async def read_events():
+                    for event in events:
+                        yield event
+                    async for line in response.content:
+                        line_str = line.decode('utf-8').strip()
+                        if line_str:
+                            yield self._parse_sse_line(line_str)
+                
+                async with response:
+                    first_token = True
+                    settled = False
+                    async for done, content, usage in read_events():
+                        if usage:
+                            self._record_usage(span, usage)
+                            self._settle(reserved, usage)
+                            settled = True
+                        if done:
+                            break
+                        if content:
+                            if first_token:
+                                first_token = False
+                                tracer.observe("llm.ttft", time.perf_counter() - span.start, mode="astream")
+                            if run_manager:
+                                await run_manager.on_llm_new_token(content)
+                            yield GenerationChunk(text=content)
+                    if not settled:
+                        self._settle(reserved, None)
+                        
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise_if_expired(e)
+            raise ValueError(f"异步流式 API 请求失败: {e!r}")
+    
+    
+    def close(self):
+        """关闭同步连接池"""
+        self.transport.close()
+    
+    async def aclose(self):
+        """关闭异步和同步连接池"""
+        await self.transport.aclose()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
 
 
 def create_llm() -> SiliconFlowLLM:
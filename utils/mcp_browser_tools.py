@@ -4,89 +4,434 @@
 """
 
 import asyncio
+import base64
+import binascii
+import copy
+import itertools
 import json
-from typing import Optional, Dict, Any, List, Union
-from langchain_mcp_adapters.client import MultiServerMCPClient
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, AsyncIterator, Awaitable, Callable, List, Tuple, Union
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from config import config
+from utils.artifact_store import ArtifactRef, ArtifactStore, shared_artifact_store
+from utils.browser_daemon import daemon_server_config
+from utils.deadline import DeadlineExceeded, current_deadline, deadline_scope, within_deadline
+from utils.model_router import ModelRouter, Route
+from utils.plan_cache import PlanCache
+from utils.plan_dag import StepGraph, has_dependencies
+from utils.plan_parser import PLAN_SCHEMA, IncrementalPlanParser, extract_plan, validate_plan, validate_step
+from utils.server_router import ServerRouter, shared_router
+from utils.speculation import Speculator, SpeculativeNavigation, matches_step
+from utils.step_events import (
+    StepEvent, StepFinished, StepProgress, StepSkipped, StepStarted, TaskFailed, TaskFinished, TaskNote,
+    TaskTimedOut,
+)
+from utils.tool_registry import ToolRegistry
+from utils.tool_retriever import ToolRetriever
+from utils.tool_memo import PageStateMemo
+from utils.tool_schema_cache import ToolSchemaCache
+from utils.tracing import tracer
+from utils.waits import wait_for_condition
+
+# 默认的 Playwright MCP 服务器配置
+DEFAULT_MCP_SERVER_CONFIG: Dict[str, Any] = {
+    "playwright": {
+        "command": "npx",
+        "args": ["@executeautomation/playwright-mcp-server"],
+        "transport": "stdio"
+    }
+}
+
+
+def default_server_config() -> Dict[str, Any]:
+    """
+    获取默认的 MCP 服务器配置
+    
+    设置了 Config.MCP_SERVERS_FILE 时从该 JSON 文件读取（可包含多个兼容 Playwright 的服务器，
+    也兼容 {"mcpServers": {...}} 格式）；设置了 Config.MCP_DAEMON_URL 时连接共享浏览器守护进程；
+    否则为单个本地 Playwright 服务器（stdio）
+    """
+    if config.MCP_SERVERS_FILE:
+        with open(config.MCP_SERVERS_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data.get("mcpServers", data)
+    if config.MCP_DAEMON_URL:
+        return daemon_server_config(config.MCP_DAEMON_URL)
+    return copy.deepcopy(DEFAULT_MCP_SERVER_CONFIG)
+
+
+# 规划前缀模板的版本，修改前缀内容时递增
+PLAN_PROMPT_VERSION = 1
+
+# 规划请求：单条文本（内联布局），或 [系统消息, 用户消息]（前缀布局）
+PlanPrompt = Union[str, List[BaseMessage]]
+
+_PLAN_INSTRUCTIONS = """请提供 JSON 格式的执行计划，包含以下字段：
+- steps: 执行步骤列表，每个步骤包含 action 和 params
+- description: 任务描述
+
+步骤可以额外包含 id 和 depends_on（依赖的步骤 id 列表，[] 表示不依赖任何步骤）。
+互不依赖的步骤会在独立的浏览器会话中并行执行，例如同时访问多个网站；不需要并行时省略这两个字段即可。
+页面未被操作时，重复的读取（获取文本、HTML、截图）会直接返回上次的结果；页面可能自行变化时可为该步骤加上 "fresh": true 强制重新读取。"""
+
+_PLAN_EXAMPLE = """例如:
+{
+  "description": "访问百度并搜索人工智能",
+  "steps": [
+    {"action": "playwright_navigate", "params": {"url": "https://www.baidu.com"}},
+    {"action": "playwright_fill", "params": {"selector": "#kw", "value": "人工智能"}},
+    {"action": "playwright_click", "params": {"selector": "#su"}},
+    {"action": "wait", "params": {"selector": "#content_left"}},
+    {"action": "playwright_screenshot", "params": {"name": "search_result"}}
+  ]
+}"""
+
+
+# 工具输出中内联的 base64 数据（如截图）
+_DATA_URL = re.compile(r"data:([\w.+-]+/[\w.+-]+);base64,([A-Za-z0-9+/=\s]+)")
+
+# 大块文本写入产物存储后，结果中保留的预览长度
+PREVIEW_CHARS = 200
+
+_call_ids = itertools.count(1)
+
+# 接收执行事件的回调
+EventSink = Callable[[StepEvent], Awaitable[None]]
+
+
+class ToolOutput:
+    """工具调用结果：大块内容已写入产物存储，text 中只保留预览和引用"""
+    
+    def __init__(self, text: str, artifacts: Optional[List[ArtifactRef]] = None):
+        self.text = text
+        self.artifacts = artifacts or []
+    
+    @property
+    def ok(self) -> bool:
+        return not self.text.startswith("❌")
+    
+    def __str__(self) -> str:
+        return self.text
+
 
 class MCPPlaywrightAgent:
     """基于 MCP 的 Playwright 浏览器代理"""
     
-    def __init__(self, mcp_server_config: Optional[Dict[str, Any]] = None):
+    def __init__(
+        self,
+        mcp_server_config: Optional[Dict[str, Any]] = None,
+        validate_args: bool = True,
+        artifact_store: Optional[ArtifactStore] = None,
+        memoize: Optional[bool] = None,
+        server_name: Optional[str] = None,
+        router: Optional[ServerRouter] = None,
+    ):
         """
         初始化 MCP Playwright 代理
         
         Args:
             mcp_server_config: MCP 服务器配置，如果为 None 则使用默认配置
+            validate_args: 是否在调用工具前按工具 schema 在本地校验参数
+            artifact_store: 保存大块工具输出的产物存储，为 None 时使用按 Config 共享的存储
+            memoize: 是否缓存页面未变化时的只读工具调用，默认读取 Config.TOOL_MEMO_ENABLED
+            server_name: 固定连接的服务器名称，为 None 时初始化时由 router 选择负载最低的健康服务器
+            router: 服务器路由器，为 None 时使用按服务器配置共享的路由器
         """
         self.mcp_server_config = mcp_server_config or self._get_default_config()
-        self.client: Optional[MultiServerMCPClient] = None
+        self.server_name = server_name
+        self._pinned = server_name is not None
+        self._attached = False
+        self.router = router if router is not None else shared_router(self.mcp_server_config)
+        self.validate_args = validate_args
+        self.artifacts = artifact_store if artifact_store is not None else shared_artifact_store()
+        self.client = None
         self._initialized = False        
         self.session_id: Optional[str] = None
         self.session = None  # 保存复用的会话
+        self.interrupted = False  # 有工具调用被取消或超时，归还会话池前需确认会话仍能响应
         self.tools = None  # 缓存工具列表
-        self._session_context = None  # 保存会话上下文管理器
+        self.registry: Optional[ToolRegistry] = None  # 工具注册表
+        self.current_url: Optional[str] = None  # 最近一次导航的 URL，供等待条件使用
+        memoize = config.TOOL_MEMO_ENABLED if memoize is None else memoize
+        self.memo: Optional[PageStateMemo] = PageStateMemo() if memoize else None  # 只读工具调用缓存
+        self._session_task: Optional[asyncio.Task] = None  # 持有会话上下文的后台任务
+        self._closing: Optional[asyncio.Event] = None
+        self._init_lock = asyncio.Lock()
         
     def _get_default_config(self) -> Dict[str, Any]:
         """获取默认的 MCP 服务器配置"""
-        return {
-            "playwright": {
-                "command": "npx",
-                "args": ["@executeautomation/playwright-mcp-server"],
-                "transport": "stdio"
-            }
-        }    
+        return default_server_config()
 
     async def initialize(self):
         """初始化 MCP 客户端和会话"""
-        if self._initialized:
-            return
+        async with self._init_lock:
+            if self._initialized:
+                return
             
-        try:            # 创建 MCP 客户端
-            self.client = MultiServerMCPClient(self.mcp_server_config)
-            
-            # 使用正确的异步上下文管理器方式创建会话
-            self._session_context = self.client.session("playwright")
-            self.session = await self._session_context.__aenter__()
-            
-            # 加载工具
-            from langchain_mcp_adapters.tools import load_mcp_tools
-            self.tools = await load_mcp_tools(self.session)
+            tried: List[str] = []
+            while True:
+                # 未固定服务器时选择负载最低的健康服务器，会话整个生命周期都连接该服务器
+                if self._pinned:
+                    self.router.attach(self.server_name)
+                else:
+                    self.server_name = self.router.choose(exclude=tried)
+                self._attached = True
+                try:
+                    await self._open_session()
+                    break
+                except Exception as e:
+                    await self._stop_session()
+                    self._detach()
+                    self.router.record_failure(self.server_name)
+                    tried.append(self.server_name)
+                    if self._pinned or len(tried) >= len(self.router.names):
+                        print(f"❌ MCP Playwright 初始化失败: {e}")
+                        if "url" in self.mcp_server_config.get(self.server_name, {}):
+                            print("💡 请确保 MCP 服务器已启动，共享浏览器守护进程可通过 python mcp_daemon.py start 启动")
+                        else:
+                            print("💡 请确保已安装: npm install -g @executeautomation/playwright-mcp-server")
+                        raise
+                    print(f"⚠️ MCP 服务器 {self.server_name} 初始化失败，改用其他服务器: {e}")
             
             print(f"✅ MCP Playwright 工具包初始化成功，可用工具: {len(self.tools)} 个")
             
             # 显示可用工具
-            for tool in self.tools:
-                print(f"  🔧 {tool.name}: {tool.description}")
+            if config.VERBOSE:
+                for tool in self.tools:
+                    print(f"  🔧 {tool.name}: {tool.description}")
             
             self._initialized = True
+    
+    async def _open_session(self):
+        """连接 self.server_name 指定的服务器并加载工具"""
+        async with tracer.span("mcp.initialize", server=self.server_name):
+            # 延迟导入，避免拖慢进程启动
+            from langchain_mcp_adapters.client import MultiServerMCPClient
+            from langchain_mcp_adapters.tools import load_mcp_tools
             
-        except Exception as e:
-            print(f"❌ MCP Playwright 初始化失败: {e}")
-            print("💡 请确保已安装: npm install -g @executeautomation/playwright-mcp-server")
+            # 创建 MCP 客户端
+            self.client = MultiServerMCPClient(self.mcp_server_config)
+            
+            # 会话上下文由独立任务持有，初始化和关闭可以在不同任务中进行
+            self._closing = asyncio.Event()
+            ready = asyncio.get_running_loop().create_future()
+            self._session_task = asyncio.create_task(self._run_session(ready))
+            self.session = await ready
+            
+            # 加载工具，并写入 schema 缓存供下次启动使用
+            self.tools = await load_mcp_tools(self.session)
+            self.registry = ToolRegistry(self.tools)
+            ToolSchemaCache().save(self.mcp_server_config, self.tools)
+    
+    async def _run_session(self, ready: asyncio.Future):
+        """在当前任务中打开 MCP 会话，并保持到收到关闭信号"""
+        try:
+            async with self.client.session(self.server_name) as session:
+                ready.set_result(session)
+                await self._closing.wait()
+        except asyncio.CancelledError:
+            if not ready.done():
+                ready.cancel()
             raise
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+    
+    async def _stop_session(self):
+        """通知会话任务退出并等待其结束"""
+        if self._session_task is None:
+            return
+        self._closing.set()
+        try:
+            await asyncio.wait_for(self._session_task, timeout=10)
+        except (asyncio.TimeoutError, asyncio.CancelledError, Exception):
+            pass
+        self._session_task = None
+        self.session = None
     
-    async def call_tool(self, tool_name: str, **kwargs) -> str:
-        """调用指定的 MCP 工具"""
+    def _detach(self):
+        """会话不再连接服务器，从路由器的会话计数中移除"""
+        if self._attached:
+            self._attached = False
+            self.router.detach(self.server_name)
+    
+    def is_alive(self) -> bool:
+        """会话任务是否仍在运行"""
+        return (
+            self._initialized
+            and self._session_task is not None
+            and not self._session_task.done()
+        )
+    
+    async def ping(self, timeout: float = 5) -> bool:
+        """向 MCP 服务器发送 ping，检查子进程和会话是否健康"""
+        if not self.is_alive():
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout=timeout)
+            return True
+        except Exception:
+            return False
+    
+    async def call_tool(self, tool_name: str, fresh: bool = False, deadline: Optional[float] = None, **kwargs) -> str:
+        """调用指定的 MCP 工具，返回结果文本（大块内容为产物引用）"""
+        return (await self.invoke_tool(tool_name, fresh=fresh, deadline=deadline, **kwargs)).text
+    
+    async def invoke_tool(
+        self, tool_name: str, fresh: bool = False, deadline: Optional[float] = None, **kwargs
+    ) -> ToolOutput:
+        """
+        调用指定的 MCP 工具，大块文本和截图写入产物存储，结果中只保留引用
+        
+        页面未变化时，参数相同的只读工具调用直接返回缓存结果；fresh=True 时跳过缓存
+        （仍会写入缓存），失效规则见 utils/tool_memo.py
+        
+        deadline 为本次调用的时限（秒），默认读取 Config.MCP_CALL_TIMEOUT（0 表示不限），且不超过任务的截止时间。
+        本次调用超时返回失败结果；任务的截止时间到期时抛出 DeadlineExceeded
+        """
         if not self._initialized:
             await self.initialize()
         
+        outer = current_deadline()
+        with deadline_scope(deadline or config.MCP_CALL_TIMEOUT) as scope:
+            try:
+                return await self._invoke_tool(tool_name, fresh, kwargs)
+            except DeadlineExceeded:
+                if scope is outer:
+                    raise
+                return ToolOutput(f"❌ 调用工具 {tool_name} 超时（{scope.seconds:g} 秒）")
+    
+    async def _invoke_tool(self, tool_name: str, fresh: bool, kwargs: Dict[str, Any]) -> ToolOutput:
         try:
             # 找到对应的工具
-            target_tool = None
-            for tool in self.tools:
-                if tool.name == tool_name:
-                    target_tool = tool
-                    break
+            target_tool = self.registry.get(tool_name)
             
             if not target_tool:
-                return f"❌ 工具 {tool_name} 未找到"
+                return ToolOutput(f"❌ 工具 {tool_name} 未找到")
+            
+            # 本地校验参数，避免把错误参数发送到 MCP 服务器
+            if self.validate_args:
+                errors = self.registry.validate(tool_name, kwargs)
+                if errors:
+                    return ToolOutput(f"❌ 工具 {tool_name} 参数校验失败: {'; '.join(errors)}")
             
-            # 调用工具
-            result = await target_tool.ainvoke(kwargs)
-            return str(result)
+            read_only = self.memo is not None and self.memo.is_read_only(tool_name)
+            if read_only:
+                version = self.memo.version
+                if not fresh:
+                    cached = self.memo.get(tool_name, kwargs)
+                    if cached is not None:
+                        return cached
+            elif self.memo is not None:
+                self.memo.invalidate()
+            
+            try:
+                output = await self._invoke(target_tool, tool_name, kwargs)
+            finally:
+                if self.memo is not None and not read_only:
+                    self.memo.invalidate()
+            if read_only and output.ok:
+                self.memo.put(tool_name, kwargs, output, version)
+            return output
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            return f"❌ 调用工具 {tool_name} 失败: {e}"
+            return ToolOutput(f"❌ 调用工具 {tool_name} 失败: {e}")
+    
+    async def _invoke(self, target_tool, tool_name: str, kwargs: Dict[str, Any]) -> ToolOutput:
+        """实际调用 MCP 工具并整理结果"""
+        # 以 ToolCall 形式调用，才能拿到文本以外的内容（如截图）
+        call = {"type": "tool_call", "id": f"call_{next(_call_ids)}", "name": tool_name, "args": kwargs}
+        start = time.perf_counter()
+        try:
+            async with tracer.span("mcp.call_tool", tool=tool_name):
+                message = await within_deadline(target_tool.ainvoke(call))
+        except (asyncio.CancelledError, DeadlineExceeded):
+            # 超时不计为服务器失败；服务器可能仍在处理该调用，归还会话前需确认会话仍能响应
+            self.interrupted = True
+            tracer.incr("mcp.call_tool.interrupted", tool=tool_name)
+            raise
+        except Exception as e:
+            from langchain_core.tools import ToolException
+            # 工具返回的错误说明服务器仍然正常；其他异常（连接断开等）计为服务器失败
+            if isinstance(e, ToolException):
+                self.router.record_success(self.server_name, time.perf_counter() - start)
+            else:
+                self.router.record_failure(self.server_name)
+            raise
+        self.router.record_success(self.server_name, time.perf_counter() - start)
+        if tool_name == "playwright_navigate":
+            self.current_url = kwargs.get("url")
+        
+        text = self._content_text(getattr(message, "content", message))
+        attachments = getattr(message, "artifact", None) or []
+        if self.artifacts is None:
+            return ToolOutput(text)
+        if attachments or len(text) > config.ARTIFACT_INLINE_LIMIT or "base64," in text:
+            # 哈希和写盘放到线程中，避免阻塞事件循环
+            return await asyncio.to_thread(self._store_output, text, attachments)
+        return ToolOutput(text)
+    
+    @staticmethod
+    def _content_text(content: Any) -> str:
+        """把工具返回的文本内容（字符串或内容块列表）合并为字符串"""
+        if isinstance(content, str):
+            return content
+        if isinstance(content, list):
+            parts = []
+            for item in content:
+                if isinstance(item, dict):
+                    parts.append(str(item.get("text", "")))
+                else:
+                    parts.append(str(item))
+            return "\n".join(parts)
+        return str(content)
+    
+    def _store_output(self, text: str, attachments: List[Any]) -> ToolOutput:
+        """把内联的 base64 数据、过长的文本和非文本内容写入产物存储"""
+        refs: List[ArtifactRef] = []
+        
+        def store(data: bytes, media_type: str) -> str:
+            ref = self.artifacts.put(data, media_type)
+            if ref is None:
+                return f"⚠️ {media_type} 内容超过产物大小上限，未保存"
+            refs.append(ref)
+            return str(ref)
+        
+        def replace_data_url(match) -> str:
+            try:
+                data = base64.b64decode(match.group(2))
+            except (binascii.Error, ValueError):
+                return match.group(0)
+            return store(data, match.group(1))
+        
+        text = _DATA_URL.sub(replace_data_url, text)
+        if len(text) > config.ARTIFACT_INLINE_LIMIT:
+            media_type = "text/html" if text.lstrip().startswith("<") else "text/plain"
+            text = f"{text[:PREVIEW_CHARS]}…\n{store(text.encode('utf-8'), media_type)}"
+        
+        lines = [text] if text else []
+        for item in attachments:
+            media_type = getattr(item, "mimeType", None) or "application/octet-stream"
+            data = getattr(item, "data", None)
+            resource = getattr(item, "resource", None)
+            if data is None and resource is not None:
+                media_type = getattr(resource, "mimeType", None) or media_type
+                data = getattr(resource, "blob", None)
+                if data is None:
+                    payload = str(getattr(resource, "text", ""))
+                    lines.append(store(payload.encode("utf-8"), media_type))
+                    continue
+            if data is None:
+                continue
+            try:
+                lines.append(store(base64.b64decode(data), media_type))
+            except (binascii.Error, ValueError):
+                lines.append(f"⚠️ 无法解码的 {media_type} 内容")
+        return ToolOutput("\n".join(lines), refs)
     
     async def get_available_tools(self) -> List[str]:
         """获取可用工具列表"""
@@ -94,8 +439,7 @@ class MCPPlaywrightAgent:
             await self.initialize()
         
         try:
-            tools = await self.client.get_tools()
-            return [tool.name for tool in tools]
+            return self.registry.names
         except Exception as e:
             print(f"❌ 获取工具列表失败: {e}")
             return []
@@ -103,19 +447,26 @@ class MCPPlaywrightAgent:
     async def close(self):
         """关闭 MCP 会话和连接"""
         try:
-            # 关闭浏览器
-            if self._initialized and self.tools:
-                await self.call_tool("playwright_close", random_string="dummy")
-              # 关闭会话
-            if self._session_context and self.session:
-                await self._session_context.__aexit__(None, None, None)
-                self.session = None
-                self._session_context = None
-              # 重置状态
+            async with tracer.span("mcp.close"):
+                # 关闭浏览器，会话已失效时跳过
+                if self.is_alive() and self.tools:
+                    try:
+                        await asyncio.wait_for(
+                            self.call_tool("playwright_close", random_string="dummy"), timeout=10
+                        )
+                    except asyncio.TimeoutError:
+                        print("⚠️ 关闭浏览器超时，直接关闭会话")
+                # 关闭会话
+                await self._stop_session()
+            self._detach()
+            # 重置状态
             self._initialized = False
             self.tools = None
+            self.registry = None
+            self.current_url = None
+            if self.memo is not None:
+                self.memo.invalidate()
             self.session_id = None
-            self._session_context = None
             
             print("✅ MCP Playwright 连接已关闭")
             
@@ -126,149 +477,890 @@ class MCPPlaywrightAgent:
 class MCPSmartBrowserAgent:
     """智能的 MCP 浏览器代理，支持复杂任务"""
     
-    def __init__(self, llm, mcp_server_config: Optional[Dict[str, Any]] = None):
+    def __init__(
+        self,
+        llm,
+        mcp_server_config: Optional[Dict[str, Any]] = None,
+        stream_plan: bool = True,
+        plan_cache: Optional[PlanCache] = None,
+        pool=None,
+        llm_concurrency: Optional[int] = None,
+        schema_cache: Optional[ToolSchemaCache] = None,
+        response_format: Optional[str] = None,
+        model_router: Optional[ModelRouter] = None,
+        prompt_layout: Optional[str] = None,
+        speculator: Optional[Speculator] = None,
+    ):
         """
         初始化智能浏览器代理
         
         Args:
             llm: LangChain 语言模型实例
             mcp_server_config: MCP 服务器配置
+            stream_plan: 是否流式生成计划，边生成边执行步骤
+            plan_cache: 计划缓存，为 None 时按 Config 创建默认缓存
+            pool: MCP 会话池，为 None 时按 Config 创建默认会话池
+            llm_concurrency: 同时进行的 LLM 规划请求上限，默认读取 Config.LLM_MAX_CONCURRENCY
+            schema_cache: 工具 schema 缓存，为 None 时按 Config 创建默认缓存
+            response_format: 结构化输出模式（json_object / json_schema），为空表示自由文本，
+                默认读取 Config.PLAN_RESPONSE_FORMAT
+            model_router: 规划模型路由，为 None 时按 Config 创建（未配置小模型时不路由）
+            prompt_layout: 规划 prompt 布局，prefix 为固定系统前缀 + 任务用户消息，inline 为单条文本，
+                默认读取 Config.PLAN_PROMPT_LAYOUT
+            speculator: 推测导航，为 None 时按 Config 创建（默认不开启）
         """
+        from utils.session_pool import MCPSessionPool
+        
         self.llm = llm
-        self.mcp_agent = MCPPlaywrightAgent(mcp_server_config)
+        self.pool = pool if pool is not None else MCPSessionPool(mcp_server_config)
+        self.stream_plan = stream_plan
+        self.response_format = config.PLAN_RESPONSE_FORMAT if response_format is None else response_format
+        self.plan_cache = plan_cache if plan_cache is not None else PlanCache()
+        self.model_router = model_router if model_router is not None else ModelRouter()
+        self.prompt_layout = config.PLAN_PROMPT_LAYOUT if prompt_layout is None else prompt_layout
+        if self.prompt_layout == "prefix" and config.TOOL_PRUNING:
+            print("⚠️ PLAN_PROMPT_LAYOUT=prefix 时工具目录裁剪（TOOL_PRUNING）不生效：前缀布局始终列出全部工具")
+        self.speculator = speculator if speculator is not None else Speculator()
+        self.registry: Optional[ToolRegistry] = None
+        self.retriever: Optional[ToolRetriever] = None
+        self._llm_semaphore = asyncio.Semaphore(
+            config.LLM_MAX_CONCURRENCY if llm_concurrency is None else llm_concurrency
+        )
+        self._catalog_hash = ""
+        self._prefix: Optional[Tuple[str, str]] = None  # (前缀版本, 前缀文本)
         self._initialized = False
+        
+        # 有缓存的工具 schema 时，无需等待服务器握手即可构造 prompt
+        server_config = mcp_server_config or getattr(self.pool, "mcp_server_config", None) or default_server_config()
+        cached_tools = (schema_cache or ToolSchemaCache()).load(server_config)
+        if cached_tools:
+            self._use_registry(ToolRegistry(cached_tools))
     
     async def initialize(self):
-        """初始化代理"""
+        """初始化代理，预热会话池"""
         if not self._initialized:
-            await self.mcp_agent.initialize()
+            await self.pool.start()
+            if self.registry is not None and self.registry.catalog_hash != self.pool.registry.catalog_hash:
+                print("⚠️ 服务器工具列表与缓存不一致，已使用最新的工具列表")
+            self._use_registry(self.pool.registry)
             self._initialized = True
     
-    async def execute_smart_task(self, task_description: str) -> str:
-        """执行智能任务"""
-        if not self._initialized:
-            await self.initialize()
+    def _use_registry(self, registry: ToolRegistry):
+        """切换工具注册表，并重建工具检索索引（前缀布局始终列出全部工具，不裁剪）"""
+        self.registry = registry
+        self._catalog_hash = registry.catalog_hash
+        self.retriever = ToolRetriever(registry) if config.TOOL_PRUNING and self.prompt_layout != "prefix" else None
+    
+    def prewarm(self):
+        """在后台预热会话池（启动 MCP 服务器和浏览器），立即返回"""
+        self.pool.prewarm()
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """返回计划缓存的命中统计"""
+        return self.plan_cache.stats()
+    
+    def route_stats(self) -> Dict[str, Any]:
+        """返回各规划路由的模型、成功率和延迟"""
+        return self.model_router.stats()
+    
+    def speculation_stats(self) -> Dict[str, Any]:
+        """返回推测导航的次数、命中率和累计节省的时间"""
+        return self.speculator.stats()
+    
+    def _select_tools(self, task_description: str) -> Optional[List[str]]:
+        """挑选写入 prompt 的工具，未开启裁剪时返回 None（列出全部工具）"""
+        if self.retriever is None:
+            return None
+        selected = self.retriever.select(task_description)
+        tracer.observe("catalog.tools", len(selected))
+        return selected
+    
+    def _note_expansions(self, steps: List[Dict[str, Any]], selected: Optional[List[str]]):
+        """计划使用了 prompt 中未列出参数的工具时，之后的任务都完整列出该工具"""
+        if self.retriever is None or selected is None:
+            return
+        for step in steps:
+            action = step.get('action')
+            if action not in selected and self.retriever.promote(action):
+                tracer.incr("catalog.expansions")
+                print(f"🔎 工具 {action} 已加入后续任务的工具目录")
+    
+    def _tools_section(self, tool_names: Optional[List[str]] = None) -> str:
+        """prompt 中的可用操作列表，tool_names 为 None 时列出全部工具"""
+        # 工具目录在初始化时已渲染并缓存
+        if tool_names is None:
+            tools_list = self.registry.catalog
+        else:
+            tools_list = self.registry.render_catalog(tool_names)
+            omitted = self.retriever.omitted(tool_names)
+            if omitted:
+                tools_list += f"\n- 其他工具（确有需要时也可使用）: {', '.join(omitted)}"
+        return f"""可用的操作包括（action请直接使用这些工具名称）:
+{tools_list}
+- wait: 等待页面条件满足（特殊操作），参数任选其一: selector（元素可见）、text（页面出现文本）、url_contains（URL 包含）、url_change（URL 变化，值为 true）、state（load 或 network_idle），可选 timeout（最长等待秒数）"""
+    
+    @property
+    def prefix_version(self) -> str:
+        """规划前缀的版本：前缀模板版本 + 工具目录哈希，工具列表变化时随之变化"""
+        return f"v{PLAN_PROMPT_VERSION}-{self._catalog_hash[:12]}"
+    
+    def _system_prefix(self) -> str:
+        """
+        规划请求的固定系统前缀：规划说明、完整工具目录和示例，不含任何与任务有关的内容
         
-        try:
-            # 动态获取可用工具列表
-            available_tools = []
-            if self.mcp_agent.tools:
-                for tool in self.mcp_agent.tools:
-                    # 获取工具的参数信息
-                    tool_info = f"- {tool.name}: {tool.description}"
-                    if hasattr(tool, 'args') and tool.args:
-                        # 如果有参数信息，添加参数说明
-                        params = []
-                        for param_name, param_info in tool.args.items():
-                            param_desc = f"{param_name}"
-                            if hasattr(param_info, 'description') and param_info.description:
-                                param_desc += f" ({param_info.description})"
-                            params.append(param_desc)
-                        if params:
-                            tool_info += f" (参数: {', '.join(params)})"
-                    available_tools.append(tool_info)
-            
-            tools_list = "\n".join(available_tools) if available_tools else "- 无可用工具"
-            
-            # 使用 LLM 分析任务并生成执行计划
-            prompt = f"""
+        按前缀版本缓存，工具目录不变时每次请求的前缀逐字节相同，可命中服务端的前缀缓存
+        """
+        version = self.prefix_version
+        if self._prefix is None or self._prefix[0] != version:
+            text = f"""作为一个浏览器自动化专家，请分析用户给出的任务并提供详细的执行步骤。
+
+{_PLAN_INSTRUCTIONS}
+
+{self._tools_section()}
+
+{_PLAN_EXAMPLE}"""
+            self._prefix = (version, text)
+            tracer.incr("plan.prefix.built")
+        return self._prefix[1]
+    
+    def _with_prefix(self, user_text: str) -> List[BaseMessage]:
+        """固定的系统前缀在前，随请求变化的内容放在最后的用户消息中"""
+        return [SystemMessage(content=self._system_prefix()), HumanMessage(content=user_text)]
+    
+    def _describe_prompt(self, prompt: PlanPrompt) -> str:
+        """VERBOSE 输出用：前缀布局只显示前缀版本和用户消息"""
+        if isinstance(prompt, str):
+            return prompt
+        return f"[前缀 {self.prefix_version}] {prompt[-1].content}"
+    
+    def _build_prompt(self, task_description: str, tool_names: Optional[List[str]] = None) -> PlanPrompt:
+        """
+        构造任务规划 prompt
+        
+        前缀布局返回 [固定系统前缀, 任务]；内联布局返回单条文本，tool_names 为 None 时列出全部工具
+        """
+        if self.prompt_layout == "prefix":
+            return self._with_prefix(f"任务: {task_description}")
+        return f"""
 作为一个浏览器自动化专家，请分析以下任务并提供详细的执行步骤：
 
 任务: {task_description}
 
-请提供 JSON 格式的执行计划，包含以下字段：
-- steps: 执行步骤列表，每个步骤包含 action 和 params
-- description: 任务描述
+{_PLAN_INSTRUCTIONS}
 
-可用的操作包括（action请直接使用这些工具名称）:
-{tools_list}
-- wait: 等待指定时间（秒，特殊操作）
+{self._tools_section(tool_names)}
 
-例如:
-{{
-  "description": "访问百度并搜索人工智能",
-  "steps": [
-    {{"action": "playwright_navigate", "params": {{"url": "https://www.baidu.com"}}}},
-    {{"action": "playwright_fill", "params": {{"selector": "#kw", "value": "人工智能"}}}},
-    {{"action": "playwright_click", "params": {{"selector": "#su"}}}},
-    {{"action": "wait", "params": {{"seconds": 3}}}},
-    {{"action": "playwright_screenshot", "params": {{"name": "search_result"}}}}
-  ]
-}}
+{_PLAN_EXAMPLE}
 """
-            print(f"🔍 请求 prompt: {prompt}")
-            response = await self.llm.ainvoke(prompt)
-            
-            # 解析响应
+    
+    @staticmethod
+    def _response_text(response) -> str:
+        """处理 LLM 响应，可能是字符串或者消息对象"""
+        if hasattr(response, 'content'):
+            return response.content
+        return str(response)
+    
+    def _llm_kwargs(self) -> Dict[str, Any]:
+        """规划请求的额外参数：开启结构化输出时要求 API 返回 JSON 对象或符合计划 schema 的输出"""
+        if self.response_format == "json_object":
+            return {"response_format": {"type": "json_object"}}
+        if self.response_format == "json_schema":
+            return {"response_format": {
+                "type": "json_schema",
+                "json_schema": {"name": "browser_plan", "schema": PLAN_SCHEMA},
+            }}
+        return {}
+    
+    @staticmethod
+    def _feed_parser(parser: IncrementalPlanParser, text: str) -> Tuple[List[Dict[str, Any]], float]:
+        """向增量解析器输入文本，返回 (新解析出的步骤, 解析耗时)"""
+        start = time.perf_counter()
+        steps = parser.feed(text)
+        return steps, time.perf_counter() - start
+    
+    async def _stream_plan(
+        self, prompt: PlanPrompt, parser: IncrementalPlanParser, step_queue: asyncio.Queue, route: Route
+    ) -> str:
+        """使用 route 指定的模型流式生成计划，每解析出一个完整步骤就放入队列"""
+        chunks = []
+        kwargs = {**self._llm_kwargs(), **route.llm_kwargs()}
+        start = time.perf_counter()
+        parse_seconds = 0.0
+        parse_mode = "stream" if self.stream_plan else "full"
+        ok = cancelled = False
+        try:
+            async with self._llm_semaphore:
+                # 路由延迟不包含等待并发名额的时间
+                start = time.perf_counter()
+                if self.stream_plan:
+                    async for chunk in self.llm.astream(prompt, **kwargs):
+                        text = self._response_text(chunk)
+                        chunks.append(text)
+                        steps, seconds = self._feed_parser(parser, text)
+                        parse_seconds += seconds
+                        for step in steps:
+                            await step_queue.put(step)
+                else:
+                    response = await self.llm.ainvoke(prompt, **kwargs)
+                    text = self._response_text(response)
+                    chunks.append(text)
+                    steps, parse_seconds = self._feed_parser(parser, text)
+                    for step in steps:
+                        await step_queue.put(step)
+            ok = True
+        except asyncio.CancelledError:
+            # 执行端提前结束而取消规划时不计入路由统计
+            cancelled = True
+            raise
+        finally:
+            if not cancelled:
+                self.model_router.record(route, time.perf_counter() - start, ok)
+            if chunks:
+                # 与整体解析的 plan.parse span 同名，按 mode 区分：流式请求记录每个计划累计的增量解析耗时，
+                # 非流式请求一次性解析完整响应，与整体解析同属 full
+                tracer.observe("plan.parse", parse_seconds, mode=parse_mode)
+            # 无论成功与否都通知执行端结束
+            await step_queue.put(None)
+        return "".join(chunks)
+    
+    @staticmethod
+    def _parse_plan(response_text: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """整体解析并校验计划，返回 (计划, 错误信息)"""
+        try:
+            with tracer.span("plan.parse", mode="full"):
+                plan = extract_plan(response_text)
+        except (json.JSONDecodeError, ValueError) as e:
+            return None, f"❌ 任务规划解析失败: {e}"
+        errors = validate_plan(plan)
+        if errors:
+            return None, f"❌ 任务规划不符合计划格式: {'; '.join(errors)}"
+        return plan, None
+    
+    async def _escalate(self, route: Route, emit: EventSink) -> Route:
+        """记录一次不符合格式的计划；使用小模型时升级到大模型，返回之后使用的路由"""
+        self.model_router.record_invalid(route)
+        larger = self.model_router.escalate(route)
+        if larger is None:
+            return route
+        await emit(TaskNote(f"⬆️ 计划不符合格式，改用 {larger.model} 重新规划"))
+        return larger
+    
+    async def _execute_step(
+        self, browser: MCPPlaywrightAgent, index: int, step: Dict[str, Any], emit: EventSink
+    ) -> StepFinished:
+        """执行单个步骤并产出开始和完成事件，返回完成事件"""
+        action = step.get('action')
+        params = step.get('params', {})
+        await emit(StepStarted(index, action, params))
+        start = time.perf_counter()
+        artifacts: List[ArtifactRef] = []
+        
+        errors = validate_step(step)
+        if errors:
+            output, ok = f"❌ 步骤 {index} 不符合计划格式: {'; '.join(errors)}", False
+        else:
             try:
-                import re
-                # 处理response，可能是字符串或者对象
-                if hasattr(response, 'content'):
-                    response_text = response.content
+                if action == "wait":
+                    # 特殊处理等待操作：条件满足即返回，且不超过任务的截止时间
+                    output, ok = await within_deadline(wait_for_condition(browser, params))
                 else:
-                    response_text = str(response)
+                    # 直接调用对应的 MCP 工具，大块输出以产物引用返回；fresh 步骤跳过只读调用缓存
+                    result = await browser.invoke_tool(action, fresh=bool(step.get('fresh')), **params)
+                    output, ok, artifacts = result.text, result.ok, result.artifacts
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                output, ok = f"❌ 步骤 {index} 执行失败: {e}", False
+        
+        finished = StepFinished(index, action, ok, output, artifacts, time.perf_counter() - start)
+        await emit(finished)
+        return finished
+    
+    @staticmethod
+    def _format_results(description: str, step_results: List[str]) -> str:
+        results = []
+        results.append(f"🎯 任务: {description}")
+        results.append("=" * 50)
+        results.extend(step_results)
+        return "\n".join(results)
+    
+    async def execute_smart_task(self, task_description: str, deadline: Optional[float] = None) -> str:
+        """
+        执行智能任务并返回完整的结果文本；需要边执行边展示结果时使用 stream_smart_task
+        
+        超过截止时间时返回已完成步骤的结果，并列出已完成和被中断的步骤
+        """
+        step_results: List[str] = []
+        async for event in self.stream_smart_task(task_description, deadline):
+            if isinstance(event, TaskTimedOut):
+                return self._format_results(task_description, step_results + event.lines())
+            if isinstance(event, TaskFailed):
+                return event.message
+            if isinstance(event, TaskFinished):
+                return self._format_results(event.description, step_results)
+            if not isinstance(event, StepStarted):
+                step_results.extend(event.lines())
+        return self._format_results(task_description, step_results)
+    
+    async def stream_smart_task(
+        self, task_description: str, deadline: Optional[float] = None
+    ) -> AsyncIterator[StepEvent]:
+        """
+        执行智能任务，以异步生成器的形式逐个产出执行事件
+        
+        计划以流式方式生成，每个步骤在生成完成后立即执行；事件流以 TaskFinished 或 TaskFailed 结束。
+        调用方提前停止迭代时，尚未完成的执行会被取消。
+        
+        deadline 为整个任务的时限（秒），默认读取 Config.TASK_DEADLINE（0 表示不限）。截止时间传递到
+        LLM 请求、每次工具调用和等待步骤；到期时取消仍在进行的工作，浏览器会话确认可用后归还会话池，
+        事件流以列出已完成和被中断步骤的 TaskTimedOut 结束。
+        """
+        events: asyncio.Queue = asyncio.Queue()
+        progress = StepProgress()
+        
+        async def emit(event: StepEvent):
+            progress.observe(event)
+            await events.put(event)
+        
+        async def run():
+            try:
+                with deadline_scope(deadline or config.TASK_DEADLINE):
+                    try:
+                        if self.registry is None:
+                            # 没有缓存的工具 schema 时，需要先完成握手才能构造 prompt
+                            await within_deadline(self.initialize())
+                        async with tracer.span("task.execute"):
+                            await within_deadline(self._run_task(task_description, emit))
+                    except DeadlineExceeded as e:
+                        tracer.incr("task.deadline_exceeded")
+                        await events.put(progress.timed_out(task_description, e.deadline.seconds))
+            except Exception as e:
+                await events.put(TaskFailed(task_description, f"❌ 智能任务执行失败: {e}"))
+            finally:
+                await events.put(None)
+        
+        runner = asyncio.create_task(run())
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            if not runner.done():
+                runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+    
+    @asynccontextmanager
+    async def _lease(self) -> AsyncIterator[MCPPlaywrightAgent]:
+        """等待初始化完成后从会话池租用浏览器会话，任务结束后归还"""
+        if not self._initialized:
+            await self.initialize()
+        async with self.pool.lease() as browser:
+            yield browser
+    
+    async def _run_task(self, task_description: str, emit: EventSink):
+        """规划并执行任务：规划与会话初始化并行进行，执行步骤时才租用浏览器会话"""
+        # 命中计划缓存时跳过 LLM 规划
+        catalog_hash = self._catalog_hash
+        cached_plan = self.plan_cache.get(task_description, catalog_hash)
+        if cached_plan is not None:
+            print("⚡ 命中计划缓存，跳过 LLM 规划")
+            steps = cached_plan.get('steps', [])
+            description = cached_plan.get('description', task_description)
+            async with self._lease() as browser:
+                ok, effective_steps = await self._run_steps(browser, steps, emit, task_description)
+            # 缓存的计划失败后经重新规划恢复时，用恢复后的计划替换旧条目；恢复也失败时删除条目，下次重新规划
+            if not ok:
+                self.plan_cache.evict(task_description, catalog_hash)
+            elif effective_steps != steps and catalog_hash == self._catalog_hash:
+                self.plan_cache.put(task_description, catalog_hash, {"description": description, "steps": effective_steps})
+            await emit(TaskFinished(task_description, description, ok, len(effective_steps)))
+            return
                 
-                print(f"🔍 LLM 响应: {response_text}")
-
-                json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-                if json_match:
-                    plan = json.loads(json_match.group())
-                else:
-                    raise ValueError("未找到有效的 JSON 响应")
-            except (json.JSONDecodeError, ValueError) as e:
-                return f"❌ 任务规划解析失败: {e}\n原始响应: {response_text if 'response_text' in locals() else str(response)}"
-            
-            # 执行计划
-            results = []
-            results.append(f"🎯 任务: {plan.get('description', task_description)}")
-            results.append("=" * 50)
-            
-            for i, step in enumerate(plan.get('steps', []), 1):
-                action = step.get('action')
-                params = step.get('params', {})
+        # 使用 LLM 分析任务并生成执行计划，按任务复杂度选择规划模型
+        selected = self._select_tools(task_description)
+        prompt = self._build_prompt(task_description, selected)
+        route = self.model_router.route(task_description)
+        if config.VERBOSE:
+            print(f"🔍 请求 prompt ({route.name}: {route.model}): {self._describe_prompt(prompt)}")
                 
-                results.append(f"📋 步骤 {i}: {action}")
+        parser = IncrementalPlanParser()
+        step_queue: asyncio.Queue = asyncio.Queue()
+        producer = asyncio.create_task(self._stream_plan(prompt, parser, step_queue, route))
                 
+        try:
+            async with self._lease() as browser:
+                # 规划期间先导航到任务中最可能的目标网址
+                speculation = self.speculator.start(browser, task_description)
+                if speculation is not None and config.VERBOSE:
+                    print(f"🔮 推测导航: {speculation.url}")
+                
+                # 执行计划：边生成边执行；一旦出现声明依赖的步骤，剩余步骤等计划完整后按 DAG 执行
+                executed_steps = []
+                deferred_steps = []
+                failed = set()
+                failure = None
                 try:
-                    if action == "wait":
-                        # 特殊处理等待操作
-                        seconds = params.get('seconds', 1)
-                        await asyncio.sleep(seconds)
-                        result = f"✅ 等待 {seconds} 秒"
-                    else:
-                        # 直接调用对应的 MCP 工具
-                        result = await self.mcp_agent.call_tool(action, **params)
-                    
-                    results.append(result)
-                    
+                    while True:
+                        step = await step_queue.get()
+                        if speculation is not None:
+                            hit = await self._resolve_speculation(speculation, step, emit)
+                            speculation = None
+                            if hit:
+                                executed_steps.append(step)
+                                continue
+                        if step is None:
+                            break
+                        if deferred_steps or "depends_on" in step:
+                            deferred_steps.append(step)
+                            continue
+                        executed_steps.append(step)
+                        result = await self._execute_step(browser, len(executed_steps), step, emit)
+                        if not result.ok:
+                            failed.add(len(executed_steps) - 1)
+                            if config.REPLAN_MAX_ATTEMPTS > 0:
+                                # 不再盲目执行剩余步骤，改为从当前页面重新规划
+                                failure = (step, result.output)
+                                break
+                finally:
+                    if not producer.done():
+                        producer.cancel()
+                    if speculation is not None:
+                        await speculation.abandon()
+                
+                if failure is not None:
+                    await asyncio.gather(producer, return_exceptions=True)
+                    completed_steps = [s for i, s in enumerate(executed_steps) if i not in failed]
+                    ok, count = await self._recover(
+                        browser, task_description, completed_steps, failure, len(executed_steps), emit, selected, route
+                    )
+                    self._note_expansions(completed_steps, selected)
+                    description = parser.description or task_description
+                    if ok and catalog_hash == self._catalog_hash:
+                        self.plan_cache.put(task_description, catalog_hash, {"description": description, "steps": completed_steps})
+                    await emit(TaskFinished(task_description, description, ok, len(executed_steps) + count))
+                    return
+                
+                try:
+                    response_text = await producer
+                except DeadlineExceeded:
+                    raise
                 except Exception as e:
-                    error_msg = f"❌ 步骤 {i} 执行失败: {e}"
-                    results.append(error_msg)
+                    if not executed_steps and not deferred_steps:
+                        raise
+                    await emit(TaskNote(f"❌ 计划生成中断: {e}"))
+                    response_text = parser.buffer
+                    failed.add(-1)
                 
-                results.append("-" * 30)
-            
-            return "\n".join(results)
+                if config.VERBOSE:
+                    print(f"🔍 LLM 响应: {response_text}")
+                
+                description = parser.description
+                if deferred_steps:
+                    completed = len(executed_steps)
+                    executed_steps.extend(deferred_steps)
+                    if not await self._run_dag(browser, executed_steps, completed, failed, emit):
+                        failed.add(-1)
+                elif not executed_steps:
+                    # 流式解析未得到任何步骤，回退到整体解析；小模型的计划不可用时升级到大模型重新规划
+                    plan, error = self._parse_plan(response_text)
+                    if error is not None:
+                        larger = await self._escalate(route, emit)
+                        if larger is not route:
+                            route = larger
+                            response_text = await self._stream_plan(prompt, IncrementalPlanParser(), asyncio.Queue(), route)
+                            plan, error = self._parse_plan(response_text)
+                            if error is not None:
+                                self.model_router.record_invalid(route)
+                    if error is not None:
+                        await emit(TaskFailed(task_description, f"{error}\n原始响应: {response_text}"))
+                        return
+                    description = plan.get('description', description)
+                    ok, executed_steps = await self._run_steps(
+                        browser, plan.get('steps', []), emit, task_description, selected, route
+                    )
+                    if not ok:
+                        failed.add(-1)
+                
+                self._note_expansions(executed_steps, selected)
+                
+                # 只缓存完整执行成功的计划；规划期间工具列表发生变化时不缓存
+                if not failed and executed_steps and catalog_hash == self._catalog_hash:
+                    plan = {"description": description or task_description, "steps": executed_steps}
+                    self.plan_cache.put(task_description, catalog_hash, plan)
+                
+                await emit(TaskFinished(task_description, description or task_description, not failed, len(executed_steps)))
+        finally:
+            if not producer.done():
+                producer.cancel()
+    
+    async def _resolve_speculation(
+        self, speculation: SpeculativeNavigation, step: Optional[Dict[str, Any]], emit: EventSink
+    ) -> bool:
+        """
+        计划的第一步到达时处理推测导航：第一步是导航到同一网址时等待推测导航完成，并以其结果作为第一步的结果；
+        否则放弃推测。返回第一步是否已由推测导航完成
+        """
+        arrived = time.perf_counter()
+        if step is None or "depends_on" in step or not matches_step(speculation.url, step):
+            await speculation.abandon()
+            self.speculator.record_miss()
+            return False
+        output = await speculation.result()
+        if not output.ok:
+            # 推测导航失败时照常执行第一步
+            self.speculator.record_error()
+            return False
+        self.speculator.record_hit(speculation, arrived)
+        await emit(StepStarted(1, step.get('action'), step.get('params', {})))
+        await emit(StepFinished(1, step.get('action'), True, output.text, output.artifacts, speculation.finished - arrived))
+        return True
+    
+    async def _run_steps(
+        self,
+        browser: MCPPlaywrightAgent,
+        steps: List[Dict[str, Any]],
+        emit: EventSink,
+        task_description: Optional[str] = None,
+        tool_names: Optional[List[str]] = None,
+        route: Optional[Route] = None,
+    ) -> Tuple[bool, List[Dict[str, Any]]]:
+        """
+        执行完整计划：声明了依赖的计划按 DAG 执行，否则顺序执行
+        
+        顺序执行时给出 task_description 即开启失败恢复：某个步骤失败后不再执行剩余步骤，而是重新规划。
+        返回 (是否全部成功, 实际生效的步骤列表)
+        """
+        if has_dependencies(steps):
+            return await self._run_dag(browser, steps, 0, set(), emit), steps
+        all_ok = True
+        for index, step in enumerate(steps, 1):
+            result = await self._execute_step(browser, index, step, emit)
+            if result.ok:
+                continue
+            if task_description is not None and config.REPLAN_MAX_ATTEMPTS > 0:
+                completed_steps = steps[:index - 1]
+                ok, _ = await self._recover(
+                    browser, task_description, completed_steps, (step, result.output), index, emit, tool_names, route
+                )
+                return ok, completed_steps
+            all_ok = False
+        return all_ok, steps
+    
+    async def _page_digest(self, browser: MCPPlaywrightAgent) -> str:
+        """当前页面的摘要：URL 和截断后的可见文本"""
+        lines = [f"URL: {browser.current_url or '未知'}"]
+        tool_name = "playwright_get_visible_text"
+        if browser.registry is None or tool_name not in browser.registry:
+            return lines[0]
+        params = {}
+        if "random_string" in browser.registry.schemas.get(tool_name, {}).get("properties", {}):
+            params["random_string"] = "dummy"
+        result = await browser.invoke_tool(tool_name, **params)
+        text = result.text
+        # 文本较长时已写入产物存储，从产物中读取原文
+        for ref in result.artifacts:
+            if ref.media_type.startswith("text/") and browser.artifacts is not None:
+                try:
+                    text = browser.artifacts.read_text(ref)
+                except OSError:
+                    pass
+                break
+        text = " ".join(text.split())
+        limit = config.REPLAN_PAGE_DIGEST_CHARS
+        if len(text) > limit:
+            text = text[:limit] + "…"
+        lines.append(f"可见文本: {text}")
+        return "\n".join(lines)
+    
+    def _build_recovery_prompt(
+        self,
+        task_description: str,
+        completed_steps: List[Dict[str, Any]],
+        failed_step: Dict[str, Any],
+        error: str,
+        digest: str,
+        tool_names: Optional[List[str]] = None,
+    ) -> PlanPrompt:
+        """
+        构造重新规划 prompt：只包含已完成的步骤、失败的步骤和错误、页面摘要，要求只返回剩余步骤
+        
+        前缀布局下与首次规划共用同一个系统前缀，这些内容放在用户消息中
+        """
+        def compact(step: Dict[str, Any]) -> str:
+            return json.dumps(step, ensure_ascii=False, separators=(",", ":"))
+        
+        completed = "\n".join(f"{i}. {compact(step)}" for i, step in enumerate(completed_steps, 1)) or "（无）"
+        body = f"""你为以下任务生成的计划在执行中失败了，请根据浏览器的当前状态重新规划剩余的步骤。
+
+任务: {task_description}
+
+已成功执行的步骤（浏览器已处于执行这些步骤之后的状态，不要重复）:
+{completed}
+
+失败的步骤: {compact(failed_step)}
+错误: {error[:500]}
+
+当前页面:
+{digest}
+
+请只返回剩余步骤的 JSON 执行计划，格式为 {{"description": "...", "steps": [...]}}，每个步骤包含 action 和 params；
+任务已经完成时返回空的 steps。不要重复失败的做法。"""
+        if self.prompt_layout == "prefix":
+            return self._with_prefix(body)
+        return f"""
+作为一个浏览器自动化专家，{body}
+
+{self._tools_section(tool_names)}
+"""
+    
+    async def _recover(
+        self,
+        browser: MCPPlaywrightAgent,
+        task_description: str,
+        completed_steps: List[Dict[str, Any]],
+        failure: Tuple[Dict[str, Any], str],
+        last_index: int,
+        emit: EventSink,
+        tool_names: Optional[List[str]] = None,
+        route: Optional[Route] = None,
+    ) -> Tuple[bool, int]:
+        """
+        步骤失败后的恢复循环：从当前浏览器状态重新规划剩余步骤并继续执行，最多 Config.REPLAN_MAX_ATTEMPTS 次
+        
+        新计划边生成边执行，其中的步骤再次失败时消耗下一次机会；成功执行的步骤追加到 completed_steps。
+        重新规划沿用 route（为 None 时按任务复杂度选择），失败原因是计划不符合格式时升级到大模型。
+        
+        Returns:
+            (是否恢复成功, 恢复过程中执行的步骤数)
+        """
+        route = route or self.model_router.route(task_description)
+        count = 0
+        invalid = False
+        for attempt in range(1, config.REPLAN_MAX_ATTEMPTS + 1):
+            failed_step, error = failure
+            if invalid or validate_step(failed_step):
+                route = await self._escalate(route, emit)
+            invalid = False
+            await emit(TaskNote(
+                f"🔁 步骤 {last_index + count} 失败，从当前页面重新规划剩余步骤（{attempt}/{config.REPLAN_MAX_ATTEMPTS}）"
+            ))
+            async with tracer.span("plan.replan", attempt=attempt):
+                digest = await self._page_digest(browser)
+                prompt = self._build_recovery_prompt(
+                    task_description, completed_steps, failed_step, error, digest, tool_names
+                )
+                if config.VERBOSE:
+                    print(f"🔍 重新规划 prompt: {self._describe_prompt(prompt)}")
+                
+                parser = IncrementalPlanParser()
+                step_queue: asyncio.Queue = asyncio.Queue()
+                producer = asyncio.create_task(self._stream_plan(prompt, parser, step_queue, route))
+                failure = None
+                received = 0
+                try:
+                    while True:
+                        step = await step_queue.get()
+                        if step is None:
+                            break
+                        received += 1
+                        count += 1
+                        result = await self._execute_step(browser, last_index + count, step, emit)
+                        if not result.ok:
+                            failure = (step, result.output)
+                            break
+                        completed_steps.append(step)
+                finally:
+                    if not producer.done():
+                        producer.cancel()
+                    response = (await asyncio.gather(producer, return_exceptions=True))[0]
             
-        except Exception as e:
-            return f"❌ 智能任务执行失败: {e}"
+            if failure is not None:
+                continue
+            if isinstance(response, DeadlineExceeded):
+                raise response
+            if isinstance(response, BaseException):
+                failure = (failed_step, f"重新规划失败: {response}")
+                continue
+            if received == 0:
+                # 流式解析未得到步骤：可能是任务已完成（空 steps），也可能需要整体解析
+                try:
+                    plan = extract_plan(response)
+                except ValueError:
+                    failure, invalid = (failed_step, "重新规划的响应中没有有效的 JSON 计划"), True
+                    continue
+                if validate_plan(plan):
+                    failure, invalid = (failed_step, "重新规划的响应不符合计划格式"), True
+                    continue
+                for step in plan.get('steps', []):
+                    count += 1
+                    result = await self._execute_step(browser, last_index + count, step, emit)
+                    if not result.ok:
+                        failure = (step, result.output)
+                        break
+                    completed_steps.append(step)
+                if failure is not None:
+                    continue
+            tracer.incr("plan.recovered")
+            return True, count
+        
+        await emit(TaskNote(f"❌ 重新规划 {config.REPLAN_MAX_ATTEMPTS} 次后仍未完成，停止执行"))
+        return False, count
+    
+    async def _run_dag(
+        self,
+        browser: MCPPlaywrightAgent,
+        steps: List[Dict[str, Any]],
+        completed: int,
+        failed: set,
+        emit: EventSink,
+    ) -> bool:
+        """
+        按依赖图执行 steps[completed:]，前 completed 个步骤视为已在 browser 上执行完毕
+        
+        互不依赖的执行链在各自的浏览器会话中并行执行；会话不足时退回按执行链连续的顺序执行。
+        事件按完成顺序产出，返回是否全部成功。
+        """
+        try:
+            graph = StepGraph(steps)
+        except ValueError as e:
+            print(f"⚠️ 计划依赖无效，改为顺序执行: {e}")
+            graph = None
+        
+        failed = set(failed)
+        
+        async def run_step(step_browser: MCPPlaywrightAgent, index: int):
+            step = steps[index]
+            if graph is not None and any(dep in failed for dep in graph.deps[index]):
+                await emit(StepSkipped(index + 1, step.get('action'), "依赖的步骤执行失败"))
+                failed.add(index)
+                return
+            if not (await self._execute_step(step_browser, index + 1, step, emit)).ok:
+                failed.add(index)
+        
+        pending_lanes = []
+        if graph is not None:
+            pending_lanes = [
+                [i for i in lane if i >= completed]
+                for lane in graph.lanes
+                if any(i >= completed for i in lane)
+            ]
+        
+        # 主会话执行第一条执行链，其余执行链尽量租用额外会话
+        extra: List[MCPPlaywrightAgent] = []
+        for _ in pending_lanes[1:]:
+            agent = await self.pool.try_acquire()
+            if agent is None:
+                break
+            extra.append(agent)
+        
+        try:
+            if graph is None or len(extra) < len(pending_lanes) - 1:
+                for agent in extra:
+                    await self.pool.release(agent)
+                extra = []
+                if graph is None:
+                    order = range(completed, len(steps))
+                else:
+                    order = graph.sequential_order(set(range(completed)))
+                for index in order:
+                    await run_step(browser, index)
+            else:
+                if len(pending_lanes) > 1:
+                    print(f"🔀 并行执行 {len(pending_lanes)} 条执行链")
+                events = {i: asyncio.Event() for i in range(len(steps))}
+                for i in range(completed):
+                    events[i].set()
+                
+                async def run_lane(lane_browser: MCPPlaywrightAgent, lane: List[int]):
+                    for index in lane:
+                        for dep in graph.deps[index]:
+                            await events[dep].wait()
+                        try:
+                            await run_step(lane_browser, index)
+                        finally:
+                            events[index].set()
+                
+                await asyncio.gather(*(
+                    run_lane(lane_browser, lane)
+                    for lane_browser, lane in zip([browser] + extra, pending_lanes)
+                ))
+        finally:
+            for agent in extra:
+                await self.pool.release(agent)
+        
+        return not any(i >= completed for i in failed)
+    
+    async def execute_many(
+        self, tasks: List[str], concurrency: Optional[int] = None
+    ) -> AsyncIterator[Tuple[int, str, str]]:
+        """
+        批量并发执行任务
+        
+        同时进行的任务数受 concurrency 限制，浏览器会话数受会话池 max_size 限制，
+        LLM 请求数受 llm_concurrency 限制。单个任务失败不影响其他任务。
+        
+        Args:
+            tasks: 任务描述列表
+            concurrency: 同时执行的任务数上限，默认读取 Config.BATCH_CONCURRENCY
+        
+        Yields:
+            按完成顺序返回 (任务序号, 任务描述, 执行结果)
+        """
+        if not tasks:
+            return
+        if not self._initialized:
+            await self.initialize()
+        
+        concurrency = config.BATCH_CONCURRENCY if concurrency is None else concurrency
+        pending: asyncio.Queue = asyncio.Queue()
+        for item in enumerate(tasks):
+            pending.put_nowait(item)
+        finished: asyncio.Queue = asyncio.Queue()
+        
+        async def worker():
+            while True:
+                try:
+                    index, task = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    result = await self.execute_smart_task(task)
+                except Exception as e:
+                    result = f"❌ 智能任务执行失败: {e}"
+                await finished.put((index, task, result))
+        
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(tasks))))]
+        try:
+            for _ in range(len(tasks)):
+                yield await finished.get()
+        finally:
+            for w in workers:
+                if not w.done():
+                    w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
     
     async def close(self):
-        """关闭代理"""
-        await self.mcp_agent.close()
+        """关闭代理，写入计划缓存中尚未保存的修改"""
+        await self.plan_cache.aclose()
+        await self.pool.close()
+        self._initialized = False
 
 
-def create_mcp_browser_agent(llm=None, mcp_server_config: Optional[Dict[str, Any]] = None):
+def create_mcp_browser_agent(llm=None, mcp_server_config: Optional[Dict[str, Any]] = None, pool=None):
     """
     创建 MCP 浏览器代理
     
     Args:
         llm: LangChain 语言模型实例（可选，如果提供则返回智能代理）
         mcp_server_config: MCP 服务器配置
+        pool: 已创建（可能正在后台预热）的 MCP 会话池，仅智能代理使用
     
     Returns:
         MCPPlaywrightAgent 或 MCPSmartBrowserAgent 实例
     """
     if llm:
-        return MCPSmartBrowserAgent(llm, mcp_server_config)
+        return MCPSmartBrowserAgent(llm, mcp_server_config, pool=pool)
     else:
         return MCPPlaywrightAgent(mcp_server_config)
\ No newline at end of file
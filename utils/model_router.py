@@ -0,0 +1,148 @@
+"""
+规划模型路由
+按任务复杂度在小模型和大模型之间选择规划模型：简单任务使用更快的小模型，复杂任务直接使用大模型；
+小模型生成的计划不符合计划格式时升级到大模型重新规划。每条路由分别统计延迟和成功率
+"""
+
+import re
+import threading
+from typing import Any, Dict, Optional
+
+from config import config
+from utils.retry import LatencyTracker
+from utils.tracing import tracer
+
+# 浏览器操作动词，每出现一个计为一个操作
+ACTION_WORDS = (
+    "访问", "打开", "进入", "跳转", "搜索", "输入", "填写", "登录", "注册", "点击", "提交", "选择", "勾选",
+    "悬停", "按键", "回车", "滚动", "返回", "后退", "前进", "上传", "下载", "拖拽", "拖动", "等待",
+    "截图", "截屏", "保存", "读取", "获取", "提取", "抓取", "统计", "比较", "执行", "关闭",
+    "open", "visit", "go to", "navigate", "search", "type", "fill", "login", "log in", "click", "submit",
+    "select", "hover", "press", "scroll", "upload", "download", "drag", "wait", "screenshot", "save",
+    "read", "extract", "scrape", "compare",
+)
+
+# 表示多个操作先后进行的连接词
+_SEQUENCE_MARKERS = re.compile(r"然后|接着|之后|再|并且|并|最后|同时|->|→|[，,；;、\n]|\bthen\b|\band\b")
+_URL = re.compile(r"https?://\S+|www\.\S+")
+
+_COUNTERS = ("requests", "errors", "invalid", "escalations")
+
+
+def task_complexity(task: str) -> int:
+    """
+    粗略估计任务的复杂度：包含的操作数 + 连接词数 + 每 40 个字符计 1 分
+
+    例如 "截图" 为 1，"打开百度，搜索人工智能，然后点击第一个结果并截图" 为 8
+    """
+    text = _URL.sub(" ", task.lower())
+    actions = sum(1 for word in ACTION_WORDS if word in text)
+    markers = len(_SEQUENCE_MARKERS.findall(text))
+    return actions + markers + len(text) // 40
+
+
+class Route:
+    """一条规划路由：使用的模型和最大输出 token 数"""
+
+    def __init__(self, name: str, model: str, max_tokens: int, override: bool = True):
+        self.name = name
+        self.model = model
+        self.max_tokens = max_tokens
+        self.override = override  # 是否需要在请求中覆盖 LLM 默认的模型和 max_tokens
+
+    def llm_kwargs(self) -> Dict[str, Any]:
+        """传给 LLM 调用的参数；未开启路由时为空，沿用 LLM 自身的配置"""
+        if not self.override:
+            return {}
+        return {"model": self.model, "max_tokens": self.max_tokens}
+
+    def __repr__(self) -> str:
+        return f"Route({self.name}, {self.model}, max_tokens={self.max_tokens})"
+
+
+class ModelRouter:
+    """在小模型和大模型之间路由规划请求"""
+
+    def __init__(
+        self,
+        small_model: Optional[str] = None,
+        large_model: Optional[str] = None,
+        small_max_tokens: Optional[int] = None,
+        large_max_tokens: Optional[int] = None,
+        threshold: Optional[int] = None,
+    ):
+        """
+        Args:
+            small_model: 简单任务使用的小模型，为空表示不路由（全部使用 LLM 自身的模型），默认读取 Config.PLAN_SMALL_MODEL
+            large_model: 复杂任务和升级时使用的模型，默认读取 Config.PLAN_LARGE_MODEL（为空时为 Config.DEFAULT_MODEL）
+            small_max_tokens: 小模型的最大输出 token 数，默认读取 Config.PLAN_SMALL_MAX_TOKENS
+            large_max_tokens: 大模型的最大输出 token 数，默认读取 Config.PLAN_LARGE_MAX_TOKENS（为 0 时为 Config.MAX_TOKENS）
+            threshold: 复杂度达到该值的任务直接使用大模型，默认读取 Config.PLAN_COMPLEXITY_THRESHOLD
+        """
+        small_model = config.PLAN_SMALL_MODEL if small_model is None else small_model
+        large_model = large_model or config.PLAN_LARGE_MODEL or config.DEFAULT_MODEL
+        large_max_tokens = large_max_tokens or config.PLAN_LARGE_MAX_TOKENS or config.MAX_TOKENS
+        self.enabled = bool(small_model) and small_model != large_model
+        self.small = Route(
+            "small", small_model, small_max_tokens or config.PLAN_SMALL_MAX_TOKENS
+        ) if self.enabled else None
+        self.large = Route("large", large_model, large_max_tokens, override=self.enabled)
+        self.threshold = config.PLAN_COMPLEXITY_THRESHOLD if threshold is None else threshold
+        self.latency = LatencyTracker()
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def route(self, task: str) -> Route:
+        """为任务选择路由：未开启路由或复杂度达到阈值时使用大模型，否则使用小模型"""
+        if not self.enabled:
+            return self.large
+        route = self.small if task_complexity(task) < self.threshold else self.large
+        tracer.incr("plan.route", route=route.name)
+        return route
+
+    def escalate(self, route: Route) -> Optional[Route]:
+        """小模型的计划不可用时返回大模型路由，已是大模型时返回 None"""
+        if route is not self.small:
+            return None
+        self._count(route, "escalations")
+        tracer.incr("plan.route.escalated")
+        return self.large
+
+    def _count(self, route: Route, key: str):
+        with self._lock:
+            counts = self._counts.setdefault(route.name, dict.fromkeys(_COUNTERS, 0))
+            counts[key] += 1
+
+    def record(self, route: Route, seconds: float, ok: bool):
+        """记录一次规划请求的耗时和是否成功返回"""
+        self._count(route, "requests")
+        if ok:
+            self.latency.record(route.name, seconds)
+            tracer.observe("plan.route.seconds", seconds, route=route.name)
+        else:
+            self._count(route, "errors")
+
+    def record_invalid(self, route: Route):
+        """记录一次不符合计划格式的规划结果"""
+        self._count(route, "invalid")
+        tracer.incr("plan.route.invalid", route=route.name)
+
+    def stats(self) -> Dict[str, Any]:
+        """各路由的模型、请求数、成功率和延迟分位"""
+        routes = [route for route in (self.small, self.large) if route is not None]
+        with self._lock:
+            counts = {name: dict(values) for name, values in self._counts.items()}
+        stats = {}
+        for route in routes:
+            values = counts.get(route.name) or dict.fromkeys(_COUNTERS, 0)
+            requests = values["requests"]
+            p50 = self.latency.percentile(route.name, 0.5)
+            p95 = self.latency.percentile(route.name, 0.95)
+            stats[route.name] = {
+                "model": route.model,
+                **values,
+                "success_rate": (requests - values["errors"] - values["invalid"]) / requests if requests else None,
+                "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            }
+        return stats
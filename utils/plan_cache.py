@@ -0,0 +1,333 @@
+"""
+执行计划缓存
+按 "规范化任务文本 + 工具目录哈希" 缓存 LLM 生成的计划，支持 LRU/TTL 淘汰、磁盘持久化和模板化条目；
+在事件循环中运行时，修改合并后延迟 PLAN_CACHE_SAVE_DELAY 秒在后台线程写入磁盘，不阻塞规划
+"""
+
+import asyncio
+import atexit
+import copy
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import config
+
+# 模板槽位标记，例如 ⟦0⟧
+_SLOT = "⟦{}⟧"
+_SLOT_PATTERN = re.compile(r"⟦(\d+)⟧")
+
+# 槽位不能跨越标点，也不能包含表示先后操作的连接词，否则末尾的槽位会吞掉任务中后续的操作
+# （例如 "搜索⟦0⟧" 匹配 "搜索机器学习，然后点击第一个结果"）
+_SLOT_CHARS = r"[^，,。;；！!？?、\n]"
+_SLOT_BREAKS = re.compile(r"然后|接着|之后|再|并|最后|同时|->|→|\bthen\b|\band\b", re.IGNORECASE)
+MAX_SLOT_CHARS = 40
+
+
+def normalize_task(task: str) -> str:
+    """规范化任务文本：合并空白、去掉首尾空白和结尾标点"""
+    text = re.sub(r"\s+", " ", task).strip()
+    return text.rstrip("。.!！?？ ")
+
+
+class PlanCache:
+    """带 LRU/TTL 淘汰和可选持久化的计划缓存"""
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        persist_path: Optional[str] = None,
+        save_delay: Optional[float] = None,
+        min_literal: Optional[int] = None,
+    ):
+        """
+        初始化计划缓存
+
+        Args:
+            max_entries: 最大条目数，默认读取 Config.PLAN_CACHE_SIZE
+            ttl: 条目有效期（秒），0 表示不过期，默认读取 Config.PLAN_CACHE_TTL
+            persist_path: 持久化文件路径，为空则仅在内存中缓存，默认读取 Config.PLAN_CACHE_PATH
+            save_delay: 修改后延迟多少秒写入磁盘（期间的修改合并为一次写入），默认读取 Config.PLAN_CACHE_SAVE_DELAY
+            min_literal: 模板化时替换为槽位的参数字面量的最小长度，默认读取 Config.PLAN_CACHE_MIN_LITERAL
+        """
+        self.max_entries = config.PLAN_CACHE_SIZE if max_entries is None else max_entries
+        self.ttl = config.PLAN_CACHE_TTL if ttl is None else ttl
+        self.persist_path = config.PLAN_CACHE_PATH if persist_path is None else persist_path
+        self.save_delay = config.PLAN_CACHE_SAVE_DELAY if save_delay is None else save_delay
+        self.min_literal = config.PLAN_CACHE_MIN_LITERAL if min_literal is None else min_literal
+
+        # key -> {"plan": 计划, "created": 时间戳, "template": 是否模板条目}
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._template_regex: Dict[str, "re.Pattern"] = {}
+        self.hits = 0
+        self.template_hits = 0
+        self.misses = 0
+        # 尚未写入磁盘的修改，以及合并写入的后台任务
+        self._dirty = False
+        self._save_task: Optional[asyncio.Task] = None
+        self._save_now: Optional[asyncio.Event] = None
+
+        if self.persist_path:
+            self._load()
+            # 进程退出前写入仍未保存的修改
+            atexit.register(self.flush)
+
+    @staticmethod
+    def _key(task: str, catalog_hash: str) -> str:
+        return f"{catalog_hash}:{normalize_task(task)}"
+
+    def get(self, task: str, catalog_hash: str) -> Optional[Dict[str, Any]]:
+        """查找计划，先精确匹配，再尝试模板匹配"""
+        key = self._key(task, catalog_hash)
+        entry = self._lookup(key)
+        if entry is not None:
+            self.hits += 1
+            return copy.deepcopy(entry["plan"])
+
+        plan = self._match_template(normalize_task(task), catalog_hash)
+        if plan is not None:
+            self.hits += 1
+            self.template_hits += 1
+            return plan
+
+        self.misses += 1
+        return None
+
+    def put(self, task: str, catalog_hash: str, plan: Dict[str, Any]):
+        """写入计划，同时生成模板条目以便相似任务复用"""
+        if self.max_entries <= 0:
+            return
+        normalized = normalize_task(task)
+        self._store(self._key(task, catalog_hash), plan, template=False)
+
+        template_task, template_plan = self._templatize(normalized, plan)
+        if template_task is not None:
+            self._store(f"{catalog_hash}:{template_task}", template_plan, template=True)
+
+        self._mark_dirty()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中统计"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "template_hits": self.template_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+        self._template_regex.clear()
+        self._mark_dirty()
+
+    def flush(self):
+        """立即写入尚未保存的修改"""
+        if self.persist_path and self._dirty:
+            self._dirty = False
+            self._save(dict(self._entries))
+
+    async def aclose(self):
+        """不再等待延迟，写入尚未保存的修改并等待后台写入完成"""
+        task = self._save_task
+        if task is not None and not task.done():
+            self._save_now.set()
+            await task
+        if self.persist_path and self._dirty:
+            self._dirty = False
+            await asyncio.to_thread(self._save, dict(self._entries))
+
+    def _mark_dirty(self):
+        """
+        记录一次修改：在事件循环中运行时安排一次延迟的后台写入，
+        否则（同步调用）立即写入
+        """
+        if not self.persist_path:
+            return
+        self._dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._save_task is None or self._save_task.done():
+            self._save_now = asyncio.Event()
+            self._save_task = loop.create_task(self._save_later())
+
+    async def _save_later(self):
+        """等待 save_delay 秒（或 aclose 要求立即写入）后写入，写入期间的新修改在下一轮写入"""
+        try:
+            await asyncio.wait_for(self._save_now.wait(), self.save_delay)
+        except asyncio.TimeoutError:
+            pass
+        while self._dirty:
+            self._dirty = False
+            # 条目在写入后不会被原地修改，浅拷贝即可在线程中安全序列化
+            await asyncio.to_thread(self._save, dict(self._entries))
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl and time.time() - entry["created"] > self.ttl:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: str, plan: Dict[str, Any], template: bool):
+        self._entries[key] = {"plan": copy.deepcopy(plan), "created": time.time(), "template": template}
+        self._entries.move_to_end(key)
+        self._template_regex.pop(key, None)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        self._template_regex.pop(key, None)
+
+    def evict(self, task: str, catalog_hash: str):
+        """删除任务的精确条目及能匹配该任务的模板条目，用于执行失败的缓存计划"""
+        keys = [self._key(task, catalog_hash)]
+        found = self._find_template(normalize_task(task), catalog_hash)
+        if found is not None:
+            keys.append(found[0])
+        removed = [key for key in keys if key in self._entries]
+        for key in removed:
+            self._remove(key)
+        if removed:
+            self._mark_dirty()
+
+    def _match_template(self, normalized: str, catalog_hash: str) -> Optional[Dict[str, Any]]:
+        """用模板条目匹配任务，命中后把任务中的实际参数填回计划"""
+        found = self._find_template(normalized, catalog_hash)
+        if found is None:
+            return None
+        key, slots = found
+        return self._fill(copy.deepcopy(self._entries[key]["plan"]), slots)
+
+    def _find_template(self, normalized: str, catalog_hash: str) -> Optional[Tuple[str, Dict[int, str]]]:
+        """查找能匹配任务的模板条目，返回 (条目键, 槽位取值)；槽位取值包含连接词时不算匹配"""
+        prefix = f"{catalog_hash}:"
+        for key in reversed(list(self._entries.keys())):
+            entry = self._entries[key]
+            if not entry["template"] or not key.startswith(prefix):
+                continue
+            regex = self._template_regex.get(key)
+            if regex is None:
+                regex = self._compile_template(key[len(prefix):])
+                self._template_regex[key] = regex
+            match = regex.fullmatch(normalized)
+            if match is None:
+                continue
+            slots = {int(name[1:]): value for name, value in match.groupdict().items()}
+            if any(_SLOT_BREAKS.search(value) for value in slots.values()):
+                continue
+            if self._lookup(key) is None:
+                continue
+            return key, slots
+        return None
+
+    @staticmethod
+    def _compile_template(template_task: str) -> "re.Pattern":
+        parts = []
+        last = 0
+        for m in _SLOT_PATTERN.finditer(template_task):
+            parts.append(re.escape(template_task[last:m.start()]))
+            parts.append(f"(?P<s{m.group(1)}>{_SLOT_CHARS}{{1,{MAX_SLOT_CHARS}}}?)")
+            last = m.end()
+        parts.append(re.escape(template_task[last:]))
+        return re.compile("".join(parts))
+
+    def _templatize(self, normalized: str, plan: Dict[str, Any]) -> Tuple[Optional[str], Dict[str, Any]]:
+        """把计划参数中出现在任务文本里、长度不小于 min_literal 的字面量替换为槽位"""
+        literals = set()
+        for step in plan.get("steps", []):
+            self._collect_strings(step.get("params", {}), literals)
+        # 过短的字面量（单个字符、"ai" 之类）会匹配到任务中无关的位置，使模板过度泛化，不替换
+        min_literal = max(2, self.min_literal)
+        # 长字面量优先，避免短字面量破坏长字面量
+        candidates = sorted((v for v in literals if len(v) >= min_literal and v in normalized), key=len, reverse=True)
+        if not candidates:
+            return None, plan
+
+        template_task = normalized
+        replacements: List[Tuple[str, str]] = []
+        for literal in candidates:
+            if literal not in template_task:
+                continue
+            slot = _SLOT.format(len(replacements))
+            template_task = template_task.replace(literal, slot)
+            replacements.append((literal, slot))
+        if not replacements:
+            return None, plan
+
+        template_plan = self._replace(copy.deepcopy(plan), replacements)
+        return template_task, template_plan
+
+    @staticmethod
+    def _collect_strings(value: Any, out: set):
+        if isinstance(value, str):
+            out.add(value)
+        elif isinstance(value, dict):
+            for v in value.values():
+                PlanCache._collect_strings(v, out)
+        elif isinstance(value, list):
+            for v in value:
+                PlanCache._collect_strings(v, out)
+
+    @classmethod
+    def _replace(cls, value: Any, replacements: List[Tuple[str, str]]) -> Any:
+        if isinstance(value, str):
+            for literal, slot in replacements:
+                value = value.replace(literal, slot)
+            return value
+        if isinstance(value, dict):
+            return {k: cls._replace(v, replacements) for k, v in value.items()}
+        if isinstance(value, list):
+            return [cls._replace(v, replacements) for v in value]
+        return value
+
+    @classmethod
+    def _fill(cls, value: Any, slots: Dict[int, str]) -> Any:
+        if isinstance(value, str):
+            return _SLOT_PATTERN.sub(lambda m: slots.get(int(m.group(1)), m.group(0)), value)
+        if isinstance(value, dict):
+            return {k: cls._fill(v, slots) for k, v in value.items()}
+        if isinstance(value, list):
+            return [cls._fill(v, slots) for v in value]
+        return value
+
+    def _load(self):
+        """从磁盘加载缓存，文件损坏时忽略"""
+        if not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ 计划缓存加载失败，已忽略: {e}")
+            return
+        for key, entry in data.get("entries", {}).items():
+            self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _save(self, entries: Dict[str, Dict[str, Any]]):
+        """原子地写入磁盘"""
+        directory = os.path.dirname(os.path.abspath(self.persist_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.persist_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "entries": entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.persist_path)
+        except OSError as e:
+            print(f"⚠️ 计划缓存保存失败: {e}")
@@ -0,0 +1,84 @@
+"""
+执行计划依赖图
+根据步骤的可选 id/depends_on 字段构建 DAG，把步骤划分为可在独立浏览器会话中并行执行的执行链（lane）
+"""
+
+from typing import Any, Dict, List, Optional, Set
+
+
+def has_dependencies(steps: List[Dict[str, Any]]) -> bool:
+    """计划中是否有步骤显式声明了依赖"""
+    return any(isinstance(step, dict) and "depends_on" in step for step in steps)
+
+
+class StepGraph:
+    """
+    步骤依赖图
+
+    规则：
+    - 声明了 depends_on 的步骤依赖列出的步骤，depends_on 为空列表表示没有依赖
+    - 未声明 depends_on 的步骤依赖上一个步骤，保持顺序执行语义
+    - 依赖只能指向计划中更早的步骤，否则视为非法计划
+    - 没有依赖的步骤开启新的执行链；只有一个依赖的步骤沿用依赖所在的执行链（共享页面状态）；
+      有多个依赖的步骤沿用最后一个依赖所在的执行链
+    """
+
+    def __init__(self, steps: List[Dict[str, Any]]):
+        self.steps = steps
+        self.ids: List[str] = [str(step.get("id", index + 1)) for index, step in enumerate(steps)]
+        index_of = {}
+        for index, step_id in enumerate(self.ids):
+            if step_id in index_of:
+                raise ValueError(f"步骤 id 重复: {step_id}")
+            index_of[step_id] = index
+
+        self.deps: List[List[int]] = []
+        for index, step in enumerate(steps):
+            if "depends_on" not in step:
+                self.deps.append([index - 1] if index > 0 else [])
+                continue
+            raw = step.get("depends_on") or []
+            if not isinstance(raw, list):
+                raw = [raw]
+            deps = []
+            for dep in raw:
+                dep_index = index_of.get(str(dep))
+                if dep_index is None:
+                    raise ValueError(f"步骤 {self.ids[index]} 依赖了不存在的步骤 {dep}")
+                if dep_index >= index:
+                    raise ValueError(f"步骤 {self.ids[index]} 只能依赖更早的步骤，实际依赖 {dep}")
+                deps.append(dep_index)
+            self.deps.append(sorted(set(deps)))
+
+        self.lane_of: List[int] = []
+        self.lanes: List[List[int]] = []
+        for index, deps in enumerate(self.deps):
+            if not deps:
+                lane = len(self.lanes)
+                self.lanes.append([])
+            else:
+                lane = self.lane_of[deps[-1]]
+            self.lane_of.append(lane)
+            self.lanes[lane].append(index)
+
+    def sequential_order(self, completed: Optional[Set[int]] = None) -> List[int]:
+        """
+        生成顺序执行时的拓扑序
+
+        尽量连续执行同一执行链上的步骤，避免不同执行链在同一浏览器中交替导航导致页面状态错乱。
+        """
+        done = set(completed or ())
+        remaining = [i for i in range(len(self.steps)) if i not in done]
+        order = []
+        current_lane = None
+        while remaining:
+            ready = [i for i in remaining if all(d in done for d in self.deps[i])]
+            if not ready:
+                raise ValueError("计划依赖存在环")
+            same_lane = [i for i in ready if self.lane_of[i] == current_lane]
+            chosen = same_lane[0] if same_lane else ready[0]
+            order.append(chosen)
+            done.add(chosen)
+            remaining.remove(chosen)
+            current_lane = self.lane_of[chosen]
+        return order
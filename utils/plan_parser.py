@@ -0,0 +1,275 @@
+"""
+执行计划解析器
+支持从完整文本中提取计划，也支持从 LLM 的 token 流中增量提取步骤；
+能修复常见的 JSON 缺陷（代码块标记、尾随逗号、被截断的数组/对象），并按计划 schema 在本地校验
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from utils.tool_registry import compile_schema
+
+# 执行计划的 JSON Schema，也用于结构化输出模式
+STEP_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string"},
+        "params": {"type": "object"},
+        "id": {"type": ["string", "integer"]},
+        "depends_on": {"type": "array", "items": {"type": ["string", "integer"]}},
+        "fresh": {"type": "boolean"},
+    },
+    "required": ["action"],
+}
+
+PLAN_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "description": {"type": "string"},
+        "steps": {"type": "array", "items": STEP_SCHEMA},
+    },
+    "required": ["steps"],
+}
+
+_validate_plan = compile_schema(PLAN_SCHEMA)
+_validate_step = compile_schema(STEP_SCHEMA)
+
+_FENCE = re.compile(r"```[A-Za-z]*")
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def validate_plan(plan: Any) -> List[str]:
+    """按计划 schema 校验，返回错误列表（为空表示通过）"""
+    return _validate_plan(plan, "")
+
+
+def validate_step(step: Any) -> List[str]:
+    """按步骤 schema 校验，返回错误列表（为空表示通过）"""
+    return _validate_step(step, "")
+
+
+def repair_json(text: str) -> str:
+    """
+    修复常见的 JSON 缺陷
+
+    去掉代码块标记和根对象之前的文字，删除尾随逗号，
+    并补全被截断的数组和对象：只回退到根对象或 steps 数组中最后一个完整的元素，
+    未写完的步骤对象整体丢弃，不会产生缺少参数的步骤
+    """
+    text = _FENCE.sub("", text)
+    start = text.find("{")
+    if start < 0:
+        return text
+    text = text[start:]
+
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    escape = False
+    # 最近一个可以安全截断的位置（根对象或 steps 数组这两层中的完整值之后），用于丢弃末尾不完整的内容
+    safe_depth = 2
+    safe_len = 0
+    safe_stack: List[str] = []
+    for ch in text:
+        out.append(ch)
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                if stack and stack[-1] == "[" and len(stack) <= safe_depth:
+                    safe_len, safe_stack = len(out), list(stack)
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+        elif ch in "}]":
+            if not stack:
+                out.pop()
+                break
+            stack.pop()
+            if len(stack) <= safe_depth:
+                safe_len, safe_stack = len(out), list(stack)
+            if not stack:
+                break
+        elif ch == "," and 0 < len(stack) <= safe_depth:
+            safe_len, safe_stack = len(out) - 1, list(stack)
+
+    if stack or in_string:
+        # 被截断：回退到最近的完整值，再补齐括号
+        out = out[:safe_len]
+        stack = safe_stack
+        out.extend("}" if opener == "{" else "]" for opener in reversed(stack))
+    return _TRAILING_COMMA.sub(r"\1", "".join(out))
+
+
+def extract_plan(text: str) -> Dict[str, Any]:
+    """
+    从完整的 LLM 响应文本中提取 JSON 执行计划
+
+    依次尝试每个 "{" 开始的完整 JSON 对象，取第一个包含 steps 的对象；
+    都不合法时修复后再解析
+    """
+    text = _FENCE.sub("", text)
+    decoder = json.JSONDecoder()
+    first = None
+    for match in re.finditer(r"\{", text):
+        try:
+            value, _ = decoder.raw_decode(text, match.start())
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, dict):
+            if "steps" in value:
+                return value
+            if first is None:
+                first = value
+
+    if "{" in text:
+        try:
+            value = json.loads(repair_json(text))
+        except json.JSONDecodeError:
+            value = None
+        if isinstance(value, dict) and "steps" in value:
+            return value
+    if first is not None:
+        return first
+    raise ValueError("未找到有效的 JSON 响应")
+
+
+class IncrementalPlanParser:
+    """
+    增量计划解析器
+
+    逐段接收 LLM 输出的文本，每当 "steps" 数组中出现一个完整的步骤对象时立即返回，
+    使浏览器操作可以与计划生成并行进行。
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.description: Optional[str] = None
+        self.steps: List[Dict[str, Any]] = []
+        self.done = False
+        self._pos = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        # 每层容器: {"type": "{" 或 "[", "key": 当前键/数组所属键, "after_colon": 是否在等待值}
+        self._stack: List[Dict[str, Any]] = []
+        self._step_start: Optional[int] = None
+        self._root_has_steps = False
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        输入一段新文本
+
+        Returns:
+            本次新解析出的完整步骤列表
+        """
+        self.buffer += text
+        new_steps = []
+        if self.done:
+            return new_steps
+
+        buffer = self.buffer
+        i = self._pos
+        while i < len(buffer):
+            ch = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._on_string(buffer[self._string_start:i + 1])
+                i += 1
+                continue
+
+            if not self._stack and ch != "{":
+                # 根对象之前的内容（代码块标记、说明文字等）直接跳过
+                i += 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == "{":
+                parent = self._stack[-1] if self._stack else None
+                if (
+                    parent is not None
+                    and parent["type"] == "["
+                    and parent["key"] == "steps"
+                    and len(self._stack) == 2
+                ):
+                    self._step_start = i
+                if parent is not None:
+                    parent["after_colon"] = False
+                self._stack.append({"type": "{", "key": None, "after_colon": False})
+            elif ch == "[":
+                parent = self._stack[-1]
+                key = parent["key"] if parent["type"] == "{" else None
+                if len(self._stack) == 1 and key == "steps":
+                    self._root_has_steps = True
+                parent["after_colon"] = False
+                self._stack.append({"type": "[", "key": key, "after_colon": False})
+            elif ch in "}]":
+                self._stack.pop()
+                if ch == "}" and self._step_start is not None and len(self._stack) == 2:
+                    step = self._parse_step(buffer[self._step_start:i + 1])
+                    self._step_start = None
+                    if step is not None:
+                        self.steps.append(step)
+                        new_steps.append(step)
+                if not self._stack:
+                    if self._root_has_steps:
+                        self.done = True
+                        i += 1
+                        break
+                    # 根对象不包含 steps，继续寻找下一个候选对象
+                    self.description = None
+            elif ch == ":":
+                self._stack[-1]["after_colon"] = True
+            elif ch == ",":
+                top = self._stack[-1]
+                if top["type"] == "{":
+                    top["key"] = None
+                    top["after_colon"] = False
+            i += 1
+
+        self._pos = i
+        return new_steps
+
+    def _on_string(self, literal: str):
+        """处理一个完整的字符串字面量（键或值）"""
+        top = self._stack[-1]
+        if top["type"] != "{":
+            return
+        try:
+            value = json.loads(literal)
+        except json.JSONDecodeError:
+            return
+        if not top["after_colon"]:
+            top["key"] = value
+        else:
+            if len(self._stack) == 1 and top["key"] == "description":
+                self.description = value
+            top["after_colon"] = False
+
+    @staticmethod
+    def _parse_step(text: str) -> Optional[Dict[str, Any]]:
+        """解析单个步骤对象，不合法时返回 None"""
+        try:
+            step = json.loads(text)
+        except json.JSONDecodeError:
+            try:
+                step = json.loads(repair_json(text))
+            except json.JSONDecodeError:
+                return None
+        if isinstance(step, dict) and step.get("action"):
+            return step
+        return None
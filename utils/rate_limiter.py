@@ -0,0 +1,166 @@
+"""
+LLM 请求限流
+按服务商的 RPM（每分钟请求数）和 TPM（每分钟 token 数）配额用令牌桶限流，
+等待者按先来先服务排队，收到 429 时按 Retry-After 暂停所有请求
+"""
+
+import asyncio
+import email.utils
+import threading
+import time
+from typing import Dict, Mapping, Optional, Tuple
+
+from config import config
+
+
+class TokenBucket:
+    """令牌桶：容量为每分钟配额，按配额匀速补充"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """距离可以取出 amount 个令牌还需等待的秒数（超过容量的请求按容量计算）"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def give(self, amount: float):
+        """退还（amount 为负时补扣）令牌"""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """请求数和 token 数的双令牌桶限流器，同步和异步调用方都可使用"""
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        """
+        Args:
+            requests_per_minute: 每分钟请求数上限，0 表示不限，默认读取 Config.LLM_REQUESTS_PER_MINUTE
+            tokens_per_minute: 每分钟 token 数上限，0 表示不限，默认读取 Config.LLM_TOKENS_PER_MINUTE
+        """
+        rpm = config.LLM_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute
+        tpm = config.LLM_TOKENS_PER_MINUTE if tokens_per_minute is None else tokens_per_minute
+        self._requests = TokenBucket(rpm) if rpm > 0 else None
+        self._tokens = TokenBucket(tpm) if tpm > 0 else None
+        self._blocked_until = 0.0
+        self._state_lock = threading.Lock()
+        # 排队锁：只有队首的调用方等待令牌补充，其余按到达顺序排在后面
+        self._sync_queue = threading.Lock()
+        self._async_queue: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Lock]] = None
+
+    def _try_reserve(self, tokens: float) -> float:
+        """尝试扣除一个请求和 tokens 个令牌，返回还需等待的秒数（0 表示已扣除）"""
+        with self._state_lock:
+            now = time.monotonic()
+            wait = self._blocked_until - now
+            if self._requests is not None:
+                wait = max(wait, self._requests.delay(1, now))
+            if self._tokens is not None:
+                wait = max(wait, self._tokens.delay(tokens, now))
+            if wait > 0:
+                return wait
+            if self._requests is not None:
+                self._requests.take(1)
+            if self._tokens is not None:
+                self._tokens.take(tokens)
+            return 0.0
+
+    def _get_async_queue(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._async_queue is None or self._async_queue[0] is not loop:
+            self._async_queue = (loop, asyncio.Lock())
+        return self._async_queue[1]
+
+    async def acquire(self, tokens: float = 0) -> float:
+        """
+        等待配额并扣除
+
+        Args:
+            tokens: 预估的 token 数（prompt + 最大输出）
+
+        Returns:
+            实际等待的秒数
+        """
+        start = time.monotonic()
+        async with self._get_async_queue():
+            while True:
+                wait = self._try_reserve(tokens)
+                if wait <= 0:
+                    return time.monotonic() - start
+                await asyncio.sleep(wait)
+
+    def acquire_sync(self, tokens: float = 0) -> float:
+        """acquire 的同步版本"""
+        start = time.monotonic()
+        with self._sync_queue:
+            while True:
+                wait = self._try_reserve(tokens)
+                if wait <= 0:
+                    return time.monotonic() - start
+                time.sleep(wait)
+
+    def settle(self, reserved: float, actual: float):
+        """请求完成后按实际 token 用量修正预扣的令牌"""
+        if self._tokens is None:
+            return
+        with self._state_lock:
+            self._tokens.give(reserved - actual)
+
+    def refund(self, reserved: float):
+        """请求被服务端拒绝（未计入配额）时退还预扣的令牌"""
+        self.settle(reserved, 0)
+
+    def release(self, reserved: float):
+        """退还整个预留（一个请求和预扣的令牌），用于被取消或结果被丢弃的请求，例如对冲中落选的副本"""
+        with self._state_lock:
+            if self._requests is not None:
+                self._requests.give(1)
+            if self._tokens is not None:
+                self._tokens.give(reserved)
+
+    def backoff(self, seconds: float):
+        """在 seconds 秒内暂停所有请求，例如收到 429 的 Retry-After"""
+        with self._state_lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """解析 Retry-After 响应头（秒数或 HTTP 日期），无法解析时返回 None"""
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+_shared: Dict[str, RateLimiter] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_rate_limiter(key: str) -> RateLimiter:
+    """获取按 API Key 共享的限流器，使用同一个 Key 的 LLM 实例共享配额"""
+    with _shared_lock:
+        limiter = _shared.get(key)
+        if limiter is None:
+            limiter = _shared[key] = RateLimiter()
+        return limiter
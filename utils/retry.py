@@ -0,0 +1,113 @@
+"""
+重试与对冲请求
+带抖动的指数退避、最近延迟的分位数统计，以及超过分位数延迟后发送副本请求的对冲调用
+"""
+
+import asyncio
+import random
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from config import config
+
+
+def backoff_delay(attempt: int, base: Optional[float] = None, cap: Optional[float] = None) -> float:
+    """
+    带完全抖动的指数退避
+
+    Args:
+        attempt: 已失败的次数（从 0 开始）
+        base: 初始延迟（秒），默认读取 Config.LLM_RETRY_BASE_DELAY
+        cap: 延迟上限（秒），默认读取 Config.LLM_RETRY_MAX_DELAY
+    """
+    base = config.LLM_RETRY_BASE_DELAY if base is None else base
+    cap = config.LLM_RETRY_MAX_DELAY if cap is None else cap
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class LatencyTracker:
+    """按类别保存最近的延迟样本，用于计算对冲阈值"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(kind)
+            if samples is None:
+                samples = self._samples[kind] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, kind: str, q: float) -> Optional[float]:
+        """返回第 q 分位（0~1）的延迟，没有样本时返回 None"""
+        with self._lock:
+            samples = sorted(self._samples.get(kind, ()))
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, int(round(q * (len(samples) - 1)))))
+        return samples[index]
+
+    def count(self, kind: str) -> int:
+        with self._lock:
+            return len(self._samples.get(kind, ()))
+
+    def hedge_delay(self, kind: str) -> Optional[float]:
+        """
+        计算发送副本请求前的等待时间
+
+        样本数不足 Config.LLM_HEDGE_MIN_SAMPLES 时不对冲（返回 None），
+        否则取 Config.LLM_HEDGE_PERCENTILE 分位延迟，且不小于 Config.LLM_HEDGE_MIN_DELAY
+        """
+        if self.count(kind) < config.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        delay = self.percentile(kind, config.LLM_HEDGE_PERCENTILE)
+        return max(delay, config.LLM_HEDGE_MIN_DELAY)
+
+
+async def hedged(
+    factory: Callable[[], Awaitable[Any]],
+    delay: float,
+    discard: Optional[Callable[[Any], None]] = None,
+) -> Tuple[Any, bool]:
+    """
+    对冲调用：factory() 在 delay 秒内未完成时再发起一次，取先成功的结果
+
+    两次都失败时抛出最后一个异常。
+
+    Args:
+        factory: 创建一次请求的协程函数，必须是幂等的
+        delay: 发送副本前的等待时间（秒）
+        discard: 处理落选但已成功的结果，例如释放连接
+
+    Returns:
+        (结果, 是否发送了副本请求)
+    """
+    tasks = [asyncio.ensure_future(factory())]
+    winner = None
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            tasks.append(asyncio.ensure_future(factory()))
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    winner = task
+                    return task.result(), len(tasks) > 1
+                error = task.exception()
+        raise error
+    finally:
+        losers = [task for task in tasks if task is not winner]
+        for task in losers:
+            if not task.done():
+                task.cancel()
+        results = await asyncio.gather(*losers, return_exceptions=True)
+        if discard is not None:
+            for result in results:
+                if not isinstance(result, BaseException):
+                    discard(result)
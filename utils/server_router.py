@@ -0,0 +1,176 @@
+"""
+MCP 服务器路由
+在多个兼容 Playwright 的 MCP 服务器之间分配会话：选择健康且负载最低的服务器，
+负载按租出的会话数和最近的工具调用延迟估算，连续失败的服务器暂时移出轮换
+"""
+
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import config
+from utils.tool_schema_cache import server_config_key
+from utils.tracing import tracer
+
+
+class ServerState:
+    """单个服务器的负载和健康状态"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.sessions = 0  # 连接到该服务器的会话数（含正在建立的）
+        self.active = 0  # 租出的会话数
+        self.latency: Optional[float] = None  # 工具调用延迟的指数移动平均（秒）
+        self.failures = 0  # 连续失败次数
+        self.ejected_until = 0.0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+
+class ServerRouter:
+    """按负载和健康状态选择 MCP 服务器"""
+
+    def __init__(
+        self,
+        server_names: Iterable[str],
+        max_failures: Optional[int] = None,
+        eject_seconds: Optional[float] = None,
+        smoothing: float = 0.2,
+    ):
+        """
+        Args:
+            server_names: 可用的服务器名称（MCP 服务器配置中的键）
+            max_failures: 连续失败多少次后移出轮换，默认读取 Config.MCP_SERVER_MAX_FAILURES
+            eject_seconds: 移出轮换的时长（秒），到期后重新参与选择，默认读取 Config.MCP_SERVER_EJECT_SECONDS
+            smoothing: 延迟移动平均的平滑系数
+        """
+        self.servers: Dict[str, ServerState] = {name: ServerState(name) for name in server_names}
+        if not self.servers:
+            raise ValueError("MCP 服务器配置为空")
+        self.max_failures = config.MCP_SERVER_MAX_FAILURES if max_failures is None else max_failures
+        self.eject_seconds = config.MCP_SERVER_EJECT_SECONDS if eject_seconds is None else eject_seconds
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.servers)
+
+    @staticmethod
+    def _latency(state: ServerState) -> float:
+        # 没有延迟样本的服务器按 1 毫秒估计，优先获得流量以便采样
+        return state.latency if state.latency is not None else 0.001
+
+    def _score(self, state: ServerState) -> float:
+        return (state.active + 1) * self._latency(state)
+
+    def score(self, name: str) -> float:
+        """服务器上再执行一个任务的负载评分（租出会话数 × 延迟），越低越优先；已移出轮换的服务器为无穷大"""
+        state = self.servers.get(name)
+        if state is None:
+            return float("inf")
+        with self._lock:
+            if not state.healthy(time.monotonic()):
+                return float("inf")
+            return self._score(state)
+
+    def choose(self, exclude: Iterable[str] = ()) -> str:
+        """
+        为新会话选择负载最低（会话数 × 延迟）的健康服务器，并计入该服务器的会话数
+
+        会话关闭或建立失败后需调用 detach。所有服务器都不可用时，选择最早恢复的服务器，而不是直接失败
+        """
+        excluded = set(exclude)
+        with self._lock:
+            now = time.monotonic()
+            candidates = [s for s in self.servers.values() if s.name not in excluded] or list(self.servers.values())
+            healthy = [s for s in candidates if s.healthy(now)]
+            if healthy:
+                state = min(healthy, key=lambda s: ((s.sessions + 1) * self._latency(s), s.sessions))
+            else:
+                state = min(candidates, key=lambda s: s.ejected_until)
+            state.sessions += 1
+            return state.name
+
+    def attach(self, name: str):
+        """计入一个固定连接到该服务器的会话（未经 choose 选择的会话）"""
+        with self._lock:
+            state = self.servers.get(name)
+            if state is not None:
+                state.sessions += 1
+
+    def detach(self, name: str):
+        """会话关闭或建立失败"""
+        with self._lock:
+            state = self.servers.get(name)
+            if state is not None:
+                state.sessions = max(0, state.sessions - 1)
+
+    def begin(self, name: str):
+        """会话被租出"""
+        with self._lock:
+            state = self.servers.get(name)
+            if state is not None:
+                state.active += 1
+
+    def end(self, name: str):
+        """会话被归还"""
+        with self._lock:
+            state = self.servers.get(name)
+            if state is not None:
+                state.active = max(0, state.active - 1)
+
+    def record_success(self, name: str, seconds: Optional[float] = None):
+        """记录一次成功的调用及其延迟，并清除连续失败计数"""
+        with self._lock:
+            state = self.servers.get(name)
+            if state is None:
+                return
+            state.failures = 0
+            if seconds is not None:
+                if state.latency is None:
+                    state.latency = seconds
+                else:
+                    state.latency += self.smoothing * (seconds - state.latency)
+
+    def record_failure(self, name: str):
+        """记录一次服务器级失败（连接断开、会话失效、初始化失败），连续失败达到上限时移出轮换"""
+        with self._lock:
+            state = self.servers.get(name)
+            if state is None:
+                return
+            state.failures += 1
+            if state.failures < self.max_failures:
+                return
+            state.failures = 0
+            state.ejected_until = time.monotonic() + self.eject_seconds
+        tracer.incr("mcp.server.ejected", server=name)
+        print(f"⚠️ MCP 服务器 {name} 连续失败 {self.max_failures} 次，{self.eject_seconds:.0f} 秒内不再分配会话")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                name: {
+                    "sessions": state.sessions,
+                    "active": state.active,
+                    "latency_ms": round(state.latency * 1000, 2) if state.latency is not None else None,
+                    "healthy": state.healthy(now),
+                }
+                for name, state in self.servers.items()
+            }
+
+
+_shared: Dict[str, ServerRouter] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_router(mcp_server_config: Dict[str, Any]) -> ServerRouter:
+    """获取按服务器配置共享的路由器，使用同一组服务器的会话共享负载和健康状态"""
+    key = server_config_key(mcp_server_config)
+    with _shared_lock:
+        router = _shared.get(key)
+        if router is None:
+            router = _shared[key] = ServerRouter(mcp_server_config.keys())
+        return router
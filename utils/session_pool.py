@@ -0,0 +1,360 @@
+"""
+MCP 浏览器会话池
+维护若干个预热好的 MCPPlaywrightAgent（各自拥有独立的 MCP 服务器进程和浏览器），
+任务租用会话、用完归还，避免并发任务重复冷启动或争用同一个浏览器
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict, Optional, Set, Tuple
+
+from config import config
+from utils.mcp_browser_tools import MCPPlaywrightAgent
+from utils.tool_registry import ToolRegistry
+
+
+def _server_score(agent) -> float:
+    """会话所在服务器的负载评分，自定义会话没有路由器时为 0"""
+    router = getattr(agent, "router", None)
+    return router.score(agent.server_name) if router is not None else 0.0
+
+
+def _server_failed(agent):
+    """会话意外失效，计为所在服务器的一次失败"""
+    router = getattr(agent, "router", None)
+    if router is not None:
+        router.record_failure(agent.server_name)
+
+
+class MCPSessionPool:
+    """带最小/最大容量、空闲回收和健康检查的 MCP 会话池"""
+
+    def __init__(
+        self,
+        mcp_server_config: Optional[Dict[str, Any]] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+        health_check_interval: Optional[float] = None,
+        agent_factory: Optional[Callable[[], MCPPlaywrightAgent]] = None,
+    ):
+        """
+        初始化会话池
+
+        Args:
+            mcp_server_config: MCP 服务器配置
+            min_size: 常驻的最少会话数，默认读取 Config.MCP_POOL_MIN_SIZE
+            max_size: 最多会话数，默认读取 Config.MCP_POOL_MAX_SIZE
+            idle_timeout: 超出 min_size 的空闲会话在空闲多少秒后被回收，默认读取 Config.MCP_POOL_IDLE_TIMEOUT
+            health_check_interval: 健康检查间隔（秒），默认读取 Config.MCP_POOL_HEALTH_CHECK_INTERVAL
+            agent_factory: 自定义会话创建函数，默认创建 MCPPlaywrightAgent
+        """
+        self.mcp_server_config = mcp_server_config
+        self.min_size = config.MCP_POOL_MIN_SIZE if min_size is None else min_size
+        self.max_size = config.MCP_POOL_MAX_SIZE if max_size is None else max_size
+        self.max_size = max(self.max_size, self.min_size, 1)
+        self.idle_timeout = config.MCP_POOL_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        self.health_check_interval = (
+            config.MCP_POOL_HEALTH_CHECK_INTERVAL if health_check_interval is None else health_check_interval
+        )
+        self.agent_factory = agent_factory or (lambda: MCPPlaywrightAgent(self.mcp_server_config))
+
+        self.registry: Optional[ToolRegistry] = None
+        self._idle: Deque[Tuple[MCPPlaywrightAgent, float]] = deque()
+        self._agents: Set[MCPPlaywrightAgent] = set()
+        self._creating = 0
+        self._cond: Optional[asyncio.Condition] = None
+        self._start_lock = asyncio.Lock()
+        self._started = False
+        self._closed = False
+        self._reaper: Optional[asyncio.Task] = None
+        self._start_task: Optional[asyncio.Task] = None
+        self._background: Set[asyncio.Task] = set()
+
+    @property
+    def size(self) -> int:
+        """当前会话总数（含租出和创建中）"""
+        return len(self._agents) + self._creating
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
+
+    async def start(self):
+        """预热 min_size 个会话并启动后台回收任务"""
+        async with self._start_lock:
+            if self._started:
+                return
+            self._cond = asyncio.Condition()
+            self._closed = False
+            warm = max(self.min_size, 1)
+            self._creating += warm
+            results = await asyncio.gather(*(self._create() for _ in range(warm)), return_exceptions=True)
+            async with self._cond:
+                self._creating -= warm
+                for result in results:
+                    if isinstance(result, MCPPlaywrightAgent):
+                        self._agents.add(result)
+                        self._idle.append((result, time.monotonic()))
+                self._cond.notify_all()
+            if not self._agents:
+                errors = [r for r in results if isinstance(r, BaseException)]
+                raise errors[0] if errors else RuntimeError("MCP 会话池启动失败")
+            self.registry = next(iter(self._agents)).registry
+            self._reaper = asyncio.create_task(self._reap_loop())
+            self._started = True
+            print(f"✅ MCP 会话池已就绪: {len(self._agents)} 个预热会话 (最多 {self.max_size} 个)")
+
+    def prewarm(self):
+        """在后台启动会话池并立即返回；之后的 start/acquire 会等待这次启动完成"""
+        if self._started or (self._start_task is not None and not self._start_task.done()):
+            return
+        self._start_task = asyncio.create_task(self.start())
+        # 启动失败时由后续的 start/acquire 重试并抛出异常，这里只取走异常避免告警
+        self._start_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def _create(self) -> MCPPlaywrightAgent:
+        agent = self.agent_factory()
+        await agent.initialize()
+        return agent
+
+    async def acquire(self) -> MCPPlaywrightAgent:
+        """租用一个会话，没有空闲会话且已达上限时等待归还"""
+        if not self._started:
+            await self.start()
+        async with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("MCP 会话池已关闭")
+                agent = self._pop_idle()
+                if agent is not None:
+                    return self._lease_out(agent)
+                if self.size < self.max_size:
+                    self._creating += 1
+                    break
+                await self._cond.wait()
+
+        try:
+            agent = await self._create()
+        except Exception:
+            async with self._cond:
+                self._creating -= 1
+                self._cond.notify_all()
+            raise
+        async with self._cond:
+            self._creating -= 1
+            self._agents.add(agent)
+        return self._lease_out(agent)
+
+    async def try_acquire(self) -> Optional[MCPPlaywrightAgent]:
+        """尝试租用会话：有空闲会话或未达上限时返回会话，否则立即返回 None 而不等待"""
+        if not self._started:
+            await self.start()
+        async with self._cond:
+            if self._closed:
+                return None
+            agent = self._pop_idle()
+            if agent is not None:
+                return self._lease_out(agent)
+            if self.size >= self.max_size:
+                return None
+            self._creating += 1
+
+        try:
+            agent = await self._create()
+        except Exception as e:
+            print(f"⚠️ 创建 MCP 会话失败: {e}")
+            async with self._cond:
+                self._creating -= 1
+                self._cond.notify_all()
+            return None
+        async with self._cond:
+            self._creating -= 1
+            self._agents.add(agent)
+        return self._lease_out(agent)
+
+    def _pop_idle(self) -> Optional[MCPPlaywrightAgent]:
+        """
+        取出一个空闲会话（调用方需持有锁），同时丢弃已失效的会话
+
+        会话分布在多个服务器上时，选择所在服务器负载评分最低的会话；评分相同时选择最近归还的
+        """
+        best = None
+        best_score = float("inf")
+        for entry in list(self._idle):
+            agent = entry[0]
+            if not agent.is_alive():
+                self._idle.remove(entry)
+                _server_failed(agent)
+                self._discard(agent)
+                continue
+            score = _server_score(agent)
+            if best is None or score <= best_score:
+                best, best_score = entry, score
+        if best is None:
+            return None
+        self._idle.remove(best)
+        return best[0]
+
+    @staticmethod
+    def _lease_out(agent: MCPPlaywrightAgent) -> MCPPlaywrightAgent:
+        router = getattr(agent, "router", None)
+        if router is not None:
+            router.begin(agent.server_name)
+        return agent
+
+    async def release(self, agent: MCPPlaywrightAgent, healthy: bool = True):
+        """归还会话，不健康的会话会被关闭并按需补充"""
+        if healthy and getattr(agent, "interrupted", False):
+            # 有工具调用被取消或超时（如超过任务截止时间），确认会话仍能响应后才放回池中
+            agent.interrupted = False
+            healthy = await agent.ping()
+            if not healthy:
+                print("⚠️ 被中断的 MCP 会话无响应，已关闭")
+        async with self._cond:
+            if agent not in self._agents:
+                return
+            router = getattr(agent, "router", None)
+            if router is not None:
+                router.end(agent.server_name)
+            if not agent.is_alive():
+                _server_failed(agent)
+            if self._closed or not healthy or not agent.is_alive():
+                self._discard(agent)
+            else:
+                self._idle.append((agent, time.monotonic()))
+            self._cond.notify_all()
+
+    @asynccontextmanager
+    async def lease(self):
+        """以上下文管理器方式租用会话"""
+        agent = await self.acquire()
+        healthy = True
+        try:
+            yield agent
+        except BaseException:
+            healthy = agent.is_alive()
+            raise
+        finally:
+            await self.release(agent, healthy=healthy)
+
+    def _discard(self, agent: MCPPlaywrightAgent):
+        """移除会话并在后台关闭，数量低于 min_size 时补充预热会话（调用方需持有锁）"""
+        self._agents.discard(agent)
+        self._spawn(self._close_agent(agent))
+        if not self._closed and self.size < self.min_size:
+            self._creating += 1
+            self._spawn(self._replenish())
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _replenish(self):
+        """补充一个预热的备用会话"""
+        try:
+            agent = await self._create()
+        except Exception as e:
+            print(f"⚠️ 补充 MCP 会话失败: {e}")
+            async with self._cond:
+                self._creating -= 1
+                self._cond.notify_all()
+            return
+        async with self._cond:
+            self._creating -= 1
+            if self._closed:
+                self._spawn(self._close_agent(agent))
+            else:
+                self._agents.add(agent)
+                self._idle.append((agent, time.monotonic()))
+            self._cond.notify_all()
+
+    @staticmethod
+    async def _close_agent(agent: MCPPlaywrightAgent):
+        try:
+            await agent.close()
+        except Exception as e:
+            print(f"⚠️ 关闭 MCP 会话失败: {e}")
+
+    async def _reap_loop(self):
+        """定期回收空闲会话并检查空闲会话的健康状况"""
+        interval = max(min(self.health_check_interval, self.idle_timeout or self.health_check_interval), 1)
+        while not self._closed:
+            await asyncio.sleep(interval)
+            await self.check_health()
+
+    async def check_health(self):
+        """检查所有空闲会话：ping 失败的替换为备用会话，空闲过久且超出 min_size 的关闭"""
+        async with self._cond:
+            candidates = list(self._idle)
+            self._idle.clear()
+
+        now = time.monotonic()
+        alive = await asyncio.gather(*(agent.ping() for agent, _ in candidates))
+
+        async with self._cond:
+            for (agent, last_used), ok in zip(candidates, alive):
+                router = getattr(agent, "router", None)
+                if router is not None:
+                    if ok:
+                        router.record_success(agent.server_name)
+                    else:
+                        router.record_failure(agent.server_name)
+                if not ok:
+                    print("⚠️ 检测到失效的 MCP 会话，切换到备用会话")
+                    self._discard(agent)
+                elif (
+                    self.idle_timeout
+                    and now - last_used > self.idle_timeout
+                    and len(self._agents) > self.min_size
+                ):
+                    self._discard(agent)
+                else:
+                    self._idle.append((agent, last_used))
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回会话池状态，会话带有路由器时附带各服务器的负载和健康状态"""
+        stats = {
+            "size": self.size,
+            "idle": len(self._idle),
+            "in_use": len(self._agents) - len(self._idle),
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+        }
+        routers = {id(r): r for r in (getattr(a, "router", None) for a in self._agents) if r is not None}
+        if routers:
+            servers: Dict[str, Any] = {}
+            for router in routers.values():
+                servers.update(router.stats())
+            stats["servers"] = servers
+        return stats
+
+    async def close(self):
+        """关闭所有会话"""
+        if self._start_task is not None:
+            # 等待后台启动结束，避免启动中的会话泄漏
+            await asyncio.gather(self._start_task, return_exceptions=True)
+            self._start_task = None
+        if not self._started:
+            return
+        async with self._cond:
+            self._closed = True
+            agents = list(self._agents)
+            self._agents.clear()
+            self._idle.clear()
+            self._cond.notify_all()
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
+        await asyncio.gather(*(self._close_agent(agent) for agent in agents))
+        if self._background:
+            await asyncio.gather(*list(self._background), return_exceptions=True)
+        self._started = False
@@ -0,0 +1,200 @@
+"""
+推测导航
+大多数任务在开头就指明了目标网站（"访问百度…"、"访问 LangChain 官网…"），而浏览器在 LLM 规划期间处于空闲。
+规划开始时从任务中提取最可能的网址（显式 URL、域名或站点别名表）并立即导航，
+计划的第一步是导航到同一网址时直接采用推测的结果，否则放弃推测
+"""
+
+import asyncio
+import json
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+from config import config
+from utils.tracing import tracer
+
+NAVIGATE_TOOL = "playwright_navigate"
+
+# 默认的站点别名表，可通过 Config.SITE_ALIASES_FILE 补充或覆盖
+SITE_ALIASES: Dict[str, str] = {
+    "百度": "https://www.baidu.com",
+    "baidu": "https://www.baidu.com",
+    "必应": "https://www.bing.com",
+    "bing": "https://www.bing.com",
+    "谷歌": "https://www.google.com",
+    "google": "https://www.google.com",
+    "langchain": "https://www.langchain.com",
+    "github": "https://github.com",
+    "知乎": "https://www.zhihu.com",
+    "哔哩哔哩": "https://www.bilibili.com",
+    "b站": "https://www.bilibili.com",
+    "bilibili": "https://www.bilibili.com",
+    "淘宝": "https://www.taobao.com",
+    "京东": "https://www.jd.com",
+    "微博": "https://weibo.com",
+    "豆瓣": "https://www.douban.com",
+    "维基百科": "https://zh.wikipedia.org",
+    "wikipedia": "https://en.wikipedia.org",
+    "硅基流动": "https://siliconflow.cn",
+}
+
+_EXPLICIT_URL = re.compile(r"https?://[^\s，。；、！？）)\]》\"'<>]+", re.IGNORECASE)
+_BARE_DOMAIN = re.compile(
+    r"(?<![a-z0-9.@/-])((?:[a-z0-9-]+\.)+(?:com|cn|net|org|io|dev|ai|app|co|edu|gov|info)(?:\.cn)?)(/[^\s，。；、！？）)\]》\"'<>]*)?",
+    re.IGNORECASE,
+)
+
+
+def load_site_aliases(path: Optional[str] = None) -> Dict[str, str]:
+    """默认别名表合并 JSON 文件（{"别名": "网址"}）中的条目，文件不存在或无效时只使用默认表"""
+    aliases = dict(SITE_ALIASES)
+    path = config.SITE_ALIASES_FILE if path is None else path
+    if path:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                aliases.update({str(k).lower(): str(v) for k, v in json.load(f).items()})
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"⚠️ 读取站点别名表失败，使用默认别名: {e}")
+    return aliases
+
+
+def extract_url(task: str, aliases: Optional[Dict[str, str]] = None) -> Optional[str]:
+    """
+    从任务描述中提取最可能的目标网址：显式 URL 优先，其次是域名，最后是最先出现的站点别名
+
+    例如 "访问百度并搜索人工智能" 得到 https://www.baidu.com；没有可识别的网站时返回 None
+    """
+    match = _EXPLICIT_URL.search(task)
+    if match:
+        return match.group(0).rstrip(".,")
+    match = _BARE_DOMAIN.search(task)
+    if match:
+        return f"https://{match.group(1)}{match.group(2) or ''}".rstrip(".,")
+    text = task.lower()
+    best = None
+    for alias, url in (SITE_ALIASES if aliases is None else aliases).items():
+        position = text.find(alias.lower())
+        # 最先出现的别名优先，位置相同时较长的别名优先
+        if position >= 0 and (best is None or (position, -len(alias)) < best[0]):
+            best = ((position, -len(alias)), url)
+    return best[1] if best else None
+
+
+def normalize_url(url: str) -> str:
+    """比较用的网址：忽略协议、www. 前缀、大小写和末尾的 /"""
+    parts = urlsplit(url if "://" in url else f"https://{url}")
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{host}{parts.path.rstrip('/')}{query}"
+
+
+def matches_step(url: str, step: Dict[str, Any]) -> bool:
+    """计划步骤是否为导航到同一网址（且没有其他参数）"""
+    params = step.get("params") or {}
+    return (
+        step.get("action") == NAVIGATE_TOOL
+        and set(params) == {"url"}
+        and isinstance(params["url"], str)
+        and normalize_url(params["url"]) == normalize_url(url)
+    )
+
+
+class SpeculativeNavigation:
+    """一次进行中的推测导航"""
+
+    def __init__(self, browser, url: str):
+        self.url = url
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self._task = asyncio.create_task(self._navigate(browser))
+
+    async def _navigate(self, browser):
+        try:
+            return await browser.invoke_tool(NAVIGATE_TOOL, url=self.url)
+        finally:
+            self.finished = time.perf_counter()
+
+    async def result(self):
+        """等待导航完成并返回工具结果"""
+        return await self._task
+
+    async def abandon(self):
+        """放弃推测：取消尚未完成的导航，并等待其结束后再使用浏览器会话"""
+        if not self._task.done():
+            self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+class Speculator:
+    """推测导航的开关、站点别名表和命中统计"""
+
+    def __init__(self, enabled: Optional[bool] = None, aliases: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            enabled: 是否开启推测导航，默认读取 Config.SPECULATIVE_NAVIGATION
+            aliases: 站点别名表，默认为内置别名表合并 Config.SITE_ALIASES_FILE
+        """
+        self.enabled = config.SPECULATIVE_NAVIGATION if enabled is None else enabled
+        if aliases is None:
+            aliases = load_site_aliases() if self.enabled else {}
+        self.aliases = aliases
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def start(self, browser, task: str) -> Optional[SpeculativeNavigation]:
+        """开启推测导航；未开启、浏览器没有导航工具或任务中没有可识别的网站时返回 None"""
+        if not self.enabled or browser.registry is None or browser.registry.get(NAVIGATE_TOOL) is None:
+            return None
+        url = extract_url(task, self.aliases)
+        if url is None:
+            return None
+        with self._lock:
+            self.started += 1
+        tracer.incr("speculation.started")
+        return SpeculativeNavigation(browser, url)
+
+    def record_hit(self, speculation: SpeculativeNavigation, step_arrived: float):
+        """
+        记录一次命中，节省的时间为导航与规划重叠的部分：
+        导航总耗时减去第一步到达后仍需等待导航完成的时间
+        """
+        duration = speculation.finished - speculation.started
+        saved = max(0.0, duration - max(0.0, speculation.finished - step_arrived))
+        with self._lock:
+            self.hits += 1
+            self.saved_seconds += saved
+        tracer.incr("speculation.hit")
+        tracer.observe("speculation.saved.seconds", saved)
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+        tracer.incr("speculation.miss")
+
+    def record_error(self):
+        """推测导航本身失败（网址无法访问等），计划中的第一步照常执行"""
+        with self._lock:
+            self.errors += 1
+        tracer.incr("speculation.error")
+
+    def stats(self) -> Dict[str, Any]:
+        """返回推测次数、命中率和累计节省的时间"""
+        with self._lock:
+            resolved = self.hits + self.misses + self.errors
+            return {
+                "started": self.started,
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_rate": self.hits / resolved if resolved else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
@@ -0,0 +1,152 @@
+"""
+任务执行事件
+执行器以异步生成器的形式逐个产出这些事件，调用方可以边执行边展示结果；
+大块工具输出只以产物引用的形式出现在事件中
+"""
+
+from typing import Any, Dict, List, Optional
+
+SEPARATOR = "-" * 30
+
+
+class StepEvent:
+    """事件基类，lines() 返回用于展示的文本行"""
+
+    kind = "event"
+
+    def lines(self) -> List[str]:
+        return []
+
+    def __str__(self) -> str:
+        return "\n".join(self.lines())
+
+
+class StepStarted(StepEvent):
+    """步骤开始执行"""
+
+    kind = "step_started"
+
+    def __init__(self, index: int, action: Optional[str], params: Dict[str, Any]):
+        self.index = index
+        self.action = action
+        self.params = params
+
+    def lines(self) -> List[str]:
+        return [f"▶️ 步骤 {self.index}: {self.action}"]
+
+
+class StepFinished(StepEvent):
+    """步骤执行完成（成功或失败），output 中的大块内容已替换为产物引用"""
+
+    kind = "step_finished"
+
+    def __init__(
+        self,
+        index: int,
+        action: Optional[str],
+        ok: bool,
+        output: str,
+        artifacts: Optional[List[Any]] = None,
+        seconds: float = 0.0,
+    ):
+        self.index = index
+        self.action = action
+        self.ok = ok
+        self.output = output
+        self.artifacts = artifacts or []
+        self.seconds = seconds
+
+    def lines(self) -> List[str]:
+        return [f"📋 步骤 {self.index}: {self.action}", self.output, SEPARATOR]
+
+
+class StepSkipped(StepFinished):
+    """依赖的步骤失败，步骤被跳过"""
+
+    kind = "step_skipped"
+
+    def __init__(self, index: int, action: Optional[str], reason: str):
+        super().__init__(index, action, False, f"⏭️ 跳过: {reason}")
+
+
+class TaskNote(StepEvent):
+    """执行过程中的提示，例如计划生成中断"""
+
+    kind = "note"
+
+    def __init__(self, message: str):
+        self.message = message
+
+    def lines(self) -> List[str]:
+        return [self.message]
+
+
+class TaskFinished(StepEvent):
+    """任务结束，是事件流中的最后一个事件"""
+
+    kind = "task_finished"
+
+    def __init__(self, task: str, description: str, ok: bool, step_count: int):
+        self.task = task
+        self.description = description
+        self.ok = ok
+        self.step_count = step_count
+
+    def lines(self) -> List[str]:
+        status = "✅ 任务完成" if self.ok else "⚠️ 任务结束，部分步骤失败"
+        return [f"{status}: {self.description}（{self.step_count} 个步骤）"]
+
+
+class TaskFailed(StepEvent):
+    """任务无法执行（规划失败等），是事件流中的最后一个事件"""
+
+    kind = "task_failed"
+
+    def __init__(self, task: str, message: str):
+        self.task = task
+        self.message = message
+
+    def lines(self) -> List[str]:
+        return [self.message]
+
+
+class TaskTimedOut(TaskFailed):
+    """任务超过截止时间被取消，是事件流中的最后一个事件；列出已完成、失败和被中断的步骤"""
+
+    kind = "task_timed_out"
+
+    def __init__(self, task: str, seconds: float, completed: List[str], failed: List[str], interrupted: List[str]):
+        self.seconds = seconds
+        self.completed = completed
+        self.failed = failed
+        self.interrupted = interrupted
+        lines = [
+            f"⏱️ 任务超过截止时间（{seconds:g} 秒），已取消",
+            f"已完成的步骤: {', '.join(completed) or '无'}",
+        ]
+        if failed:
+            lines.append(f"失败的步骤: {', '.join(failed)}")
+        if interrupted:
+            lines.append(f"被中断的步骤: {', '.join(interrupted)}")
+        super().__init__(task, "\n".join(lines))
+
+
+class StepProgress:
+    """跟踪事件流中各步骤的状态，任务被中断时据此报告部分结果"""
+
+    def __init__(self):
+        self._started: Dict[int, str] = {}
+        self._finished: Dict[int, bool] = {}
+
+    def observe(self, event: StepEvent):
+        if isinstance(event, StepStarted):
+            self._started[event.index] = f"{event.index}. {event.action}"
+        elif isinstance(event, StepFinished):
+            self._started.setdefault(event.index, f"{event.index}. {event.action}")
+            self._finished[event.index] = event.ok
+
+    def timed_out(self, task: str, seconds: float) -> TaskTimedOut:
+        completed = [name for index, name in sorted(self._started.items()) if self._finished.get(index)]
+        failed = [name for index, name in sorted(self._started.items()) if self._finished.get(index) is False]
+        interrupted = [name for index, name in sorted(self._started.items()) if index not in self._finished]
+        return TaskTimedOut(task, seconds, completed, failed, interrupted)
@@ -0,0 +1,92 @@
+"""
+只读工具调用缓存
+把工具分为只读和会改变页面的两类；会话维护一个页面状态版本，每次改变页面的调用都会递增版本，
+同一版本下参数相同的只读调用直接返回上次的结果
+
+失效规则：
+1. 只读工具以外的任何调用（包括未知工具和失败的调用）都视为改变了页面，调用前后各递增一次版本并清空缓存
+2. 条目超过 TTL 后失效，页面可能在没有操作的情况下自行变化（定时器、异步加载）
+3. 失败的结果不缓存；读取期间页面状态版本发生变化时，结果也不缓存
+4. 会话关闭或重建时清空
+"""
+
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from config import config
+from utils.tracing import tracer
+
+
+class PageStateMemo:
+    """按页面状态版本缓存只读工具调用结果的 LRU 缓存"""
+
+    def __init__(
+        self,
+        read_only: Optional[Iterable[str]] = None,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ):
+        """
+        Args:
+            read_only: 只读工具名，默认读取 Config.TOOL_MEMO_READ_ONLY
+            max_entries: 最大条目数，默认读取 Config.TOOL_MEMO_SIZE
+            ttl: 条目有效期（秒），0 表示不过期，默认读取 Config.TOOL_MEMO_TTL
+        """
+        self.read_only = set(config.TOOL_MEMO_READ_ONLY if read_only is None else read_only)
+        self.max_entries = config.TOOL_MEMO_SIZE if max_entries is None else max_entries
+        self.ttl = config.TOOL_MEMO_TTL if ttl is None else ttl
+        self.version = 0
+        # (工具名, 参数) -> (页面状态版本, 写入时间, 结果)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[int, float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def is_read_only(self, tool_name: str) -> bool:
+        return tool_name in self.read_only
+
+    @staticmethod
+    def _key(tool_name: str, args: Dict[str, Any]) -> Tuple[str, str]:
+        return tool_name, json.dumps(args, sort_keys=True, ensure_ascii=False, default=str)
+
+    def get(self, tool_name: str, args: Dict[str, Any]) -> Optional[Any]:
+        """查找当前页面状态下的结果，未命中或已过期时返回 None"""
+        key = self._key(tool_name, args)
+        entry = self._entries.get(key)
+        if entry is not None:
+            version, created, result = entry
+            if version == self.version and (not self.ttl or time.monotonic() - created <= self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                tracer.incr("mcp.memo", result="hit")
+                return result
+            del self._entries[key]
+        self.misses += 1
+        tracer.incr("mcp.memo", result="miss")
+        return None
+
+    def put(self, tool_name: str, args: Dict[str, Any], result: Any, version: int):
+        """写入结果；version 是调用开始时的页面状态版本，调用期间页面发生变化时不写入"""
+        if version != self.version or self.max_entries <= 0:
+            return
+        key = self._key(tool_name, args)
+        self._entries[key] = (version, time.monotonic(), result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """页面状态发生变化：递增版本并清空缓存"""
+        self.version += 1
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
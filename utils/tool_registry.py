@@ -0,0 +1,194 @@
+"""
+MCP 工具注册表
+在初始化时一次性建立工具索引、渲染 prompt 工具目录，并为每个工具编译参数校验器
+"""
+
+import hashlib
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+# 校验器：接收参数值和路径，返回错误列表
+Validator = Callable[[Any, str], List[str]]
+
+_TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "string": lambda v: isinstance(v, str),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "null": lambda v: v is None,
+}
+
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """
+    把 JSON Schema 编译为校验函数
+
+    只实现工具参数常用的关键字（type/required/properties/additionalProperties/enum/items/
+    minimum/maximum），未知关键字一律放行，保证不会误拒合法参数。
+    """
+    if not isinstance(schema, dict):
+        return lambda value, path: []
+
+    checks: List[Validator] = []
+
+    types = schema.get("type")
+    if types is not None:
+        type_list = types if isinstance(types, list) else [types]
+        type_funcs = [_TYPE_CHECKS[t] for t in type_list if t in _TYPE_CHECKS]
+        if type_funcs:
+            expected = "/".join(type_list)
+
+            def check_type(value, path):
+                if any(f(value) for f in type_funcs):
+                    return []
+                return [f"{path or '参数'} 类型应为 {expected}，实际为 {type(value).__name__}"]
+            checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = schema["enum"]
+
+        def check_enum(value, path):
+            return [] if value in allowed else [f"{path} 取值应为 {allowed} 之一"]
+        checks.append(check_enum)
+
+    if "minimum" in schema or "maximum" in schema:
+        minimum = schema.get("minimum")
+        maximum = schema.get("maximum")
+
+        def check_range(value, path):
+            if not _TYPE_CHECKS["number"](value):
+                return []
+            if minimum is not None and value < minimum:
+                return [f"{path} 不能小于 {minimum}"]
+            if maximum is not None and value > maximum:
+                return [f"{path} 不能大于 {maximum}"]
+            return []
+        checks.append(check_range)
+
+    properties = schema.get("properties")
+    required = schema.get("required") or []
+    additional = schema.get("additionalProperties", True)
+    if properties is not None or required or additional is False:
+        prop_validators = {name: compile_schema(sub) for name, sub in (properties or {}).items()}
+
+        def check_object(value, path):
+            if not isinstance(value, dict):
+                return []
+            errors = [f"缺少必填参数 {_join(path, name)}" for name in required if name not in value]
+            for name, item in value.items():
+                validator = prop_validators.get(name)
+                if validator is not None:
+                    errors.extend(validator(item, _join(path, name)))
+                elif additional is False:
+                    errors.append(f"未知参数 {_join(path, name)}")
+            return errors
+        checks.append(check_object)
+
+    items = schema.get("items")
+    if isinstance(items, dict):
+        item_validator = compile_schema(items)
+
+        def check_items(value, path):
+            if not isinstance(value, list):
+                return []
+            errors = []
+            for i, item in enumerate(value):
+                errors.extend(item_validator(item, f"{path}[{i}]"))
+            return errors
+        checks.append(check_items)
+
+    if not checks:
+        return lambda value, path: []
+
+    def validate(value, path=""):
+        errors = []
+        for check in checks:
+            errors.extend(check(value, path))
+        return errors
+    return validate
+
+
+def _join(path: str, name: str) -> str:
+    return f"{path}.{name}" if path else name
+
+
+def tool_input_schema(tool) -> Dict[str, Any]:
+    """获取工具的参数 JSON Schema"""
+    schema = getattr(tool, "args_schema", None)
+    if isinstance(schema, dict):
+        return schema
+    if hasattr(schema, "model_json_schema"):
+        return schema.model_json_schema()
+    if hasattr(schema, "schema"):
+        return schema.schema()
+    return {"type": "object", "properties": getattr(tool, "args", None) or {}}
+
+
+def render_tool(tool) -> str:
+    """渲染单个工具在 prompt 中的描述行"""
+    tool_info = f"- {tool.name}: {tool.description}"
+    args = getattr(tool, "args", None)
+    if args:
+        # 如果有参数信息，添加参数说明
+        params = []
+        for param_name, param_info in args.items():
+            param_desc = f"{param_name}"
+            if isinstance(param_info, dict):
+                description = param_info.get("description")
+            else:
+                description = getattr(param_info, "description", None)
+            if description:
+                param_desc += f" ({description})"
+            params.append(param_desc)
+        if params:
+            tool_info += f" (参数: {', '.join(params)})"
+    return tool_info
+
+
+class ToolRegistry:
+    """工具注册表：O(1) 名称查找、缓存的工具目录和预编译的参数校验器"""
+
+    def __init__(self, tools: List[Any]):
+        self.tools = list(tools)
+        self._by_name: Dict[str, Any] = {tool.name: tool for tool in self.tools}
+        self.schemas: Dict[str, Dict[str, Any]] = {tool.name: tool_input_schema(tool) for tool in self.tools}
+        self._validators: Dict[str, Validator] = {
+            name: compile_schema(schema) for name, schema in self.schemas.items()
+        }
+        self.lines: Dict[str, str] = {tool.name: render_tool(tool) for tool in self.tools}
+        self.catalog = "\n".join(self.lines.values()) if self.lines else "- 无可用工具"
+        self.catalog_hash = self._compute_hash()
+
+    def _compute_hash(self) -> str:
+        """计算工具目录哈希，工具变化时依赖它的缓存自动失效"""
+        catalog = [[tool.name, tool.description, self.schemas[tool.name]] for tool in self.tools]
+        data = json.dumps(catalog, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def __len__(self) -> int:
+        return len(self.tools)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._by_name.keys())
+
+    def render_catalog(self, names: List[str]) -> str:
+        """渲染部分工具的目录"""
+        lines = [self.lines[name] for name in names if name in self.lines]
+        return "\n".join(lines) if lines else "- 无可用工具"
+
+    def get(self, name: str) -> Optional[Any]:
+        """按名称查找工具"""
+        return self._by_name.get(name)
+
+    def validate(self, name: str, params: Dict[str, Any]) -> List[str]:
+        """在本地校验工具参数，返回错误列表（为空表示通过）"""
+        validator = self._validators.get(name)
+        if validator is None:
+            return [f"工具 {name} 未找到"]
+        return validator(params, "")
@@ -0,0 +1,203 @@
+"""
+工具检索
+基于 BM25 为每个任务挑选相关工具，缩小规划 prompt 中的工具目录
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from config import config
+
+# 中文任务描述中的常见说法到工具词汇的映射，弥补中文任务与英文工具描述之间的词汇差异
+QUERY_ALIASES: Dict[str, str] = {
+    "访问": "navigate url",
+    "打开": "navigate url",
+    "进入": "navigate url",
+    "跳转": "navigate url",
+    "网址": "navigate url",
+    "官网": "navigate url",
+    "搜索": "fill input click",
+    "输入": "fill input",
+    "填写": "fill input",
+    "登录": "fill input click",
+    "点击": "click element",
+    "按钮": "click element",
+    "截图": "screenshot",
+    "截屏": "screenshot",
+    "保存": "screenshot save",
+    "文本": "text content",
+    "内容": "text content",
+    "读取": "get text content",
+    "获取": "get text content",
+    "提取": "get text html",
+    "网页源码": "html",
+    "源码": "html",
+    "悬停": "hover",
+    "鼠标": "hover",
+    "选择": "select",
+    "下拉": "select",
+    "按键": "press key",
+    "回车": "press key enter",
+    "键盘": "press key",
+    "返回": "back",
+    "后退": "back",
+    "前进": "forward",
+    "上传": "upload file",
+    "下载": "download",
+    "拖拽": "drag",
+    "拖动": "drag",
+    "脚本": "evaluate javascript",
+    "执行": "evaluate",
+    "控制台": "console logs",
+    "日志": "console logs",
+    "关闭": "close",
+    "pdf": "pdf save",
+    "请求": "http request get post",
+    "接口": "http request get post",
+    "iframe": "iframe",
+}
+
+_STOPWORDS = {"the", "a", "an", "of", "to", "and", "or", "in", "on", "for", "with", "by", "is", "be", "playwright"}
+
+
+def tokenize(text: str) -> List[str]:
+    """分词：英文按单词（拆分驼峰和下划线）小写，中文按单字和相邻双字"""
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text or "")
+    tokens = []
+    for word in re.findall(r"[A-Za-z]+|\d+|[\u4e00-\u9fff]+", text):
+        if "\u4e00" <= word[0] <= "\u9fff":
+            tokens.extend(word)
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            word = word.lower()
+            if word not in _STOPWORDS:
+                tokens.append(word)
+    return tokens
+
+
+def expand_query(task: str) -> List[str]:
+    """对任务描述分词，并按 QUERY_ALIASES 补充工具词汇"""
+    tokens = tokenize(task)
+    lowered = task.lower()
+    for phrase, expansion in QUERY_ALIASES.items():
+        if phrase in lowered:
+            tokens.extend(tokenize(expansion))
+    return tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的 token 数"""
+    return len(text) // 4 + 1
+
+
+class BM25:
+    """Okapi BM25 检索"""
+
+    def __init__(self, documents: Sequence[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(doc) for doc in documents]
+        self.lengths = [len(doc) for doc in documents]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if documents else 0.0
+        doc_freq: Counter = Counter()
+        for doc in documents:
+            doc_freq.update(set(doc))
+        total = len(documents)
+        self.idf = {
+            term: math.log(1 + (total - freq + 0.5) / (freq + 0.5))
+            for term, freq in doc_freq.items()
+        }
+
+    def scores(self, query: Iterable[str]) -> List[float]:
+        terms = [term for term in query if term in self.idf]
+        results = []
+        for freqs, length in zip(self.term_freqs, self.lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            for term in terms:
+                tf = freqs.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            results.append(score)
+        return results
+
+
+class ToolRetriever:
+    """为任务挑选相关工具：必选工具 + BM25 得分最高的 top-k，并受 token 预算约束"""
+
+    def __init__(
+        self,
+        registry,
+        core: Optional[Iterable[str]] = None,
+        top_k: Optional[int] = None,
+        token_budget: Optional[int] = None,
+    ):
+        """
+        Args:
+            registry: ToolRegistry 实例
+            core: 每个任务都包含的工具，默认读取 Config.TOOL_CORE_SET
+            top_k: 按相关度额外挑选的工具数，默认读取 Config.TOOL_TOP_K
+            token_budget: 工具目录的 token 预算，默认读取 Config.TOOL_CATALOG_TOKEN_BUDGET
+        """
+        self.registry = registry
+        self.names = registry.names
+        core = config.TOOL_CORE_SET if core is None else core
+        self.core: List[str] = [name for name in core if name in registry]
+        self.top_k = config.TOOL_TOP_K if top_k is None else top_k
+        self.token_budget = config.TOOL_CATALOG_TOKEN_BUDGET if token_budget is None else token_budget
+        # 计划中使用过、但当时未被选中的工具，之后的任务都会包含
+        self.promoted: Set[str] = set()
+
+        documents = []
+        for name in self.names:
+            tool = registry.get(name)
+            params = " ".join(registry.schemas.get(name, {}).get("properties", {}).keys())
+            # 工具名重复一次以提高权重
+            documents.append(tokenize(f"{name} {name} {tool.description or ''} {params}"))
+        self.index = BM25(documents)
+        self.costs = {name: estimate_tokens(registry.lines[name]) for name in self.names}
+
+    def select(self, task: str) -> List[str]:
+        """返回为任务挑选的工具名（按注册表顺序）"""
+        scores = self.index.scores(expand_query(task))
+        ranked = sorted(
+            (i for i, score in enumerate(scores) if score > 0),
+            key=lambda i: scores[i],
+            reverse=True,
+        )
+
+        selected: List[str] = []
+        budget = self.token_budget
+        for name in self.core + sorted(self.promoted):
+            if name not in selected:
+                selected.append(name)
+                budget -= self.costs[name]
+        added = 0
+        for i in ranked:
+            if added >= self.top_k:
+                break
+            name = self.names[i]
+            if name in selected:
+                continue
+            if self.costs[name] > budget:
+                continue
+            selected.append(name)
+            budget -= self.costs[name]
+            added += 1
+
+        order = {name: i for i, name in enumerate(self.names)}
+        return sorted(selected, key=order.__getitem__)
+
+    def omitted(self, selected: Iterable[str]) -> List[str]:
+        """未被选中的工具名"""
+        chosen = set(selected)
+        return [name for name in self.names if name not in chosen]
+
+    def promote(self, name: str) -> bool:
+        """计划使用了未选中的工具时调用，之后的任务都会包含该工具；返回是否为新增"""
+        if name not in self.registry or name in self.promoted or name in self.core:
+            return False
+        self.promoted.add(name)
+        return True
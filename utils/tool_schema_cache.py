@@ -0,0 +1,90 @@
+"""
+工具 schema 磁盘缓存
+按 MCP 服务器配置持久化工具名称、描述和参数 schema，启动时无需等待服务器握手即可构造 prompt 和校验参数
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from config import config
+from utils.tool_registry import tool_input_schema
+
+# 缓存格式版本，格式变化时递增，旧缓存自动失效
+CACHE_VERSION = 1
+
+
+class CachedTool:
+    """从缓存恢复的工具描述，只用于构造 prompt 和参数校验，不能调用"""
+
+    def __init__(self, name: str, description: str, args_schema: Dict[str, Any]):
+        self.name = name
+        self.description = description
+        self.args_schema = args_schema
+
+    @property
+    def args(self) -> Dict[str, Any]:
+        return self.args_schema.get("properties", {})
+
+
+def server_config_key(mcp_server_config: Dict[str, Any]) -> str:
+    """计算 MCP 服务器配置的缓存键"""
+    data = json.dumps([CACHE_VERSION, mcp_server_config], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+class ToolSchemaCache:
+    """按服务器配置保存工具 schema 的磁盘缓存"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: 缓存文件路径，为空表示禁用，默认读取 Config.TOOL_SCHEMA_CACHE_PATH
+        """
+        self.path = config.TOOL_SCHEMA_CACHE_PATH if path is None else path
+
+    def _read(self) -> Dict[str, Any]:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ 工具 schema 缓存加载失败，已忽略: {e}")
+            return {}
+        if data.get("version") != CACHE_VERSION:
+            return {}
+        return data.get("servers", {})
+
+    def load(self, mcp_server_config: Dict[str, Any]) -> Optional[List[CachedTool]]:
+        """读取指定服务器配置的工具列表，未缓存时返回 None"""
+        entry = self._read().get(server_config_key(mcp_server_config))
+        if not entry:
+            return None
+        return [CachedTool(t["name"], t["description"], t["args_schema"]) for t in entry["tools"]]
+
+    def save(self, mcp_server_config: Dict[str, Any], tools: List[Any]):
+        """原子地写入工具列表，内容未变化时跳过"""
+        if not self.path:
+            return
+        servers = self._read()
+        key = server_config_key(mcp_server_config)
+        entry = {
+            "tools": [
+                {"name": tool.name, "description": tool.description, "args_schema": tool_input_schema(tool)}
+                for tool in tools
+            ]
+        }
+        if servers.get(key) == entry:
+            return
+        servers[key] = entry
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": CACHE_VERSION, "servers": servers}, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ 工具 schema 缓存保存失败: {e}")
@@ -0,0 +1,224 @@
+"""
+结构化追踪与指标
+记录计划/执行流水线各阶段的 span（LLM 请求、计划解析、工具调用、MCP 初始化/关闭），
+汇总为延迟直方图和计数器，可导出为 JSON 或 Prometheus 文本格式
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# 延迟直方图桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _label_key(name: str, labels: Dict[str, Any]) -> LabelKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Histogram:
+    """固定桶的累积直方图"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def quantile(self, q: float) -> float:
+        """按桶估算分位数（取桶上界）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for i, bound in enumerate(self.buckets):
+            cumulative += self.counts[i]
+            if cumulative >= target:
+                return bound
+        return float("inf")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {str(b): c for b, c in zip(self.buckets, self.counts)},
+            "overflow": self.counts[-1],
+        }
+
+
+class Span:
+    """一次计时的操作，支持同步和异步上下文管理器"""
+
+    def __init__(self, tracer: "Tracer", name: str, labels: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.labels = labels
+        self.attrs: Dict[str, Any] = {}
+        self.start = 0.0
+        self.duration = 0.0
+        self.error: Optional[str] = None
+
+    def set(self, **attrs):
+        """附加属性，例如 token 数"""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        self.tracer._finish(self)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class Tracer:
+    """span 记录器和指标汇总"""
+
+    def __init__(self, max_recent: int = 200, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms: Dict[LabelKey, Histogram] = {}
+        self._counters: Dict[LabelKey, float] = {}
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=max_recent)
+
+    def span(self, name: str, **labels) -> Span:
+        """创建 span，labels 作为指标维度（应为低基数值，例如工具名）"""
+        return Span(self, name, labels)
+
+    def observe(self, name: str, value: float, **labels):
+        """向直方图记录一个值（秒）"""
+        if not self.enabled:
+            return
+        key = _label_key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def incr(self, name: str, value: float = 1, **labels):
+        """增加计数器"""
+        if not self.enabled:
+            return
+        key = _label_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def _finish(self, span: Span):
+        if not self.enabled:
+            return
+        self.observe(span.name, span.duration, **span.labels)
+        if span.error:
+            self.incr(f"{span.name}.errors", **span.labels)
+        with self._lock:
+            self._recent.append({
+                "name": span.name,
+                "labels": span.labels,
+                "attrs": span.attrs,
+                "duration": span.duration,
+                "error": span.error,
+                "end": time.time(),
+            })
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._recent.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回当前全部指标"""
+        with self._lock:
+            histograms = [
+                {"name": name, "labels": dict(labels), **hist.to_dict()}
+                for (name, labels), hist in self._histograms.items()
+            ]
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self._counters.items()
+            ]
+            recent = list(self._recent)
+        return {"histograms": histograms, "counters": counters, "recent_spans": recent}
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=indent, default=str)
+
+    def to_prometheus(self, prefix: str = "mcp_demo") -> str:
+        """导出为 Prometheus 文本格式"""
+        lines: List[str] = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        declared = set()
+        for (name, labels), hist in histograms:
+            metric = f"{prefix}_{_metric_name(name)}_seconds"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                cumulative += count
+                lines.append(f"{metric}_bucket{_format_labels(labels, le=str(bound))} {cumulative}")
+            lines.append(f"{metric}_bucket{_format_labels(labels, le='+Inf')} {hist.count}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {hist.sum}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {hist.count}")
+
+        for (name, labels), value in counters:
+            metric = f"{prefix}_{_metric_name(name)}_total"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str):
+        """写入文件，.prom/.txt 后缀导出 Prometheus 文本，其余导出 JSON"""
+        content = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+
+def _metric_name(name: str) -> str:
+    return "".join(ch if ch.isalnum() else "_" for ch in name)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], **extra) -> str:
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in items) + "}"
+
+
+# 全局追踪器
+tracer = Tracer()
@@ -0,0 +1,162 @@
+"""
+基于条件的等待
+通过 playwright_evaluate 轮询页面状态，条件满足立即返回，轮询间隔自适应退避，并有硬性超时上限
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from config import config
+
+EVALUATE_TOOL = "playwright_evaluate"
+
+# 哨兵值在脚本中拼接生成，避免服务器回显脚本时误判
+_OK = "__WAIT_OK__"
+_PENDING = "__WAIT_PENDING__"
+_JS_OK = "'__WAIT_' + 'OK__'"
+_JS_PENDING = "'__WAIT_' + 'PENDING__'"
+
+# 支持的等待条件参数
+CONDITION_KEYS = ("selector", "text", "url_contains", "url_change", "state")
+
+
+def _selector_script(selector: str) -> str:
+    return (
+        "(() => {"
+        f" const el = document.querySelector({json.dumps(selector)});"
+        f" if (!el) return {_JS_PENDING};"
+        " const r = el.getBoundingClientRect(); const s = getComputedStyle(el);"
+        " const visible = r.width > 0 && r.height > 0 && s.visibility !== 'hidden' && s.display !== 'none';"
+        f" return visible ? {_JS_OK} : {_JS_PENDING};"
+        " })()"
+    )
+
+
+def _text_script(text: str) -> str:
+    return (
+        "(() => {"
+        f" const ok = document.body && document.body.innerText.includes({json.dumps(text)});"
+        f" return ok ? {_JS_OK} : {_JS_PENDING};"
+        " })()"
+    )
+
+
+def _url_contains_script(fragment: str) -> str:
+    return f"(() => location.href.includes({json.dumps(fragment)}) ? {_JS_OK} : {_JS_PENDING})()"
+
+
+def _url_change_script(baseline: str) -> str:
+    return f"(() => location.href !== {json.dumps(baseline)} ? {_JS_OK} : {_JS_PENDING})()"
+
+
+def _load_script() -> str:
+    return f"(() => document.readyState === 'complete' ? {_JS_OK} : {_JS_PENDING})()"
+
+
+def _network_idle_script(quiet: Optional[float] = None) -> str:
+    """
+    近似的网络空闲：页面已加载完成，且至少 quiet 秒（默认 Config.WAIT_NETWORK_IDLE_QUIET）没有新增已完成的资源请求
+
+    每次等待使用新的标记：页面上记录的资源数属于上一次等待（或导航前的页面）时重新计时，
+    第一次轮询不会因为沿用旧的计数而直接判定为空闲
+    """
+    quiet_ms = (config.WAIT_NETWORK_IDLE_QUIET if quiet is None else quiet) * 1000
+    token = json.dumps(uuid.uuid4().hex)
+    return (
+        "(() => {"
+        " const now = performance.now();"
+        " const n = performance.getEntriesByType('resource').length;"
+        " const s = window.__mcpWaitIdle;"
+        f" if (!s || s.token !== {token} || s.count !== n || document.readyState !== 'complete') {{"
+        f" window.__mcpWaitIdle = {{token: {token}, count: n, since: now}}; return {_JS_PENDING}; }}"
+        f" return now - s.since >= {quiet_ms:g} ? {_JS_OK} : {_JS_PENDING};"
+        " })()"
+    )
+
+
+def build_condition(params: Dict[str, Any], baseline_url: Optional[str] = None) -> Tuple[Optional[str], str]:
+    """
+    根据 wait 步骤的参数构造轮询脚本
+
+    旧式的 {"seconds": N} 会被改写为最便宜的等价条件：等待网络空闲，最长 N 秒。
+
+    Returns:
+        (轮询脚本, 条件描述)；没有可用条件时脚本为 None
+    """
+    if params.get("selector"):
+        return _selector_script(params["selector"]), f"元素 {params['selector']} 可见"
+    if params.get("text"):
+        return _text_script(params["text"]), f"页面出现文本 {params['text']}"
+    if params.get("url_contains"):
+        return _url_contains_script(params["url_contains"]), f"URL 包含 {params['url_contains']}"
+    if params.get("url_change"):
+        if baseline_url:
+            return _url_change_script(baseline_url), "URL 变化"
+        # 不知道导航前的 URL 时，退化为等待网络空闲
+        return _network_idle_script(), "网络空闲"
+    state = params.get("state")
+    if state == "load":
+        return _load_script(), "页面加载完成"
+    if state == "network_idle" or "seconds" in params:
+        return _network_idle_script(), "网络空闲"
+    return None, "固定等待"
+
+
+def resolve_timeout(params: Dict[str, Any]) -> float:
+    """计算等待上限：显式 timeout 优先，旧式 seconds 作为上限，且不超过全局硬上限"""
+    if "timeout" in params:
+        timeout = float(params["timeout"])
+    elif "seconds" in params:
+        timeout = float(params["seconds"])
+    else:
+        timeout = config.WAIT_DEFAULT_TIMEOUT
+    return max(0.0, min(timeout, config.WAIT_MAX_TIMEOUT))
+
+
+async def wait_for_condition(browser, params: Dict[str, Any]) -> Tuple[str, bool]:
+    """
+    执行 wait 步骤
+
+    Args:
+        browser: MCPPlaywrightAgent 实例
+        params: wait 步骤参数，支持 selector/text/url_contains/url_change/state/timeout，兼容旧式 seconds
+
+    Returns:
+        (结果描述, 是否成功)
+    """
+    if not any(key in params for key in CONDITION_KEYS + ("seconds", "timeout")):
+        # 未指定任何条件时保持原来的默认行为：等待 1 秒
+        params = {**params, "seconds": 1}
+    timeout = resolve_timeout(params)
+    legacy = "seconds" in params and not any(params.get(key) for key in CONDITION_KEYS)
+    script, description = build_condition(params, getattr(browser, "current_url", None))
+
+    registry = getattr(browser, "registry", None)
+    if script is None or registry is None or EVALUATE_TOOL not in registry:
+        # 服务器不支持脚本执行或条件无法构造时退回固定等待
+        await asyncio.sleep(timeout)
+        return f"✅ 等待 {timeout:g} 秒", True
+
+    start = time.monotonic()
+    deadline = start + timeout
+    interval = config.WAIT_POLL_INITIAL
+    polls = 0
+    while True:
+        polls += 1
+        result = await browser.call_tool(EVALUATE_TOOL, script=script)
+        elapsed = time.monotonic() - start
+        if _OK in result and _PENDING not in result:
+            return f"✅ 条件满足: {description}（{elapsed:.2f} 秒，轮询 {polls} 次）", True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        await asyncio.sleep(min(interval, remaining))
+        interval = min(interval * config.WAIT_POLL_BACKOFF, config.WAIT_POLL_MAX)
+
+    if legacy:
+        # 旧式固定等待：达到原来的等待时长即视为完成
+        return f"✅ 等待 {timeout:g} 秒（{description}未确认）", True
+    return f"❌ 等待超时: {description}（{timeout:g} 秒）", False